@@ -0,0 +1,73 @@
+"""Compare per-row scan inserts with the batched LibraryBulkWriter path.
+
+Every variant writes the same songs and directories rows, including the
+search keys, so each also pays for the song_search index triggers.
+
+Usage: python benchmarks/bench_bulk_insert.py [row_count]
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from karaoke_player import (
+    ensure_library_schema, open_library_db, search_key, song_row_for_file, LibraryBulkWriter, SCAN_BATCH_SIZE
+)
+
+def synthetic_paths(count):
+    exts = [".mp4", ".mkv", ".avi", ".cdg"]
+    for i in range(count):
+        yield f"Disc {i // 1000:03d}/Artist {i % 997} - Song {i}{exts[i % 4]}"
+
+def per_row(db_path, count, commit_every=None):
+    # How the scans wrote before: default journal, one execute per file.
+    conn = sqlite3.connect(db_path)
+    ensure_library_schema(conn)
+    c = conn.cursor()
+    for i, rel_path in enumerate(synthetic_paths(count), start=1):
+        rel_dir, _, fn = rel_path.rpartition("/")
+        c.execute("INSERT INTO directories (lib_name, rel_dir) VALUES (?, ?) ON CONFLICT(lib_name, rel_dir) DO NOTHING",
+                  ("bench", rel_dir))
+        c.execute("SELECT dir_id FROM directories WHERE lib_name = ? AND rel_dir = ?", ("bench", rel_dir))
+        dir_id = c.fetchone()[0]
+        _, _, extension, artist, title, _ = song_row_for_file("bench", rel_path)
+        c.execute("""
+            INSERT INTO songs (lib_name, dir_id, filename, extension, artist, title, duration_ms, size, mtime_ns, artist_key, title_key)
+            VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?, ?)
+            ON CONFLICT(dir_id, filename) DO UPDATE SET
+                extension = excluded.extension, artist = excluded.artist, title = excluded.title,
+                artist_key = excluded.artist_key, title_key = excluded.title_key,
+                size = excluded.size, mtime_ns = excluded.mtime_ns
+        """, ("bench", dir_id, fn, extension, artist, title, 1024, 0, search_key(artist), search_key(title)))
+        if commit_every and i % commit_every == 0:
+            conn.commit()
+    conn.commit()
+    conn.close()
+
+def per_row_batched_commits(db_path, count):
+    per_row(db_path, count, commit_every=SCAN_BATCH_SIZE)
+
+def bulk(db_path, count):
+    conn = open_library_db(db_path)
+    ensure_library_schema(conn)
+    writer = LibraryBulkWriter(conn, "bench")
+    for rel_path in synthetic_paths(count):
+        writer.add_file(rel_path, 1024, 0)
+    writer.flush()
+    conn.close()
+
+def run(label, func, count):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "library.db")
+        start = time.perf_counter()
+        func(db_path, count)
+        elapsed = time.perf_counter() - start
+    print(f"{label:>38}: {count} rows in {elapsed:.2f}s ({count / elapsed:,.0f} rows/s)")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    run("per-row, one transaction", per_row, count)
+    run(f"per-row, commit every {SCAN_BATCH_SIZE}", per_row_batched_commits, count)
+    run(f"staged upserts + WAL, batches of {SCAN_BATCH_SIZE}", bulk, count)
@@ -0,0 +1,77 @@
+"""Time the background duration probe at 1, 4 and 8 concurrent ffprobe processes.
+
+The synthetic library holds short silent WAV streams saved under a supported
+video extension. The header parser does not read WAV, so every file goes to
+ffprobe, which detects the format from the content. Needs ffprobe on PATH,
+or --stand-in MS to put a fake ffprobe first on PATH that only sleeps for
+MS milliseconds and prints a fixed answer (POSIX only). The run works in a
+temporary directory, so the media_info cache in its library.db is cleared
+between runs and the real library.db is never touched.
+
+Usage: python benchmarks/bench_duration_probe.py [file_count] [--stand-in MS]
+"""
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from karaoke_player import (
+    ensure_library_schema, open_library_db, probe_library_durations, scan_library_incremental
+)
+
+def make_library(folder, count):
+    for i in range(count):
+        rel_dir = os.path.join(folder, f"Disc {i // 100:03d}")
+        os.makedirs(rel_dir, exist_ok=True)
+        with wave.open(os.path.join(rel_dir, f"Artist {i % 97} - Song {i}.mkv"), "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(8000)
+            w.writeframes(b"\0\0" * 8000 * (1 + i % 5))
+
+def install_stand_in(folder, delay_ms):
+    answer = {"format": {"duration": "1.500000", "format_name": "wav"},
+              "streams": [{"codec_type": "audio", "codec_name": "pcm_s16le", "sample_rate": "8000", "channels": 1}]}
+    os.makedirs(folder)
+    path = os.path.join(folder, "ffprobe")
+    with open(path, "w") as f:
+        f.write(f"#!/bin/sh\nsleep {delay_ms / 1000:.3f}\necho '{json.dumps(answer)}'\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = folder + os.pathsep + os.environ["PATH"]
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    stand_in_ms = None
+    if "--stand-in" in args:
+        i = args.index("--stand-in")
+        stand_in_ms = float(args[i + 1])
+        del args[i:i + 2]
+    count = int(args[0]) if args else 400
+    with tempfile.TemporaryDirectory() as tmp:
+        if stand_in_ms is not None:
+            install_stand_in(os.path.join(tmp, "bin"), stand_in_ms)
+        if shutil.which("ffprobe") is None:
+            sys.exit("ffprobe not found on PATH")
+        os.chdir(tmp)
+        folder = os.path.join(tmp, "library")
+        make_library(folder, count)
+        conn = open_library_db("library.db")
+        ensure_library_schema(conn)
+        scan_library_incremental(conn, "bench", folder)
+        for workers in (1, 4, 8):
+            conn.execute("UPDATE songs SET duration_ms = 0")
+            conn.execute("DELETE FROM media_info")
+            conn.commit()
+            start = time.perf_counter()
+            probed, total = probe_library_durations(conn, "bench", folder, workers=workers)
+            elapsed = time.perf_counter() - start
+            missing = conn.execute("SELECT COUNT(*) FROM songs WHERE duration_ms = 0").fetchone()[0]
+            print(f"{workers} workers: {probed}/{total} files in {elapsed:.2f}s "
+                  f"({probed / elapsed:,.0f} files/s, {missing} without duration)")
+        conn.close()
+        os.chdir(os.path.dirname(tmp))
@@ -0,0 +1,53 @@
+"""Time FuzzySongIndex on a synthetic library with misspelled queries.
+
+Builds the index from (song_id, lib_name, artist_key, title_key) rows the
+way refresh() feeds it, adds a small batch the way a later scan would, and
+times searches the library view runs on each filter change.
+
+Usage: python benchmarks/bench_fuzzy_search.py [song_count]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from karaoke_player import FuzzySongIndex, search_key
+
+WORDS = ["love", "night", "heart", "dance", "fire", "rain", "summer", "baby", "dream", "blue",
+         "angel", "river", "light", "road", "wild", "gold", "home", "song", "time", "sweet"]
+KNOWN = [("Queen", "Bohemian Rhapsody"), ("Metallica", "Nothing Else Matters"), ("Beyoncé", "Halo"),
+         ("ABBA", "Dancing Queen"), ("Bon Jovi", "Livin' on a Prayer")]
+QUERIES = [("Bohemain Rapsody", ""), ("", "Metalica"), ("halo", "beyonce"), ("dansing quen", "abba"),
+           ("living on a prayer", "bon jovi"), ("love", ""), ("xqzv", "")]
+
+def synthetic_rows(count):
+    rng = random.Random(1)
+    for song_id in range(1, count + 1):
+        if song_id % 1000 == 0:
+            artist, title = KNOWN[song_id // 1000 % len(KNOWN)]
+        else:
+            artist = f"Band {rng.randrange(20000)}"
+            title = " ".join(rng.sample(WORDS, 3))
+        yield song_id, f"Lib {song_id % 3}", search_key(artist), search_key(title)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    rows = list(synthetic_rows(count))
+    titles = {row[0]: row[3] for row in rows}
+    index = FuzzySongIndex()
+    start = time.perf_counter()
+    index.add_rows(rows)
+    print(f"indexed {count} songs in {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    index.add_rows([(count + 1, "Lib 0", "queen", "bohemian rhapsody (live)")])
+    print(f"added one song in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for song_text, artist_text in QUERIES:
+        times = []
+        for _ in range(5):
+            start = time.perf_counter()
+            found = index.search(song_text, artist_text)
+            times.append(time.perf_counter() - start)
+        best = titles.get(found[0], "bohemian rhapsody (live)") if found else "-"
+        print(f"song={song_text!r:>22} artist={artist_text!r:>11}: {len(found):>3} hits, top {best!r:<26} "
+              f"median {sorted(times)[2] * 1000:6.1f} ms")
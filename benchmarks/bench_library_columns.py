@@ -0,0 +1,87 @@
+"""Compare the SQL library view queries with the in-memory LibraryColumns index.
+
+Fills a library.db with synthetic songs in two libraries, then times what
+one filter change costs the aggregated all-libraries view: a fresh
+connection, COUNT(*) and the first page through SQL, against
+LibraryColumns.select() plus building the first page of SongItems.
+
+Usage: python benchmarks/bench_library_columns.py [row_count]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from karaoke_player import LibraryColumns, ensure_library_schema, open_library_db, search_key, song_search_filter
+
+WORDS = ["love", "night", "heart", "dance", "fire", "rain", "summer", "baby", "dream", "blue",
+         "angel", "river", "light", "road", "wild", "gold", "home", "song", "time", "sweet"]
+FILTERS = [("", ""), ("l", ""), ("love", ""), ("", "band 12"), ("heart", "band 1"), ("zzz", "")]
+LIBRARIES = {"Bench A": "/media/a", "Bench B": "/media/b"}
+PAGE = 200
+
+def fill(conn, count):
+    rng = random.Random(1)
+    c = conn.cursor()
+    for sort_index, lib_name in enumerate(LIBRARIES):
+        c.execute("INSERT INTO libraries (lib_name, paths, sort_index) VALUES (?, ?, ?)", (lib_name, LIBRARIES[lib_name], sort_index))
+        c.execute("INSERT INTO directories (lib_name, rel_dir) VALUES (?, '')", (lib_name,))
+    rows = []
+    for i in range(count):
+        artist = f"Band {i % 5000}"
+        title = " ".join(rng.sample(WORDS, 3))
+        rows.append(("Bench A" if i % 3 else "Bench B", 1 if i % 3 else 2, f"{artist} - {title} {i}.mp4", ".mp4",
+                     artist, title, rng.randrange(120000, 300000), search_key(artist), search_key(title)))
+    c.executemany("INSERT INTO songs (lib_name, dir_id, filename, extension, artist, title, duration_ms, artist_key, title_key) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+def sql_view(db_path, song_text, artist_text):
+    # What LazyLibraryModel runs per filter change: a new connection, the count, then the first page.
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    libs = list(LIBRARIES)
+    placeholders = ",".join("?" * len(libs))
+    clause, params = song_search_filter(c, song_text, artist_text)
+    total = c.execute(f"SELECT COUNT(*) FROM songs WHERE lib_name IN ({placeholders})" + clause, libs + params).fetchone()[0]
+    clause, params = song_search_filter(c, song_text, artist_text, "s.")
+    c.execute(f"SELECT s.song_id, s.lib_name, s.rel_path FROM song_paths s JOIN libraries l ON s.lib_name = l.lib_name "
+              f"WHERE s.lib_name IN ({placeholders})" + clause +
+              " ORDER BY l.sort_index ASC, s.artist COLLATE NOCASE ASC, s.title COLLATE NOCASE ASC LIMIT ? OFFSET 0",
+              libs + params + [PAGE]).fetchall()
+    conn.close()
+    return total
+
+def column_view(columns, song_text, artist_text):
+    rows = columns.select(list(LIBRARIES), song_text, artist_text, grouped=True)
+    [columns.song_item(row, LIBRARIES) for row in rows[:PAGE]]
+    return len(rows)
+
+def timed(func, *args, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[repeat // 2] * 1000, result
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "library.db")
+        conn = open_library_db(db_path)
+        ensure_library_schema(conn)
+        fill(conn, count)
+        start = time.perf_counter()
+        columns = LibraryColumns(conn)
+        print(f"loaded {len(columns)} songs into columns in {time.perf_counter() - start:.2f}s")
+        conn.close()
+        for song_text, artist_text in FILTERS:
+            sql_ms, sql_total = timed(sql_view, db_path, song_text, artist_text)
+            col_ms, col_total = timed(column_view, columns, song_text, artist_text)
+            check = "" if sql_total == col_total else f"  MISMATCH {sql_total} != {col_total}"
+            print(f"song={song_text!r:>8} artist={artist_text!r:>10}: {col_total:>6} rows  SQL {sql_ms:8.1f} ms  "
+                  f"columns {col_ms:7.1f} ms{check}")
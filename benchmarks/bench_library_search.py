@@ -0,0 +1,66 @@
+"""Compare LIKE scans of songs with the song_search trigram index.
+
+Fills a library.db with synthetic songs, then times what one search
+keystroke costs the library view: the row count plus the first page,
+once with the old title/artist LIKE filter and once through
+song_search_filter.
+
+Usage: python benchmarks/bench_library_search.py [row_count]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from karaoke_player import ensure_library_schema, open_library_db, search_key, song_search_filter
+
+WORDS = ["love", "night", "heart", "dance", "fire", "rain", "summer", "baby", "dream", "blue",
+         "angel", "river", "light", "road", "wild", "gold", "home", "song", "time", "sweet"]
+QUERIES = [("", "queen"), ("bohemian", ""), ("love", ""), ("heart", "band 12"), ("zzz", "")]
+
+def fill(conn, count):
+    rng = random.Random(1)
+    c = conn.cursor()
+    c.execute("INSERT INTO directories (lib_name, rel_dir) VALUES ('Bench', '')")
+    rows = []
+    for i in range(count):
+        artist = f"Band {i % 5000}" if i % 97 else "Queen"
+        title = " ".join(rng.sample(WORDS, 3)) + (" rhapsody bohemian" if i % 4999 == 0 else "")
+        rows.append(("Bench", 1, f"{artist} - {title} {i}.mp4", ".mp4", artist, title, 0, search_key(artist), search_key(title)))
+    c.executemany("INSERT INTO songs (lib_name, dir_id, filename, extension, artist, title, duration_ms, artist_key, title_key) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+def like_filter(c, song_text, artist_text):
+    return " AND title LIKE ? AND artist LIKE ?", [f"%{song_text}%", f"%{artist_text}%"]
+
+def keystroke(c, make_filter, song_text, artist_text):
+    clause, params = make_filter(c, song_text, artist_text)
+    total = c.execute("SELECT COUNT(*) FROM songs WHERE lib_name = ?" + clause, ["Bench"] + params).fetchone()[0]
+    c.execute("SELECT rel_path, artist, title FROM song_paths WHERE lib_name = ?" + clause + " ORDER BY artist, title LIMIT 200",
+              ["Bench"] + params).fetchall()
+    return total
+
+def timed(c, make_filter, song_text, artist_text, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        total = keystroke(c, make_filter, song_text, artist_text)
+    return (time.perf_counter() - start) / repeat * 1000, total
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = open_library_db(os.path.join(tmp, "library.db"))
+        ensure_library_schema(conn)
+        start = time.perf_counter()
+        fill(conn, count)
+        print(f"inserted {count} songs with the index triggers in {time.perf_counter() - start:.1f}s")
+        c = conn.cursor()
+        for song_text, artist_text in QUERIES:
+            like_ms, like_total = timed(c, like_filter, song_text, artist_text)
+            fts_ms, fts_total = timed(c, song_search_filter, song_text, artist_text)
+            check = "" if like_total == fts_total else f"  MISMATCH {like_total} != {fts_total}"
+            print(f"song={song_text!r:>11} artist={artist_text!r:>10}: {fts_total:>6} rows  LIKE {like_ms:8.1f} ms  trigram {fts_ms:8.1f} ms{check}")
+        conn.close()
@@ -0,0 +1,100 @@
+"""Compare the in-process header parser with ffprobe on a mixed synthetic corpus.
+
+Writes minimal MP4 (moov at the front and at the end), Matroska, MP3 (CBR
+and Xing VBR) and AVI files with known durations, checks that
+read_media_header recovers them, and times it against one ffprobe call per
+file when ffprobe is on PATH.
+
+Usage: python benchmarks/bench_media_header.py [file_count]
+"""
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from karaoke_player import probe_media_info, read_media_header
+
+def box(kind, payload):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+def mp4(duration_ms, moov_first):
+    mvhd = box(b"mvhd", bytes(4) + struct.pack(">IIII", 0, 0, 1000, duration_ms) + bytes(80))
+    tkhd = box(b"tkhd", bytes(76) + struct.pack(">II", 1280 << 16, 720 << 16))
+    moov = box(b"moov", mvhd + box(b"trak", tkhd))
+    mdat = box(b"mdat", bytes(4096))
+    ftyp = box(b"ftyp", b"isom" + bytes(4) + b"isomiso2")
+    return ftyp + (moov + mdat if moov_first else mdat + moov)
+
+def ebml(element_id, payload):
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    return id_bytes + (0x01 << 56 | len(payload)).to_bytes(8, "big") + payload
+
+def mkv(duration_ms):
+    header = ebml(0x1A45DFA3, ebml(0x4282, b"matroska"))
+    info = ebml(0x1549A966, ebml(0x2AD7B1, (1000000).to_bytes(3, "big")) + ebml(0x4489, struct.pack(">d", duration_ms)))
+    video = ebml(0xE0, ebml(0xB0, (1920).to_bytes(2, "big")) + ebml(0xBA, (1080).to_bytes(2, "big")))
+    tracks = ebml(0x1654AE6B, ebml(0xAE, video))
+    cluster = ebml(0x1F43B675, bytes(4096))
+    return header + ebml(0x18538067, info + tracks + cluster)
+
+def mp3(duration_ms, vbr):
+    # MPEG-1 Layer III, 128 kbit/s, 48 kHz, stereo: unpadded 384-byte frames of 24 ms.
+    frame = b"\xff\xfb\x94\x00" + bytes(380)
+    frames = duration_ms // 24
+    first = frame
+    if vbr:
+        xing = b"Xing" + struct.pack(">II", 1, frames)
+        first = frame[:36] + xing + frame[36 + len(xing):]
+    return b"ID3\x04\x00\x00\x00\x00\x00\x00" + first + frame * frames
+
+def avi(duration_ms):
+    frames = duration_ms * 25 // 1000
+    avih = struct.pack("<4sI", b"avih", 56) + struct.pack("<14I", 40000, 0, 0, 0, frames, 0, 1, 0, 720, 576, 0, 0, 0, 0)
+    hdrl = struct.pack("<4sI4s", b"LIST", 4 + len(avih), b"hdrl") + avih
+    movi = struct.pack("<4sI4s", b"LIST", 4 + 4096, b"movi") + bytes(4096)
+    body = b"AVI " + hdrl + movi
+    return struct.pack("<4sI", b"RIFF", len(body)) + body
+
+BUILDERS = [
+    (".mp4", lambda ms: mp4(ms, True)),
+    (".mp4", lambda ms: mp4(ms, False)),
+    (".mkv", mkv),
+    (".mp3", lambda ms: mp3(ms, False)),
+    (".mp3", lambda ms: mp3(ms, True)),
+    (".avi", avi),
+]
+
+def make_corpus(folder, count):
+    files = []
+    for i in range(count):
+        ext, build = BUILDERS[i % len(BUILDERS)]
+        duration_ms = 60000 + 1000 * (i % 180)
+        path = os.path.join(folder, f"file{i}{ext}")
+        with open(path, "wb") as f:
+            f.write(build(duration_ms))
+        files.append((path, duration_ms))
+    return files
+
+def timed(label, func, files):
+    start = time.perf_counter()
+    results = [func(path) for path, _ in files]
+    elapsed = time.perf_counter() - start
+    print(f"{label:>14}: {len(files)} files in {elapsed:.3f}s ({elapsed / len(files) * 1000:.2f} ms/file)")
+    return results
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    with tempfile.TemporaryDirectory() as tmp:
+        files = make_corpus(tmp, count)
+        infos = timed("header parser", read_media_header, files)
+        # The synthetic MP3s hold whole frames only, so allow one frame of error.
+        wrong = [(path, info, expected) for (path, expected), info in zip(files, infos)
+                 if not info or abs(info["duration_ms"] - expected) > 27]
+        for path, info, expected in wrong[:5]:
+            print(f"  mismatch {os.path.basename(path)}: got {info}, expected {expected} ms")
+        print(f"  {count - len(wrong)}/{count} durations recovered")
+        if shutil.which("ffprobe"):
+            timed("ffprobe", probe_media_info, files)
@@ -0,0 +1,73 @@
+"""Compare loose per-song JPEG files with the packed thumbs.db store.
+
+Writes the same small JPEG-sized blobs both ways, then times random reads
+the way the table delegate does them, a full existence listing, and a
+compaction that drops a tenth of the songs.
+
+Usage: python benchmarks/bench_thumb_store.py [thumb_count]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from karaoke_player import (
+    THUMB_WRITE_BATCH, compact_thumbnails, load_thumbnail, open_thumb_db, store_thumbnails
+)
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:>28}: {time.perf_counter() - start:.3f}s")
+    return result
+
+def write_files(folder, blobs):
+    os.makedirs(folder)
+    for song_id, jpeg in blobs:
+        with open(os.path.join(folder, f"{song_id}.jpg"), "wb") as f:
+            f.write(jpeg)
+
+def write_store(tconn, blobs):
+    for i in range(0, len(blobs), THUMB_WRITE_BATCH):
+        store_thumbnails(tconn, blobs[i:i + THUMB_WRITE_BATCH])
+
+def store_size(db_path):
+    # With WAL, pages not yet checkpointed live in the -wal file next to the database.
+    return sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p))
+
+def read_files(folder, ids):
+    for song_id in ids:
+        path = os.path.join(folder, f"{song_id}.jpg")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                f.read()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    blobs = [(song_id, os.urandom(random.randint(1500, 3500))) for song_id in range(1, count + 1)]
+    sample = random.sample(range(1, count + 1), min(count, 5000))
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = os.path.join(tmp, "thumbs")
+        thumbs_db = os.path.join(tmp, "thumbs.db")
+        tconn = open_thumb_db(thumbs_db)
+        timed(f"write {count} files", lambda: write_files(folder, blobs))
+        timed(f"write {count} blobs", lambda: write_store(tconn, blobs))
+        timed("list files", lambda: len(os.listdir(folder)))
+        timed("list store ids", lambda: len({row[0] for row in tconn.execute("SELECT song_id FROM thumbnails")}))
+        timed(f"read {len(sample)} files", lambda: read_files(folder, sample))
+        timed(f"read {len(sample)} blobs", lambda: [load_thumbnail(tconn, song_id) for song_id in sample])
+
+        library_db = os.path.join(tmp, "library.db")
+        lconn = sqlite3.connect(library_db)
+        lconn.execute("CREATE TABLE songs (song_id INTEGER PRIMARY KEY)")
+        lconn.executemany("INSERT INTO songs (song_id) VALUES (?)", [(i,) for i in range(1, count + 1) if i % 10])
+        lconn.commit()
+        lconn.close()
+        before = store_size(thumbs_db)
+        removed = timed("compact", lambda: compact_thumbnails(tconn, library_db))
+        after = store_size(thumbs_db)
+        print(f"  removed {removed} thumbnails, {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB (database + WAL)")
+        tconn.close()
@@ -3,24 +3,31 @@ import os
 os.environ["QT_LOGGING_RULES"] = "qt.multimedia.playbackengine.codec=false"
 import sys
 import datetime
+import collections
 import subprocess
 import webbrowser
 import traceback
 import concurrent.futures
+import io
+import itertools
+import json
+import re
 from pathlib import Path
 import shutil
+import struct
 import time
 import random
 import threading
 import queue
 import sqlite3
+import unicodedata
 from PySide6.QtCore import (
     Qt, QTimer, QSize, QSettings, QSortFilterProxyModel, QAbstractTableModel,
     QModelIndex, QMimeData, Signal, QObject, QThread, QEvent, QPoint, QUrl,
     QThreadPool, QRunnable, QRect, QItemSelection, QItemSelectionModel
 )
 from PySide6.QtGui import (
-    QAction, QKeySequence, QIcon, QDrag, QPixmap, QPainter, QConicalGradient, QColor, QPen, QResizeEvent, QCursor, QMouseEvent
+    QAction, QKeySequence, QIcon, QDrag, QImage, QPixmap, QPainter, QConicalGradient, QColor, QPen, QResizeEvent, QCursor, QMouseEvent
 )
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -28,74 +35,601 @@ from PySide6.QtWidgets import (
     QListWidget, QListWidgetItem, QMenu, QFileDialog, QLabel, QPushButton,
     QLineEdit, QSlider, QMessageBox, QProgressDialog, QSizePolicy, QGridLayout,
     QDialog, QCheckBox, QComboBox, QSpacerItem, QScrollBar, QScrollArea,
-    QStyledItemDelegate, QTextEdit, QRubberBand
+    QStyledItemDelegate, QTextEdit, QRubberBand, QToolTip
 )
-from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
-from PySide6.QtMultimediaWidgets import QVideoWidget
+try:
+    from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
+    from PySide6.QtMultimediaWidgets import QVideoWidget
+    _multimedia_error = None
+except ImportError as e:
+    # QtMultimedia needs the system audio libraries, which headless indexing
+    # machines often lack. Only playback needs them; main() reports it there.
+    QMediaPlayer = QAudioOutput = None
+    QVideoWidget = QWidget
+    _multimedia_error = e
 from PySide6.QtNetwork import QLocalServer, QLocalSocket
-import librosa
+import numpy as np
 
 ERROR_LOG_FILE = "error.log"
 APP_NAME = "Karaoke Player"
 SETTINGS_FILE = "config.ini"
 HISTORY_LOG_FILE = "history.log"
 SUPPORTED_FILE_EXTENSIONS = [".mp4", ".mkv", ".avi", ".cdg"]
+_SUPPORTED_EXTENSION_SET = frozenset(SUPPORTED_FILE_EXTENSIONS)
+SCAN_BATCH_SIZE = 10000
+DURATION_WRITE_BATCH = 2000
+DEFAULT_SCAN_WORKERS = 4
+SCAN_WORKER_CHOICES = [1, 2, 4, 8, 16]
+# A CD+G subcode stream is a fixed 300 packets of 24 bytes per second.
+CDG_BYTES_PER_SECOND = 300 * 24
+CDG_PACKET_SIZE = 24
+CDG_MP3_TOLERANCE_MS = 2000
+THUMB_SECONDS = 35
 
 IDLES_FOLDER = "Idles"
+TEMP_FOLDER = "temp"
+
+def hidden_startupinfo():
+    """STARTUPINFO that keeps ffmpeg console windows hidden; None off Windows."""
+    if not hasattr(subprocess, "STARTUPINFO"):
+        return None
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return startupinfo
+
+def cdg_duration_ms(size):
+    return size * 1000 // CDG_BYTES_PER_SECOND
+
+def reconcile_cdg_duration(cdg_ms, mp3_ms):
+    """Prefer the MP3 length when it disagrees with a truncated or padded CDG stream."""
+    if mp3_ms > 0 and abs(mp3_ms - cdg_ms) > CDG_MP3_TOLERANCE_MS:
+        return mp3_ms
+    return cdg_ms
+
+def cdg_packets_at(path_str, seconds):
+    """Return a short CDG stream whose last packet shows the screen at `seconds`.
+
+    CDG draws incrementally, so a frame depends on every packet since the
+    screen was last cleared. Keeps the latest palette, border and transparency
+    packets from before the last Memory Preset, then every packet from that
+    preset (or the start of the stream) up to the target.
+    """
+    with open(path_str, "rb") as f:
+        head = f.read(int(seconds * CDG_BYTES_PER_SECOND))
+    end = len(head) - len(head) % CDG_PACKET_SIZE
+    start = 0
+    for pos in range(end - CDG_PACKET_SIZE, -1, -CDG_PACKET_SIZE):
+        if head[pos] & 0x3F == 0x09 and head[pos + 1] & 0x3F == 1:  # Memory Preset clears the screen
+            start = pos
+            break
+    state = {}
+    for pos in range(0, start, CDG_PACKET_SIZE):
+        # Border Preset, Define Transparent, Load Color Table low/high.
+        if head[pos] & 0x3F == 0x09 and head[pos + 1] & 0x3F in (2, 28, 30, 31):
+            state[head[pos + 1] & 0x3F] = pos
+    prefix = b"".join(head[pos:pos + CDG_PACKET_SIZE] for pos in sorted(state.values()))
+    return prefix + head[start:end]
+
+MEDIA_HEADER_MAX_READ = 64 * 1024 * 1024
+
+def read_media_header(path_str):
+    """Read duration and basic stream info straight from a file's container header.
+
+    Handles MP4/MOV (moov/mvhd), Matroska/WebM (Segment/Info), MP3 (Xing/Info,
+    VBRI or a CBR frame count) and AVI (avih). Returns a dict with at least
+    "container" and "duration_ms", or None when the header cannot be read, in
+    which case callers fall back to ffprobe.
+    """
+    try:
+        with open(path_str, "rb") as f:
+            head = f.read(12)
+            f.seek(0)
+            if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+                info = _mp4_header(f)
+            elif head[:4] == b"\x1a\x45\xdf\xa3":
+                info = _matroska_header(f)
+            elif head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+                info = _avi_header(f)
+            elif head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+                info = _mp3_header(f)
+            else:
+                return None
+    except (OSError, struct.error, ValueError, IndexError):
+        return None
+    if not info or not info.get("duration_ms"):
+        return None
+    return info
+
+def _mp4_boxes(f, start, end):
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, pos + size
+        pos += size
+
+def _mp4_header(f):
+    file_size = os.fstat(f.fileno()).st_size
+    info = {"container": "mp4"}
+    seen_mdat = False
+    for kind, start, end in _mp4_boxes(f, 0, file_size):
+        if kind == b"mdat":
+            seen_mdat = True
+        elif kind == b"moov":
+            info["moov_at_front"] = not seen_mdat
+            if end - start > MEDIA_HEADER_MAX_READ:
+                return None
+            f.seek(start)
+            moov = io.BytesIO(f.read(end - start))
+            for sub, s_start, s_end in _mp4_boxes(moov, 0, end - start):
+                moov.seek(s_start)
+                if sub == b"mvhd":
+                    version = moov.read(4)[0]
+                    if version == 1:
+                        timescale, duration = struct.unpack(">16xIQ", moov.read(28))
+                    else:
+                        timescale, duration = struct.unpack(">8xII", moov.read(16))
+                    if timescale:
+                        info["duration_ms"] = duration * 1000 // timescale
+                elif sub == b"trak":
+                    for t_kind, t_start, t_end in _mp4_boxes(moov, s_start, s_end):
+                        if t_kind == b"tkhd" and t_end - t_start >= 8:
+                            # Width and height are the last two 16.16 fixed-point fields.
+                            moov.seek(t_end - 8)
+                            width, height = struct.unpack(">II", moov.read(8))
+                            if width and height and "width" not in info:
+                                info["width"], info["height"] = width >> 16, height >> 16
+            return info
+    return None
+
+def _ebml_vint(f, keep_marker):
+    first = f.read(1)
+    if not first:
+        raise ValueError("truncated EBML element")
+    b = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not b & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("invalid EBML length")
+    value = b if keep_marker else b & (mask - 1)
+    all_ones = value == mask - 1
+    for byte in f.read(length - 1):
+        value = (value << 8) | byte
+        all_ones = all_ones and byte == 0xFF
+    if not keep_marker and all_ones:
+        return None  # unknown size
+    return value
+
+def _ebml_elements(f, start, end):
+    pos = start
+    while pos < end:
+        f.seek(pos)
+        element_id = _ebml_vint(f, True)
+        size = _ebml_vint(f, False)
+        data_start = f.tell()
+        data_end = end if size is None else data_start + size
+        yield element_id, data_start, data_end
+        if size is None:
+            return
+        pos = data_end
+
+def _matroska_header(f):
+    file_size = os.fstat(f.fileno()).st_size
+    info = {"container": "matroska"}
+    scale = 1000000
+    duration = None
+    for element_id, start, end in _ebml_elements(f, 0, file_size):
+        if element_id != 0x18538067:  # Segment
+            continue
+        for child_id, c_start, c_end in _ebml_elements(f, start, min(end, file_size)):
+            if child_id == 0x1549A966:  # Info
+                for info_id, i_start, i_end in _ebml_elements(f, c_start, c_end):
+                    f.seek(i_start)
+                    data = f.read(i_end - i_start)
+                    if info_id == 0x2AD7B1:  # TimestampScale
+                        scale = int.from_bytes(data, "big")
+                    elif info_id == 0x4489:  # Duration
+                        duration = struct.unpack(">f" if len(data) == 4 else ">d", data)[0]
+            elif child_id == 0x1654AE6B:  # Tracks
+                for entry_id, e_start, e_end in _ebml_elements(f, c_start, c_end):
+                    for track_id, t_start, t_end in _ebml_elements(f, e_start, e_end):
+                        if track_id == 0xE0 and "width" not in info:  # Video
+                            for v_id, v_start, v_end in _ebml_elements(f, t_start, t_end):
+                                f.seek(v_start)
+                                if v_id == 0xB0:
+                                    info["width"] = int.from_bytes(f.read(v_end - v_start), "big")
+                                elif v_id == 0xBA:
+                                    info["height"] = int.from_bytes(f.read(v_end - v_start), "big")
+            elif child_id == 0x1F43B675:  # Cluster: media data starts, headers are done
+                break
+        break
+    if duration is None:
+        return None
+    info["duration_ms"] = int(duration * scale / 1000000)
+    return info
+
+_MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 25: (11025, 12000, 8000)}
+
+def _mp3_frame(header):
+    """Decode a 4-byte MPEG audio frame header, or return None if it is not one."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = {3: 1, 2: 2, 0: 25}.get((header[1] >> 3) & 3)
+    layer = {3: 1, 2: 2, 1: 3}.get((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _MP3_BITRATES[(min(version, 2), layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if layer == 2 or version == 1 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    channels = 1 if header[3] >> 6 == 3 else 2
+    return version, layer, bitrate, sample_rate, samples, length, channels
+
+def _mp3_header(f):
+    file_size = os.fstat(f.fileno()).st_size
+    start = 0
+    head = f.read(10)
+    if head[:3] == b"ID3":
+        start = 10 + ((head[6] & 0x7F) << 21 | (head[7] & 0x7F) << 14 | (head[8] & 0x7F) << 7 | (head[9] & 0x7F))
+        if head[5] & 0x10:
+            start += 10
+    f.seek(start)
+    buf = f.read(64 * 1024)
+    for offset in range(len(buf) - 4):
+        frame = _mp3_frame(buf[offset:offset + 4])
+        # Require a second frame right behind the first so stray 0xFF bytes don't count as sync.
+        if frame and _mp3_frame(buf[offset + frame[5]:offset + frame[5] + 4]):
+            break
+    else:
+        return None
+    version, layer, bitrate, sample_rate, samples, length, channels = frame
+    info = {"container": "mp3", "sample_rate": sample_rate, "channels": channels}
+    side_info = (32 if channels == 2 else 17) if version == 1 else (17 if channels == 2 else 9)
+    xing = buf[offset + 4 + side_info:offset + 4 + side_info + 12]
+    vbri = buf[offset + 36:offset + 54]
+    frames = None
+    if xing[:4] in (b"Xing", b"Info") and struct.unpack(">I", xing[4:8])[0] & 1:
+        frames = struct.unpack(">I", xing[8:12])[0]
+    elif vbri[:4] == b"VBRI":
+        frames = struct.unpack(">I", vbri[14:18])[0]
+    if frames:
+        info["duration_ms"] = frames * samples * 1000 // sample_rate
+    else:
+        audio_bytes = file_size - start - offset
+        f.seek(file_size - 128)
+        if f.read(3) == b"TAG":
+            audio_bytes -= 128
+        info["duration_ms"] = audio_bytes * 8000 // bitrate
+        info["bitrate"] = bitrate
+    return info
+
+def _avi_header(f):
+    file_size = os.fstat(f.fileno()).st_size
+    info = {"container": "avi"}
+    pos = 12
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        kind, size = struct.unpack("<4sI", f.read(8))
+        if kind == b"LIST" and f.read(4) == b"hdrl":
+            total_frames = None
+            usec_per_frame = 0
+            sub = pos + 12
+            while sub + 8 <= pos + 8 + size:
+                f.seek(sub)
+                sub_kind, sub_size = struct.unpack("<4sI", f.read(8))
+                if sub_kind == b"avih":
+                    usec_per_frame, _, _, _, total_frames, _, _, _, width, height = struct.unpack("<10I", f.read(40))
+                    info["width"], info["height"] = width, height
+                elif sub_kind == b"LIST" and f.read(4) == b"odml":
+                    # OpenDML files over 1 GB only count the first RIFF chunk in avih.
+                    f.seek(sub + 12)
+                    if f.read(4) == b"dmlh":
+                        f.read(4)
+                        total_frames = struct.unpack("<I", f.read(4))[0]
+                sub += 8 + sub_size + (sub_size & 1)
+            if total_frames is None or not usec_per_frame:
+                return None
+            info["duration_ms"] = total_frames * usec_per_frame // 1000
+            return info
+        pos += 8 + size + (size & 1)
+    return None
 
 def top_level_get_duration(path_str):
-    import os, subprocess
+    import os
     if not os.path.exists(path_str):
         return 0
+    if path_str.casefold().endswith(".cdg"):
+        return cdg_duration_ms(os.path.getsize(path_str))
+    info = read_media_header(path_str)
+    if info:
+        return info["duration_ms"]
+    info = media_info(path_str)
+    return info["duration_ms"] if info else 0
+
+MEDIA_INFO_FIELDS = ("duration_ms", "container", "video_codec", "width", "height", "audio_codec",
+                     "sample_rate", "channels", "bitrate", "moov_at_front")
+_media_info_local = threading.local()
+
+def probe_media_info(path_str):
+    """Collect everything media_info stores with a single ffprobe run.
+
+    The container header is read as well, for moov_at_front and as the
+    answer when ffprobe is missing or fails. Returns None if neither works.
+    """
+    import subprocess
+    header = read_media_header(path_str) or {}
     cmd = [
         "ffprobe", "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
+        "-show_entries", "format=duration,format_name,bit_rate:stream=codec_type,codec_name,width,height,sample_rate,channels:stream_disposition=attached_pic",
+        "-of", "json",
         path_str
     ]
-    startupinfo = subprocess.STARTUPINFO()
-    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace', startupinfo=startupinfo)
-    if result.returncode == 0:
-        try:
-            length = float(result.stdout.strip())
-            return int(length * 1000)
-        except Exception:
-            return 0
-    return 0
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace',
+                                startupinfo=hidden_startupinfo())
+        probed = json.loads(result.stdout) if result.returncode == 0 else None
+    except (OSError, ValueError) as e:
+        log_error(f"ffprobe failed for {path_str}: {e}")
+        probed = None
+    if not probed:
+        return {field: header.get(field) for field in MEDIA_INFO_FIELDS} if header else None
+    fmt = probed.get("format", {})
+    info = {field: header.get(field) for field in MEDIA_INFO_FIELDS}
+    try:
+        info["duration_ms"] = int(float(fmt["duration"]) * 1000)
+    except (KeyError, ValueError):
+        info["duration_ms"] = info["duration_ms"] or 0
+    info["container"] = fmt.get("format_name", "").split(",")[0] or info["container"]
+    info["bitrate"] = int(fmt["bit_rate"]) if str(fmt.get("bit_rate", "")).isdigit() else info["bitrate"]
+    for stream in probed.get("streams", []):
+        if stream.get("codec_type") == "video" and not info["video_codec"] and not stream.get("disposition", {}).get("attached_pic"):
+            info["video_codec"] = stream.get("codec_name")
+            info["width"] = stream.get("width") or info["width"]
+            info["height"] = stream.get("height") or info["height"]
+        elif stream.get("codec_type") == "audio" and not info["audio_codec"]:
+            info["audio_codec"] = stream.get("codec_name")
+            info["sample_rate"] = int(stream.get("sample_rate") or 0) or info["sample_rate"]
+            info["channels"] = stream.get("channels") or info["channels"]
+    return info
+
+def media_info(path_str, probe=True):
+    """Stream info of a media file from the media_info table, probing it once if it is not there.
+
+    Rows are keyed by file name, size and mtime, so they survive a library
+    folder moving to another drive and go stale as soon as the file changes.
+    Key and tempo renders in TEMP_FOLDER are probed but not stored, since
+    they are deleted again. Each thread keeps its own connection to library.db.
+    """
+    try:
+        st = os.stat(path_str)
+    except OSError:
+        return None
+    key = (os.path.basename(path_str), st.st_size, st.st_mtime_ns)
+    conn = getattr(_media_info_local, "conn", None)
+    if conn is None:
+        conn = _media_info_local.conn = open_library_db()
+        ensure_library_schema(conn)
+    c = conn.cursor()
+    c.execute(f"SELECT {', '.join(MEDIA_INFO_FIELDS)} FROM media_info WHERE filename = ? AND size = ? AND mtime_ns = ?", key)
+    row = c.fetchone()
+    if row:
+        return dict(zip(MEDIA_INFO_FIELDS, row))
+    if not probe:
+        return None
+    info = probe_media_info(path_str)
+    is_render = os.path.dirname(os.path.abspath(path_str)) == os.path.abspath(TEMP_FOLDER)
+    # Header-only answers are cheap to recompute and would hide the codecs once ffprobe is installed.
+    if info and info["duration_ms"] and (info["video_codec"] or info["audio_codec"]) and not is_render:
+        c.execute(f"INSERT OR REPLACE INTO media_info (filename, size, mtime_ns, {', '.join(MEDIA_INFO_FIELDS)}) "
+                  f"VALUES (?, ?, ?, {', '.join('?' * len(MEDIA_INFO_FIELDS))})",
+                  key + tuple(info[field] for field in MEDIA_INFO_FIELDS))
+        conn.commit()
+    return info
+
+def describe_media_info(info):
+    parts = []
+    if info.get("video_codec"):
+        size = f" {info['width']}x{info['height']}" if info.get("width") else ""
+        parts.append(info["video_codec"].upper() + size)
+    if info.get("audio_codec"):
+        audio = info["audio_codec"].upper()
+        if info.get("sample_rate"):
+            audio += f" {info['sample_rate'] / 1000:g} kHz"
+        if info.get("channels"):
+            audio += " " + {1: "mono", 2: "stereo"}.get(info["channels"], f"{info['channels']} ch")
+        parts.append(audio)
+    if info.get("bitrate"):
+        parts.append(f"{info['bitrate'] // 1000} kbit/s")
+    if info.get("moov_at_front") is not None and not info["moov_at_front"]:
+        parts.append("index at end of file")
+    return ", ".join(parts) or (info.get("container") or "")
+
+THUMBNAIL_EXTENSIONS = (".mp4", ".mkv", ".avi", ".cdg")
+THUMBS_DB_FILE = "thumbs.db"
+THUMB_WRITE_BATCH = 200
+THUMB_SWEEP_INTERVAL_DAYS = 7
+SPRITE_INTERVAL_MS = 5000
+SPRITE_COLUMNS = 10
+SPRITE_FRAME_WIDTH = 96
+SPRITE_FRAME_HEIGHT = 54
+
 def createThumbnail(path_str):
-    from pathlib import Path
-    import subprocess, os
+    """Render the thumbnail of a video or CDG file and return it as JPEG bytes, or None."""
     if not os.path.exists(path_str):
-        return
+        return None
     ext = Path(path_str).suffix.casefold()
-    Path("thumbs").mkdir(exist_ok=True)
-    thumb_path = os.path.join("thumbs", os.path.basename(path_str) + ".jpg")
-    if os.path.exists(thumb_path):
-        return
-    startupinfo = subprocess.STARTUPINFO()
-    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    startupinfo = hidden_startupinfo()
+    stdin = None
     if ext in (".mp4", ".mkv", ".avi"):
         cmd = [
-            "ffmpeg", "-y", "-ss", "35", "-i", path_str,
+            "ffmpeg", "-ss", str(THUMB_SECONDS), "-i", path_str,
             "-frames:v", "1", "-vf", "scale=87:49",
-            thumb_path
+            "-f", "image2pipe", "-c:v", "mjpeg", "pipe:1"
         ]
-        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                       text=True, encoding='utf-8', errors='replace',
-                       startupinfo=startupinfo)
     elif ext == ".cdg":
+        # The cdg demuxer cannot seek, so hand ffmpeg only the packets that draw the frame.
+        stdin = cdg_packets_at(path_str, THUMB_SECONDS)
+        if not stdin:
+            return None
+        last = max(0.0, len(stdin) / CDG_BYTES_PER_SECOND - 0.05)
         cmd = [
-            "ffmpeg", "-y", "-fflags", "+genpts", "-f", "cdg", "-i", path_str,
-            "-ss", "35", "-frames:v", "1",
+            "ffmpeg", "-fflags", "+genpts", "-f", "cdg", "-i", "pipe:0",
+            "-ss", f"{last:.2f}", "-frames:v", "1",
             "-vf", "format=rgb24,scale=65:49:force_original_aspect_ratio=decrease,pad=87:49:11:0:#181818",
-            thumb_path
+            "-f", "image2pipe", "-c:v", "mjpeg", "pipe:1"
         ]
-        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                       text=True, encoding='utf-8', errors='replace',
-                       startupinfo=startupinfo)
     else:
-        return
+        return None
+    proc = subprocess.run(cmd, input=stdin, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, startupinfo=startupinfo)
+    return proc.stdout or None
+
+def createSpriteSheet(path_str, duration_ms):
+    """Render one small frame every SPRITE_INTERVAL_MS into a single JPEG grid for seek previews.
+
+    Returns (frame_count, jpeg) or None. Video decodes keyframes only, so each
+    frame is the keyframe at or before its slot.
+    """
+    if not os.path.exists(path_str) or duration_ms <= 0:
+        return None
+    ext = Path(path_str).suffix.casefold()
+    frame_count = -(-duration_ms // SPRITE_INTERVAL_MS)
+    rows = -(-frame_count // SPRITE_COLUMNS)
+    w, h = SPRITE_FRAME_WIDTH, SPRITE_FRAME_HEIGHT
+    vf = (f"fps=1000/{SPRITE_INTERVAL_MS},scale={w}:{h}:force_original_aspect_ratio=decrease,"
+          f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2:#181818,tile={SPRITE_COLUMNS}x{rows}")
+    if ext in (".mp4", ".mkv", ".avi"):
+        cmd = ["ffmpeg", "-skip_frame", "nokey", "-i", path_str, "-an", "-sn"]
+    elif ext == ".cdg":
+        cmd = ["ffmpeg", "-fflags", "+genpts", "-f", "cdg", "-i", path_str]
+        vf = "format=rgb24," + vf
+    else:
+        return None
+    cmd += ["-vf", vf, "-frames:v", "1", "-f", "image2pipe", "-c:v", "mjpeg", "-q:v", "5", "pipe:1"]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, startupinfo=hidden_startupinfo())
+    if not proc.stdout:
+        return None
+    return frame_count, proc.stdout
+
+def open_thumb_db(path=THUMBS_DB_FILE):
+    """Connect to the packed thumbnail store: one JPEG blob per song_id of library.db."""
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS thumbnails (song_id INTEGER PRIMARY KEY, jpeg BLOB NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS sprites (song_id INTEGER PRIMARY KEY, interval_ms INTEGER NOT NULL, columns INTEGER NOT NULL, "
+                 "frame_count INTEGER NOT NULL, frame_width INTEGER NOT NULL, frame_height INTEGER NOT NULL, jpeg BLOB NOT NULL)")
+    return conn
+
+def store_thumbnails(tconn, rows):
+    tconn.executemany("INSERT OR REPLACE INTO thumbnails (song_id, jpeg) VALUES (?, ?)", rows)
+    tconn.commit()
+
+def load_thumbnail(tconn, song_id):
+    row = tconn.execute("SELECT jpeg FROM thumbnails WHERE song_id = ?", (song_id,)).fetchone()
+    return row[0] if row else None
+
+def store_sprite(tconn, song_id, frame_count, jpeg):
+    tconn.execute("INSERT OR REPLACE INTO sprites (song_id, interval_ms, columns, frame_count, frame_width, frame_height, jpeg) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                  (song_id, SPRITE_INTERVAL_MS, SPRITE_COLUMNS, frame_count, SPRITE_FRAME_WIDTH, SPRITE_FRAME_HEIGHT, jpeg))
+    tconn.commit()
+
+def load_sprite(tconn, song_id):
+    """Return (interval_ms, columns, frame_count, frame_width, frame_height, jpeg) or None."""
+    return tconn.execute("SELECT interval_ms, columns, frame_count, frame_width, frame_height, jpeg FROM sprites WHERE song_id = ?",
+                         (song_id,)).fetchone()
+
+def drop_thumbnails(tconn, song_ids):
+    """Delete the thumbnails and sprite sheets of the given song_ids; returns the number of thumbnails removed."""
+    rows = [(song_id,) for song_id in song_ids]
+    if not rows:
+        return 0
+    before = tconn.total_changes
+    tconn.executemany("DELETE FROM thumbnails WHERE song_id = ?", rows)
+    removed = tconn.total_changes - before
+    tconn.executemany("DELETE FROM sprites WHERE song_id = ?", rows)
+    tconn.commit()
+    return removed
+
+def compact_thumbnails(tconn, library_db="library.db"):
+    """Drop thumbnails of songs no longer in library_db and return the freed space to the filesystem."""
+    tconn.execute("ATTACH DATABASE ? AS lib", (library_db,))
+    try:
+        removed = tconn.execute("DELETE FROM thumbnails WHERE song_id NOT IN (SELECT song_id FROM lib.songs)").rowcount
+        tconn.execute("DELETE FROM sprites WHERE song_id NOT IN (SELECT song_id FROM lib.songs)")
+        tconn.commit()
+    finally:
+        tconn.execute("DETACH DATABASE lib")
+    tconn.execute("VACUUM")
+    # In WAL mode VACUUM rewrites every page into the -wal file; only a checkpoint shrinks the store.
+    tconn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return removed
+
+def import_loose_thumbnails(conn, tconn, folder="thumbs"):
+    """Move thumbnails from the old one-JPEG-per-song folder into the store and delete the files."""
+    if not os.path.isdir(folder):
+        return 0
+    song_ids = {}
+    for song_id, fn in conn.execute("SELECT song_id, filename FROM songs"):
+        song_ids.setdefault(fn + ".jpg", []).append(song_id)
+    if not song_ids:
+        # Nothing to match against yet; keep the files for after the first scan.
+        return 0
+    imported = 0
+    rows = []
+    paths = []
+    for entry in itertools.chain(os.scandir(folder), [None]):
+        if entry is not None:
+            paths.append(entry.path)
+            try:
+                with open(entry.path, "rb") as f:
+                    jpeg = f.read()
+            except OSError:
+                continue
+            # The old layout keyed by file name, so every song of that name shared the picture.
+            rows.extend((song_id, jpeg) for song_id in song_ids.get(entry.name, ()))
+        if len(paths) >= THUMB_WRITE_BATCH or (entry is None and paths):
+            tconn.executemany("INSERT OR IGNORE INTO thumbnails (song_id, jpeg) VALUES (?, ?)", rows)
+            tconn.commit()
+            imported += len(rows)
+            for path in paths:
+                try:
+                    os.unlink(path)
+                except OSError as e:
+                    log_error(f"Failed to delete old thumbnail {path}: {e}")
+            rows = []
+            paths = []
+    try:
+        os.rmdir(folder)
+    except OSError:
+        pass
+    return imported
 
 def worker_func_for_scan(f):
     fn = f.name
@@ -110,27 +644,62 @@ def resource_path(relative_path):
     except Exception:
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
+def cleanRemovedThumbnails(song_ids):
+    """Delete stored thumbnails of the songs a scan or library removal deleted."""
+    if not song_ids:
+        return
+    tconn = open_thumb_db()
+    try:
+        drop_thumbnails(tconn, song_ids)
+    except sqlite3.Error as e:
+        log_error(f"Failed to delete thumbnails of removed songs: {e}")
+    finally:
+        tconn.close()
+
 def cleanThumbs():
-    """Delete thumbnail files for songs that are no longer in the database."""
-    import sqlite3
-    from pathlib import Path
-    valid = set()
+    """Delete stored thumbnails of songs that are no longer in the database.
+
+    This is a full sweep with VACUUM; removals are normally handled by
+    cleanRemovedThumbnails, so it only runs as occasional maintenance.
+    """
+    tconn = open_thumb_db()
+    try:
+        compact_thumbnails(tconn)
+    except sqlite3.Error as e:
+        log_error(f"Failed to compact thumbnails: {e}")
+    finally:
+        tconn.close()
+
+def cleanRemovedSongFiles(filenames, temp_folder=TEMP_FOLDER):
+    """Delete stream info and rendered audio for songs a scan removed.
+
+    Files whose name is still used by a song in any library are kept.
+    Thumbnails are keyed by song_id and dropped by cleanRemovedThumbnails.
+    """
+    filenames = set(filenames)
+    if not filenames:
+        return
     conn = sqlite3.connect("library.db")
     c = conn.cursor()
-    c.execute("SELECT filename FROM songs")
-    for row in c.fetchall():
-        valid.add(row[0])
+    c.execute("CREATE TEMP TABLE removed_names (filename TEXT PRIMARY KEY) WITHOUT ROWID")
+    c.executemany("INSERT INTO temp.removed_names (filename) VALUES (?)", [(fn,) for fn in filenames])
+    c.execute("SELECT filename FROM temp.removed_names r WHERE EXISTS (SELECT 1 FROM songs s WHERE s.filename = r.filename)")
+    filenames -= {row[0] for row in c.fetchall()}
+    # A CDG's stream info is that of its MP3.
+    probed_names = filenames | {os.path.splitext(fn)[0] + ".mp3" for fn in filenames if fn.casefold().endswith(".cdg")}
+    c.executemany("DELETE FROM media_info WHERE filename = ?", [(fn,) for fn in probed_names])
+    conn.commit()
     conn.close()
-    thumbs_dir = Path("thumbs")
-    if thumbs_dir.exists():
-        for thumb in thumbs_dir.iterdir():
-            if thumb.is_file() and thumb.suffix.lower() == ".jpg":
-                base = os.path.splitext(thumb.name)[0]
-                if base not in valid:
-                    try:
-                        thumb.unlink()
-                    except Exception as e:
-                        log_error(f"Failed to delete thumbnail {thumb}: {e}")
+    if not filenames or not os.path.isdir(temp_folder):
+        return
+    # Renders are named <stem>_Key<n>_Tempo<n><ext>, see SongItem.get_combined_shifted_audio_path.
+    prefixes = tuple(os.path.splitext(fn)[0] + sep for fn in filenames for sep in ("_Key", "_Tempo"))
+    for entry in os.scandir(temp_folder):
+        if entry.is_file() and entry.name.startswith(prefixes):
+            try:
+                os.unlink(entry.path)
+            except Exception as e:
+                log_error(f"Failed to delete render {entry.path}: {e}")
 
 def log_error(message: str):
     try:
@@ -170,6 +739,1652 @@ def parse_filename_for_artist_song(filename: str):
     else:
         return "Unknown Artist", base.strip()
 
+def search_key(text):
+    """Fold text for searching: compatibility-decomposed, diacritics dropped, casefolded ("Beyoncé" -> "beyonce")."""
+    if not text:
+        return ""
+    if text.isascii():
+        return text.lower()
+    return "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch)).casefold()
+
+PROGRESS_INTERVAL_SECONDS = 0.25
+
+def open_library_db(path="library.db"):
+    """Connect to the library database with the pragmas used for scanning.
+
+    WAL lets the UI keep reading while a scan writes, and with WAL a
+    synchronous=NORMAL commit no longer waits on an fsync per batch.
+    """
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+class ProgressThrottle:
+    """Forwards progress to callback at most once per interval."""
+    def __init__(self, callback, interval=PROGRESS_INTERVAL_SECONDS):
+        self.callback = callback
+        self.interval = interval
+        self._last = 0.0
+
+    def __call__(self, value):
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.callback(value)
+
+    def finish(self, value):
+        if self.callback is not None:
+            self.callback(value)
+
+def ensure_library_schema(conn):
+    c = conn.cursor()
+    c.execute("PRAGMA table_info(songs)")
+    song_columns = [row[1] for row in c.fetchall()]
+    legacy_songs = bool(song_columns) and "dir_id" not in song_columns
+    # Without AUTOINCREMENT SQLite hands a deleted maximum song_id to the next
+    # insert, and that song would inherit the old one's thumbnails and index entries.
+    c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'songs'")
+    row = c.fetchone()
+    reused_ids = bool(song_columns) and not legacy_songs and "AUTOINCREMENT" not in row[0].upper()
+    if legacy_songs or reused_ids:
+        c.execute("DROP VIEW IF EXISTS song_paths")
+        c.execute("DROP INDEX IF EXISTS idx_artist_title")
+        c.execute("DROP INDEX IF EXISTS idx_lib_name")
+        c.execute("DROP INDEX IF EXISTS idx_filename")
+    if legacy_songs:
+        c.execute("ALTER TABLE songs RENAME TO songs_old")
+    if reused_ids:
+        # The search index is rebuilt over the new table.
+        for trigger in ("songs_search_insert", "songs_search_delete", "songs_search_update"):
+            c.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        c.execute("DROP TABLE IF EXISTS song_search")
+        c.execute("ALTER TABLE songs RENAME TO songs_rowid")
+    c.execute("CREATE TABLE IF NOT EXISTS directories (dir_id INTEGER PRIMARY KEY, lib_name TEXT NOT NULL, rel_dir TEXT NOT NULL, mtime_ns INTEGER, scan_id INTEGER, UNIQUE(lib_name, rel_dir))")
+    c.execute("CREATE TABLE IF NOT EXISTS songs (song_id INTEGER PRIMARY KEY AUTOINCREMENT, lib_name TEXT NOT NULL, dir_id INTEGER NOT NULL, filename TEXT NOT NULL, extension TEXT, artist TEXT, title TEXT, duration_ms INTEGER DEFAULT 0, size INTEGER, mtime_ns INTEGER, artist_key TEXT, title_key TEXT, UNIQUE(dir_id, filename))")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_lib_name ON songs (lib_name)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_artist_title ON songs (artist, title)")
+    # Looking songs up by bare file name, e.g. before dropping a removed song's renders.
+    c.execute("CREATE INDEX IF NOT EXISTS idx_filename ON songs (filename)")
+    c.execute("""
+        CREATE VIEW IF NOT EXISTS song_paths AS
+        SELECT s.*, CASE d.rel_dir WHEN '' THEN s.filename ELSE d.rel_dir || '/' || s.filename END AS rel_path
+        FROM songs s JOIN directories d ON d.dir_id = s.dir_id
+    """)
+    c.execute("CREATE TABLE IF NOT EXISTS libraries (lib_name TEXT PRIMARY KEY, paths TEXT, sort_index INTEGER DEFAULT 0)")
+    c.execute("PRAGMA table_info(libraries)")
+    if "scan_workers" not in [row[1] for row in c.fetchall()]:
+        c.execute(f"ALTER TABLE libraries ADD COLUMN scan_workers INTEGER DEFAULT {DEFAULT_SCAN_WORKERS}")
+    c.execute("CREATE TABLE IF NOT EXISTS scan_checkpoints (lib_name TEXT PRIMARY KEY, folder TEXT, full INTEGER, scan_id INTEGER, pending_dirs TEXT, updated_ns INTEGER)")
+    # Durations of rows a scan removed, kept until it ends so moved files need no new probe.
+    c.execute("CREATE TABLE IF NOT EXISTS scan_moved_durations (lib_name TEXT NOT NULL, scan_id INTEGER, filename TEXT NOT NULL, size INTEGER, duration_ms INTEGER)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_moved_filename ON scan_moved_durations (filename)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS media_info (
+            filename TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+            duration_ms INTEGER, container TEXT, video_codec TEXT, width INTEGER, height INTEGER,
+            audio_codec TEXT, sample_rate INTEGER, channels INTEGER, bitrate INTEGER, moov_at_front INTEGER,
+            PRIMARY KEY(filename, size, mtime_ns)
+        ) WITHOUT ROWID
+    """)
+    if legacy_songs:
+        _migrate_legacy_songs(c)
+    if reused_ids:
+        _migrate_song_ids(conn, c, song_columns)
+    _ensure_search_keys(conn, c)
+    _ensure_song_search(c)
+    conn.commit()
+
+def _migrate_song_ids(conn, c, columns):
+    """Copy songs_rowid into the AUTOINCREMENT songs table, keeping every song_id."""
+    column_list = ", ".join(columns)
+    c.execute(f"INSERT INTO songs ({column_list}) SELECT {column_list} FROM songs_rowid")
+    c.execute("DROP TABLE songs_rowid")
+    # Thumbnails of songs deleted before now may carry ids above the current maximum.
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    thumbs_path = os.path.join(os.path.dirname(db_path), THUMBS_DB_FILE) if db_path else ""
+    if not os.path.isfile(thumbs_path):
+        return
+    try:
+        tconn = sqlite3.connect(thumbs_path, timeout=10)
+        try:
+            highest = max((tconn.execute(f"SELECT MAX(song_id) FROM {table}").fetchone()[0] or 0)
+                          for table in ("thumbnails", "sprites"))
+        finally:
+            tconn.close()
+    except sqlite3.Error as e:
+        log_error(f"Failed to read thumbnail ids from {thumbs_path}: {e}")
+        return
+    c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'songs'")
+    row = c.fetchone()
+    if row is None:
+        c.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('songs', ?)", (highest,))
+    elif highest > row[0]:
+        c.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'songs'", (highest,))
+
+def _ensure_search_keys(conn, c):
+    """Add the artist_key/title_key columns if missing and fill in rows written without them."""
+    c.execute("PRAGMA table_info(songs)")
+    columns = [row[1] for row in c.fetchall()]
+    for column in ("artist_key", "title_key"):
+        if column not in columns:
+            c.execute(f"ALTER TABLE songs ADD COLUMN {column} TEXT")
+    conn.create_function("search_key", 1, search_key, deterministic=True)
+    c.execute("UPDATE songs SET artist_key = search_key(artist), title_key = search_key(title) WHERE artist_key IS NULL OR title_key IS NULL")
+
+def _ensure_song_search(c):
+    """Create the song_search trigram index over songs.artist_key/title_key and the triggers that keep it in step."""
+    if has_song_search(c):
+        c.execute("PRAGMA table_info(song_search)")
+        if "artist_key" in [row[1] for row in c.fetchall()]:
+            return
+        # Built over the raw artist/title columns; index the folded keys instead.
+        for trigger in ("songs_search_insert", "songs_search_delete", "songs_search_update"):
+            c.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        c.execute("DROP TABLE song_search")
+    try:
+        c.execute("CREATE VIRTUAL TABLE song_search USING fts5(artist_key, title_key, content='songs', content_rowid='song_id', tokenize='trigram')")
+    except sqlite3.OperationalError as e:
+        # SQLite without FTS5 or older than 3.34; searches keep using LIKE.
+        log_error(f"Search index not available: {e}")
+        return
+    c.execute("""
+        CREATE TRIGGER songs_search_insert AFTER INSERT ON songs BEGIN
+            INSERT INTO song_search (rowid, artist_key, title_key) VALUES (new.song_id, new.artist_key, new.title_key);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER songs_search_delete AFTER DELETE ON songs BEGIN
+            INSERT INTO song_search (song_search, rowid, artist_key, title_key) VALUES ('delete', old.song_id, old.artist_key, old.title_key);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER songs_search_update AFTER UPDATE OF artist_key, title_key ON songs BEGIN
+            INSERT INTO song_search (song_search, rowid, artist_key, title_key) VALUES ('delete', old.song_id, old.artist_key, old.title_key);
+            INSERT INTO song_search (rowid, artist_key, title_key) VALUES (new.song_id, new.artist_key, new.title_key);
+        END
+    """)
+    c.execute("INSERT INTO song_search (song_search) VALUES ('rebuild')")
+
+def has_song_search(c):
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'song_search'")
+    return c.fetchone() is not None
+
+def song_search_filter(c, song_text, artist_text, alias=""):
+    """Return an " AND ..." clause and its params keeping songs whose title and artist contain the given text.
+
+    Matching is a literal substring test on the search_key-folded columns, the
+    same test TwoFieldFilterProxyModel does in memory. Terms of three or more
+    characters are answered by the song_search trigram index; shorter ones
+    have no trigram to look up and use instr on songs.
+    """
+    indexed = has_song_search(c)
+    clause = ""
+    params = []
+    phrases = []
+    for col, text in (("title_key", search_key(song_text)), ("artist_key", search_key(artist_text))):
+        if not text:
+            continue
+        if indexed and len(text) >= 3:
+            phrases.append(f'{col} : "' + text.replace('"', '""') + '"')
+        else:
+            clause += f" AND instr({alias}{col}, ?) > 0"
+            params.append(text)
+    if phrases:
+        clause += f" AND {alias}song_id IN (SELECT rowid FROM song_search WHERE song_search MATCH ?)"
+        params.append(" AND ".join(phrases))
+    return clause, params
+
+FUZZY_MAX_RESULTS = 200
+FUZZY_CANDIDATES = 300
+FUZZY_MAX_KEY_LENGTH = 80
+FUZZY_MAX_BLOCKS = 8
+
+def _trigram_block(keys, base=0):
+    """Posting lists (grams, offsets, rows) of the padded trigrams in keys, row numbers starting at base.
+
+    A trigram is its three code points packed into one int64, so the whole
+    block is built with array operations instead of a dict per key.
+    """
+    text = "\0".join(f" {k} " for k in keys)
+    cps = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    rows = np.cumsum(cps == 0)[:-2] + base
+    codes = (cps[:-2] << 42) | (cps[1:-1] << 21) | cps[2:]
+    inside = (cps[:-2] != 0) & (cps[1:-1] != 0) & (cps[2:] != 0)
+    codes = codes[inside]
+    rows = rows[inside]
+    order = np.lexsort((rows, codes))
+    codes = codes[order]
+    rows = rows[order]
+    # A trigram repeated within one key counts once.
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+    codes = codes[first]
+    rows = rows[first].astype(np.int32)
+    grams, starts = np.unique(codes, return_index=True)
+    return grams, np.append(starts, len(codes)), rows
+
+def _substring_distance(query, keys):
+    """Fewest edits turning query into some substring of each key (Sellers' algorithm), vectorized over keys."""
+    q = np.frombuffer(query.encode("utf-32-le"), dtype=np.uint32)
+    m = len(q)
+    width = min(max((len(k) for k in keys), default=0), FUZZY_MAX_KEY_LENGTH)
+    chars = np.zeros((len(keys), width), dtype=np.uint32)
+    lengths = np.zeros(len(keys), dtype=np.int32)
+    for r, key in enumerate(keys):
+        key = key[:width]
+        chars[r, :len(key)] = np.frombuffer(key.encode("utf-32-le"), dtype=np.uint32)
+        lengths[r] = len(key)
+    prev = np.repeat(np.arange(m + 1, dtype=np.int32)[:, None], len(keys), axis=1)
+    best = prev[m].copy()
+    for j in range(width):
+        cur = np.empty_like(prev)
+        cur[0] = 0
+        mismatch = (chars[:, j][None, :] != q[:, None]).astype(np.int32)
+        for i in range(1, m + 1):
+            cur[i] = np.minimum(np.minimum(prev[i], cur[i - 1]) + 1, prev[i - 1] + mismatch[i - 1])
+        best = np.where(j < lengths, np.minimum(best, cur[m]), best)
+        prev = cur
+    return best
+
+class FuzzySongIndex:
+    """Typo-tolerant title/artist search over the artist_key/title_key columns of songs.
+
+    Each column gets a trigram index: one block of posting lists for the bulk
+    load, plus a small block per refresh() that found new songs, merged back
+    into one once there are FUZZY_MAX_BLOCKS of them. Deleted songs are only
+    masked out. A search counts shared trigrams per song with bincount, keeps
+    the FUZZY_CANDIDATES best and ranks those by edit distance, so
+    "bohemain rapsody" finds "Bohemian Rhapsody".
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.ready = False
+        self._song_ids = np.zeros(0, dtype=np.int64)
+        self._libs = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._lib_codes = {}
+        self._keys = {"title": [], "artist": []}
+        self._blocks = {"title": [], "artist": []}
+
+    def refresh(self, conn):
+        """Index songs added since the last call and drop the ones that were deleted.
+
+        Diffing id sets is enough because songs.song_id is AUTOINCREMENT and
+        never reused, and a song's keys only change with its filename, which
+        gives it a new row.
+        """
+        with self._refresh_lock:
+            c = conn.cursor()
+            c.execute("SELECT song_id FROM songs")
+            current = np.fromiter((row[0] for row in c), dtype=np.int64)
+            with self._lock:
+                known = self._song_ids[self._alive]
+            gone = np.isin(self._song_ids, current, invert=True)
+            rows = []
+            for batch in iter_batches(np.setdiff1d(current, known).tolist(), 500):
+                c.execute(f"SELECT song_id, lib_name, artist_key, title_key FROM songs WHERE song_id IN ({','.join('?' * len(batch))})", batch)
+                rows.extend(c.fetchall())
+            with self._lock:
+                self._alive[gone] = False
+            self.add_rows(rows)
+            self.ready = True
+
+    def add_rows(self, rows):
+        """Append (song_id, lib_name, artist_key, title_key) rows."""
+        if not rows:
+            return
+        base = len(self._song_ids)
+        song_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        libs = np.array([self._lib_codes.setdefault(row[1], len(self._lib_codes)) for row in rows], dtype=np.int32)
+        new_keys = {"artist": [row[2] or "" for row in rows], "title": [row[3] or "" for row in rows]}
+        blocks = {}
+        for field, keys in new_keys.items():
+            if len(self._blocks[field]) + 1 >= FUZZY_MAX_BLOCKS:
+                blocks[field] = [_trigram_block(self._keys[field] + keys)]
+            else:
+                blocks[field] = self._blocks[field] + [_trigram_block(keys, base)]
+        with self._lock:
+            self._song_ids = np.concatenate([self._song_ids, song_ids])
+            self._libs = np.concatenate([self._libs, libs])
+            self._alive = np.concatenate([self._alive, np.ones(len(rows), dtype=bool)])
+            for field, keys in new_keys.items():
+                self._keys[field] = self._keys[field] + keys
+                self._blocks[field] = blocks[field]
+
+    def rename_library(self, old_name, new_name):
+        with self._lock:
+            if old_name in self._lib_codes:
+                self._lib_codes[new_name] = self._lib_codes.pop(old_name)
+
+    def _trigram_counts(self, field, query, size):
+        grams = _trigram_block([query])[0]
+        postings = []
+        for block_grams, offsets, rows in self._blocks[field]:
+            if not len(block_grams):
+                continue
+            idx = np.minimum(np.searchsorted(block_grams, grams), len(block_grams) - 1)
+            for i in idx[block_grams[idx] == grams]:
+                postings.append(rows[offsets[i]:offsets[i + 1]])
+        if not postings:
+            return np.zeros(size, dtype=np.int32)
+        return np.bincount(np.concatenate(postings), minlength=size)[:size].astype(np.int32)
+
+    def search(self, song_text, artist_text, lib_names=None, limit=FUZZY_MAX_RESULTS):
+        """Return up to limit song_ids whose title and artist approximately contain the given text, best first."""
+        queries = [(field, search_key(text).strip()) for field, text in (("title", song_text), ("artist", artist_text))]
+        queries = [(field, q) for field, q in queries if q]
+        if not queries:
+            return []
+        with self._lock:
+            size = len(self._song_ids)
+            score = np.zeros(size, dtype=np.int32)
+            mask = self._alive.copy()
+            for field, q in queries:
+                counts = self._trigram_counts(field, q, size)
+                score += counts
+                mask &= counts > 0
+            if lib_names is not None:
+                mask &= np.isin(self._libs, [self._lib_codes[name] for name in lib_names if name in self._lib_codes])
+            candidates = np.flatnonzero(mask)
+            if len(candidates) > FUZZY_CANDIDATES:
+                candidates = candidates[np.argpartition(-score[candidates], FUZZY_CANDIDATES)[:FUZZY_CANDIDATES]]
+            keys = {field: [self._keys[field][r] for r in candidates] for field, _ in queries}
+            song_ids = self._song_ids[candidates]
+            score = score[candidates]
+        if not len(candidates):
+            return []
+        error = np.zeros(len(candidates))
+        close = np.ones(len(candidates), dtype=bool)
+        for field, q in queries:
+            distance = _substring_distance(q, keys[field])
+            close &= distance <= max(1, len(q) // 3)
+            error += distance / len(q)
+        order = np.lexsort((-score, error))
+        return song_ids[order[close[order]]][:limit].tolist()
+
+class _TextColumn:
+    """Strings stored as one "\\0"-joined text plus row offsets, the way Arrow lays out a string column."""
+    def __init__(self, values):
+        self.text = "\0".join(values) + "\0"
+        self.starts = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter((len(v) + 1 for v in values), dtype=np.int64, count=len(values)), out=self.starts[1:])
+
+    def __getitem__(self, row):
+        return self.text[self.starts[row]:self.starts[row + 1] - 1]
+
+    def contains(self, needle):
+        """Boolean mask of the rows containing needle, from one regex pass over the whole column."""
+        hits = np.fromiter((m.start() for m in re.finditer(re.escape(needle), self.text)), dtype=np.int64)
+        mask = np.zeros(len(self.starts) - 1, dtype=bool)
+        mask[np.searchsorted(self.starts, hits, side="right") - 1] = True
+        return mask
+
+def _dense_rank(values):
+    order = {value: i for i, value in enumerate(sorted(set(values)))}
+    return np.fromiter((order[value] for value in values), dtype=np.int32, count=len(values))
+
+class LibraryColumns:
+    """Every song of library.db in array-backed columns, so the library view can filter and sort without SQL.
+
+    Loaded in one pass (on a background thread by the caller) and replaced
+    wholesale when the library changes. Filters are the same literal
+    substring test on the search_key columns as song_search_filter. Each
+    sort order is computed once over all rows and then only filtered, so
+    select() is a few vectorized scans and one gather.
+    """
+    def __init__(self, conn):
+        c = conn.cursor()
+        c.execute("SELECT dir_id, rel_dir FROM directories")
+        self.rel_dirs = dict(c.fetchall())
+        c.execute("SELECT lib_name, sort_index FROM libraries")
+        self.lib_sort_index = dict(c.fetchall())
+        c.execute("SELECT song_id, lib_name, dir_id, filename, extension, artist, title, duration_ms, artist_key, title_key "
+                  "FROM songs ORDER BY song_id")
+        rows = c.fetchall()
+        self.lib_names = sorted({row[1] for row in rows})
+        lib_codes = {name: i for i, name in enumerate(self.lib_names)}
+        self.extensions = sorted({row[4] or "" for row in rows})
+        ext_codes = {ext: i for i, ext in enumerate(self.extensions)}
+        self.song_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        self.libs = np.fromiter((lib_codes[row[1]] for row in rows), dtype=np.int32, count=len(rows))
+        self.path_ids = np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows))
+        self.extension = np.fromiter((ext_codes[row[4] or ""] for row in rows), dtype=np.int32, count=len(rows))
+        self.duration_ms = np.fromiter((row[7] or 0 for row in rows), dtype=np.int64, count=len(rows))
+        self.filename = _TextColumn([row[3] for row in rows])
+        self.artist = _TextColumn([row[5] or "" for row in rows])
+        self.title = _TextColumn([row[6] or "" for row in rows])
+        artist_keys = [row[8] or "" for row in rows]
+        title_keys = [row[9] or "" for row in rows]
+        self.artist_key = _TextColumn(artist_keys)
+        self.title_key = _TextColumn(title_keys)
+        self.artist_rank = _dense_rank(artist_keys)
+        self.title_rank = _dense_rank(title_keys)
+        self._orders = {}
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    def select(self, lib_names, song_text, artist_text, sort_column=1, descending=False, grouped=False):
+        """Row numbers of the songs in lib_names matching both filters, in display order."""
+        mask = np.isin(self.libs, [i for i, name in enumerate(self.lib_names) if name in lib_names])
+        for column, text in ((self.title_key, search_key(song_text)), (self.artist_key, search_key(artist_text))):
+            if text:
+                mask &= column.contains(text)
+        order = self._order(sort_column, descending, grouped)
+        return order[mask[order]]
+
+    def _order(self, sort_column, descending, grouped):
+        key = (None, False, True) if grouped else (sort_column, descending, False)
+        order = self._orders.get(key)
+        if order is None:
+            sign = -1 if descending else 1
+            if grouped:
+                lib_order = np.array([self.lib_sort_index.get(name) or 0 for name in self.lib_names], dtype=np.int64)
+                keys = (self.title_rank, self.artist_rank, lib_order[self.libs])
+            elif sort_column == 0:
+                keys = (sign * self.title_rank,)
+            elif sort_column == 2:
+                keys = (sign * self.duration_ms,)
+            elif sort_column == 3:
+                keys = (sign * self.extension,)
+            else:
+                keys = (self.title_rank, sign * self.artist_rank)
+            order = self._orders[key] = np.lexsort(keys)
+        return order
+
+    def song_item(self, row, library_map):
+        lib_name = self.lib_names[self.libs[row]]
+        rel_dir = self.rel_dirs.get(int(self.path_ids[row]), "")
+        filename = self.filename[row]
+        rel_path = f"{rel_dir}/{filename}" if rel_dir else filename
+        si = SongItem(str(Path(library_map.get(lib_name, "")) / rel_path), self.extensions[self.extension[row]],
+                      self.artist[row], self.title[row], int(self.duration_ms[row]))
+        si.lib_name = lib_name
+        si.song_id = int(self.song_ids[row])
+        si.artist_key = self.artist_key[row]
+        si.title_key = self.title_key[row]
+        return si
+
+    def set_duration(self, song_id, duration_ms):
+        row = np.searchsorted(self.song_ids, song_id)
+        if row < len(self.song_ids) and self.song_ids[row] == song_id:
+            self.duration_ms[row] = duration_ms
+            self._orders = {key: order for key, order in self._orders.items() if key[0] != 2}
+
+def _migrate_legacy_songs(c):
+    """Move songs keyed by bare filename into the directories/songs layout.
+
+    Files the fingerprint tables know about get their real directory. Rows
+    that were never fingerprinted go to the library root without a size, and
+    every directory of such a library loses its mtime, so the next scan lists
+    each folder and files the songs where they actually are.
+    """
+    def table_exists(name):
+        c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+        return c.fetchone() is not None
+
+    songs = {}
+    c.execute("SELECT lib_name, filename, extension, artist, title, duration_ms FROM songs_old")
+    for lib_name, fn, extension, artist, title, dur in c.fetchall():
+        old = songs.get((lib_name, fn))
+        if old is None or (dur or 0) > old[3]:
+            songs[(lib_name, fn)] = (extension, artist, title, dur or 0)
+    files = {}
+    if table_exists("file_fingerprints"):
+        c.execute("SELECT lib_name, rel_path, size, mtime_ns FROM file_fingerprints")
+        files = {(lib_name, rel_path): (size, mtime_ns) for lib_name, rel_path, size, mtime_ns in c.fetchall()}
+    dirs = {}
+    if table_exists("dir_fingerprints"):
+        c.execute("PRAGMA table_info(dir_fingerprints)")
+        scan_id = "scan_id" if "scan_id" in [row[1] for row in c.fetchall()] else "NULL"
+        c.execute(f"SELECT lib_name, rel_dir, mtime_ns, {scan_id} FROM dir_fingerprints")
+        dirs = {(lib_name, rel_dir): (mtime_ns, sid) for lib_name, rel_dir, mtime_ns, sid in c.fetchall()}
+
+    rows = []
+    placed = set()
+    for (lib_name, rel_path), (size, mtime_ns) in files.items():
+        rel_dir, _, fn = rel_path.rpartition("/")
+        extension, artist, title, dur = songs.get((lib_name, fn)) or song_row_for_file(lib_name, rel_path)[2:]
+        rows.append((lib_name, rel_dir, fn, extension, artist, title, dur or 0, size, mtime_ns))
+        placed.add((lib_name, fn))
+    stale_libs = set()
+    for (lib_name, fn), (extension, artist, title, dur) in songs.items():
+        if (lib_name, fn) not in placed:
+            rows.append((lib_name, "", fn, extension, artist, title, dur, None, None))
+            stale_libs.add(lib_name)
+    for lib_name, rel_dir, *_ in rows:
+        dirs.setdefault((lib_name, rel_dir), (None, None))
+    for lib_name in {lib_name for lib_name, _ in dirs}:
+        dirs.setdefault((lib_name, ""), (None, None))
+
+    c.executemany("INSERT INTO directories (lib_name, rel_dir, mtime_ns, scan_id) VALUES (?, ?, ?, ?)",
+                  [(lib_name, rel_dir, None if lib_name in stale_libs else mtime_ns, sid)
+                   for (lib_name, rel_dir), (mtime_ns, sid) in dirs.items()])
+    c.executemany("""
+        INSERT OR IGNORE INTO songs (lib_name, dir_id, filename, extension, artist, title, duration_ms, size, mtime_ns)
+        SELECT ?, dir_id, ?, ?, ?, ?, ?, ?, ? FROM directories WHERE lib_name = ? AND rel_dir = ?
+    """, [(lib_name, fn, extension, artist, title, dur, size, mtime_ns, lib_name, rel_dir)
+          for lib_name, rel_dir, fn, extension, artist, title, dur, size, mtime_ns in rows])
+    c.execute("DROP TABLE songs_old")
+    c.execute("DROP TABLE IF EXISTS file_fingerprints")
+    c.execute("DROP TABLE IF EXISTS dir_fingerprints")
+    c.execute("DELETE FROM scan_checkpoints")
+
+def library_scan_workers(conn, lib_name):
+    c = conn.cursor()
+    c.execute("SELECT scan_workers FROM libraries WHERE lib_name = ?", (lib_name,))
+    row = c.fetchone()
+    if not row or not row[0]:
+        return DEFAULT_SCAN_WORKERS
+    return max(1, int(row[0]))
+
+def list_library_dir(folder, rel_dir=""):
+    """List one library directory in a single os.scandir pass.
+
+    Returns ({rel_path: (size, mtime_ns)} for supported media files, [rel subdir paths]).
+    Relative paths always use "/" separators.
+    """
+    supported = _SUPPORTED_EXTENSION_SET
+    abs_dir = os.path.join(folder, rel_dir) if rel_dir else folder
+    files = {}
+    subdirs = []
+    with os.scandir(abs_dir) as it:
+        for entry in it:
+            rel = entry.name if not rel_dir else rel_dir + "/" + entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(rel)
+                elif os.path.splitext(entry.name)[1].casefold() in supported:
+                    st = entry.stat()
+                    files[rel] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                continue
+    return files, subdirs
+
+def walk_dirs_parallel(visit, root, workers=1, start_dirs=("",)):
+    """Walk a directory tree, running visit(root, rel_dir) for its subtrees on a bounded thread pool.
+
+    visit returns (child rel_dirs, payload). Results are yielded as
+    (rel_dir, payload) on the calling thread, so a single writer can
+    consume them; with workers <= 1 the walk runs serially on that thread.
+    The walk begins at start_dirs.
+    """
+    if workers <= 1:
+        stack = list(start_dirs)
+        while stack:
+            rel_dir = stack.pop()
+            children, payload = visit(root, rel_dir)
+            stack.extend(children)
+            yield rel_dir, payload
+        return
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan")
+    try:
+        pending = {pool.submit(visit, root, d): d for d in start_dirs}
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in done:
+                rel_dir = pending.pop(fut)
+                children, payload = fut.result()
+                for child in children:
+                    pending[pool.submit(visit, root, child)] = child
+                yield rel_dir, payload
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _visit_library_dir(root, rel_dir):
+    try:
+        files, subdirs = list_library_dir(root, rel_dir)
+    except OSError as e:
+        log_error(f"Failed to list {os.path.join(root, rel_dir)}: {e}")
+        return [], {}
+    return subdirs, files
+
+def iter_library_files(folder, workers=1):
+    """Yield (rel_path, size, mtime_ns) for every supported media file below folder."""
+    for _, files in walk_dirs_parallel(_visit_library_dir, folder, workers):
+        for rel_path, (size, mtime_ns) in files.items():
+            yield rel_path, size, mtime_ns
+
+def iter_batches(iterable, size=SCAN_BATCH_SIZE):
+    it = iter(iterable)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+def song_row_for_file(lib_name, rel_path):
+    fn = rel_path.rpartition("/")[2]
+    extension = os.path.splitext(fn)[1].casefold()
+    artist, title = parse_filename_for_artist_song(fn)
+    return (lib_name, fn, extension, artist, title, 0)
+
+def library_rel_path(folder, full_path):
+    """Path of full_path inside folder with "/" separators, or None if it lies outside."""
+    try:
+        rel_path = os.path.relpath(full_path, folder)
+    except ValueError:
+        return None
+    if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+        return None
+    return Path(rel_path).as_posix()
+
+def find_song_id(c, lib_name, rel_path):
+    rel_dir, _, fn = rel_path.rpartition("/")
+    c.execute("SELECT s.song_id FROM songs s JOIN directories d ON d.dir_id = s.dir_id "
+              "WHERE d.lib_name = ? AND d.rel_dir = ? AND s.filename = ?", (lib_name, rel_dir, fn))
+    row = c.fetchone()
+    return row[0] if row else None
+
+# Directory mtimes this close to the scan start may still change within the
+# filesystem's timestamp granularity (2s on FAT32), so they are not trusted.
+RACY_MTIME_WINDOW_NS = 2_000_000_000
+
+class LibraryScanResult:
+    """What a scan changed. added, removed and modified are counts; only a
+    result made with keep_paths=True, as the watcher's, also lists the paths."""
+    def __init__(self, library_name, keep_paths=False):
+        self.library_name = library_name
+        self.added = 0
+        self.removed = 0
+        self.modified = 0
+        self.added_paths = [] if keep_paths else None
+        self.removed_paths = [] if keep_paths else None
+        self.added_song_ids = {}
+        self.removed_songs = []
+        self.removed_song_ids = []
+        self.new_dirs = []
+        self.dirs_listed = 0
+        self.dirs_skipped = 0
+        self.cancelled = False
+        self.resumed = False
+        self.manifest_error = None
+
+    def __repr__(self):
+        return f"LibraryScanResult({self.library_name}: +{self.added} -{self.removed} ~{self.modified})"
+
+    def summary(self):
+        return f"{self.added} added, {self.removed} removed, {self.modified} modified"
+
+    def collect(self, writer):
+        """Take the song ids and file names the writer touched, once it has flushed."""
+        self.added_song_ids = writer.added_song_ids
+        self.removed_song_ids = writer.removed_song_ids
+        self.removed = len(writer.removed_song_ids)
+        self.removed_songs = sorted(writer.removed_filenames)
+
+class LibraryBulkWriter:
+    """Buffers the row changes of a library scan and writes them in batches.
+
+    Files are addressed by their "/"-separated path relative to the library
+    folder; the writer interns the directory part in the directories table.
+    Each flush runs inside one explicit transaction, so a batch is either
+    fully applied or not at all. Upserts and removals are staged in temp
+    tables and applied with one statement each: FTS5 flushes its pending
+    terms at every statement, so a per-row executemany would write one
+    song_search segment per song. The durations of removed rows are kept in
+    scan_moved_durations, committed with the batch that removed them, until
+    carry_over_durations; a resumed scan passes the same scan_id to use
+    those of its earlier run.
+    """
+    def __init__(self, conn, library_name, batch_size=SCAN_BATCH_SIZE, dir_ids=None, scan_id=None):
+        self.conn = conn
+        self.library_name = library_name
+        self.scan_id = scan_id
+        self.batch_size = batch_size
+        self.dir_ids = dir_ids if dir_ids is not None else {}
+        self.upserts = []
+        self.reset_durations = []
+        self.removed = []
+        self.removed_dirs = []
+        self.dir_marks = []
+        self.checkpoint = None
+        self.removed_song_ids = []
+        self.removed_filenames = set()
+        self.new_files = {}
+        self.added_song_ids = {}
+
+    def pending(self):
+        return len(self.upserts) + len(self.removed)
+
+    def dir_id(self, rel_dir, create=True):
+        dir_id = self.dir_ids.get(rel_dir)
+        if dir_id is None:
+            c = self.conn.cursor()
+            if create:
+                c.execute("INSERT INTO directories (lib_name, rel_dir) VALUES (?, ?) ON CONFLICT(lib_name, rel_dir) DO NOTHING",
+                          (self.library_name, rel_dir))
+            c.execute("SELECT dir_id FROM directories WHERE lib_name = ? AND rel_dir = ?", (self.library_name, rel_dir))
+            row = c.fetchone()
+            if row is None:
+                return None
+            dir_id = self.dir_ids[rel_dir] = row[0]
+        return dir_id
+
+    def _key(self, rel_path):
+        rel_dir, _, fn = rel_path.rpartition("/")
+        return self.dir_id(rel_dir), fn
+
+    def add_file(self, rel_path, size, mtime_ns, duration_ms=0, new=False):
+        """Upsert a file; pass new=True to have its song_id reported in added_song_ids."""
+        dir_id, fn = self._key(rel_path)
+        if new:
+            self.new_files[(dir_id, fn)] = rel_path
+        _, _, extension, artist, title, _ = song_row_for_file(self.library_name, rel_path)
+        if extension == ".cdg" and not duration_ms and size:
+            duration_ms = cdg_duration_ms(size)
+        self.upserts.append((self.library_name, dir_id, fn, extension, artist, title, duration_ms, size, mtime_ns,
+                             search_key(artist), search_key(title)))
+        self.maybe_flush()
+
+    def reset_duration(self, rel_path):
+        self.reset_durations.append(self._key(rel_path))
+
+    def remove_file(self, rel_path):
+        self.removed.append(self._key(rel_path))
+        self.maybe_flush()
+
+    def remove_dir(self, rel_dir):
+        """Drop a directory together with every song still recorded in it."""
+        dir_id = self.dir_id(rel_dir, create=False)
+        if dir_id is not None:
+            self.removed_dirs.append((dir_id,))
+            del self.dir_ids[rel_dir]
+
+    def mark_dir(self, rel_dir, mtime_ns, scan_id=None):
+        self.dir_marks.append((mtime_ns, scan_id, self.dir_id(rel_dir)))
+
+    def maybe_flush(self):
+        if self.pending() >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+        c = self.conn.cursor()
+        if self.reset_durations:
+            # Before the upserts, so a changed CDG keeps the duration derived from its new size.
+            c.executemany("UPDATE songs SET duration_ms = 0 WHERE dir_id = ? AND filename = ?", self.reset_durations)
+        if self.upserts:
+            c.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS song_upserts (
+                    lib_name, dir_id, filename, extension, artist, title, duration_ms, size, mtime_ns, artist_key, title_key
+                )
+            """)
+            c.executemany("INSERT INTO temp.song_upserts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self.upserts)
+            c.execute("""
+                INSERT INTO songs (lib_name, dir_id, filename, extension, artist, title, duration_ms, size, mtime_ns, artist_key, title_key)
+                SELECT * FROM temp.song_upserts WHERE true
+                ON CONFLICT(dir_id, filename) DO UPDATE SET
+                    extension = excluded.extension, artist = excluded.artist, title = excluded.title,
+                    artist_key = excluded.artist_key, title_key = excluded.title_key,
+                    size = excluded.size, mtime_ns = excluded.mtime_ns,
+                    duration_ms = CASE WHEN excluded.duration_ms > 0 THEN excluded.duration_ms ELSE songs.duration_ms END
+            """)
+            if self.new_files:
+                c.execute("SELECT dir_id, filename, song_id FROM songs WHERE (dir_id, filename) IN (SELECT dir_id, filename FROM temp.song_upserts)")
+                for dir_id, fn, song_id in c.fetchall():
+                    rel_path = self.new_files.pop((dir_id, fn), None)
+                    if rel_path is not None:
+                        self.added_song_ids[rel_path] = song_id
+            c.execute("DELETE FROM temp.song_upserts")
+        if self.removed:
+            c.execute("CREATE TEMP TABLE IF NOT EXISTS song_removals (dir_id, filename)")
+            c.executemany("INSERT INTO temp.song_removals VALUES (?, ?)", self.removed)
+            # Collected so thumbnails can be dropped by id instead of by a full sweep.
+            c.execute("SELECT song_id, filename FROM songs WHERE (dir_id, filename) IN (SELECT dir_id, filename FROM temp.song_removals)")
+            self._note_removed(c.fetchall())
+            c.execute("INSERT INTO scan_moved_durations SELECT lib_name, ?, filename, size, duration_ms FROM songs "
+                      "WHERE (dir_id, filename) IN (SELECT dir_id, filename FROM temp.song_removals) AND duration_ms > 0",
+                      (self.scan_id,))
+            c.execute("DELETE FROM songs WHERE (dir_id, filename) IN (SELECT dir_id, filename FROM temp.song_removals)")
+            c.execute("DELETE FROM temp.song_removals")
+        if self.removed_dirs:
+            for key in self.removed_dirs:
+                c.execute("SELECT song_id, filename FROM songs WHERE dir_id = ?", key)
+                self._note_removed(c.fetchall())
+                c.execute("INSERT INTO scan_moved_durations SELECT lib_name, ?, filename, size, duration_ms FROM songs "
+                          "WHERE dir_id = ? AND duration_ms > 0", (self.scan_id, *key))
+            c.executemany("DELETE FROM songs WHERE dir_id = ?", self.removed_dirs)
+            c.executemany("DELETE FROM directories WHERE dir_id = ?", self.removed_dirs)
+        if self.dir_marks:
+            c.executemany("UPDATE directories SET mtime_ns = ?, scan_id = COALESCE(?, scan_id) WHERE dir_id = ?", self.dir_marks)
+        if self.checkpoint is not None:
+            # Committed with the batch, so a resumed scan never skips uncommitted work.
+            c.execute("UPDATE scan_checkpoints SET pending_dirs = ?, updated_ns = ? WHERE lib_name = ?",
+                      (json.dumps(sorted(self.checkpoint)), time.time_ns(), self.library_name))
+        self.conn.commit()
+        self.upserts = []
+        self.reset_durations = []
+        self.removed = []
+        self.removed_dirs = []
+        self.dir_marks = []
+
+    def _note_removed(self, rows):
+        for song_id, fn in rows:
+            self.removed_song_ids.append(song_id)
+            self.removed_filenames.add(fn)
+
+    def carry_over_durations(self):
+        """Give songs of this library without a duration the one of a removed row with the same file name.
+
+        Call after the last flush. A removed row of the same size wins over one
+        that only shares the name.
+        """
+        c = self.conn.cursor()
+        key = (self.library_name, self.scan_id)
+        c.execute("""
+            UPDATE songs SET duration_ms = COALESCE(
+                (SELECT m.duration_ms FROM scan_moved_durations m WHERE m.filename = songs.filename AND m.size = songs.size
+                 AND m.lib_name = ?1 AND m.scan_id IS ?2),
+                (SELECT m.duration_ms FROM scan_moved_durations m WHERE m.filename = songs.filename
+                 AND m.lib_name = ?1 AND m.scan_id IS ?2))
+            WHERE lib_name = ?1 AND duration_ms = 0
+            AND filename IN (SELECT filename FROM scan_moved_durations WHERE lib_name = ?1 AND scan_id IS ?2)
+        """, key)
+        c.execute("DELETE FROM scan_moved_durations WHERE lib_name = ? AND scan_id IS ?", key)
+        self.conn.commit()
+
+def _known_files_in(c, library_name, rel_dir):
+    c.execute("SELECT s.filename, s.size, s.mtime_ns FROM songs s JOIN directories d ON d.dir_id = s.dir_id "
+              "WHERE d.lib_name = ? AND d.rel_dir = ?", (library_name, rel_dir))
+    prefix = rel_dir + "/" if rel_dir else ""
+    return {prefix + fn: (size, mtime_ns) for fn, size, mtime_ns in c.fetchall()}
+
+def _known_dirs_under(c, library_name, rel_dir, direct_only):
+    if rel_dir:
+        # "0" sorts right after "/", so this range covers everything below rel_dir.
+        c.execute("SELECT rel_dir FROM directories WHERE lib_name = ? AND rel_dir >= ? AND rel_dir < ?",
+                  (library_name, rel_dir + "/", rel_dir + "0"))
+        skip = len(rel_dir) + 1
+    else:
+        c.execute("SELECT rel_dir FROM directories WHERE lib_name = ? AND rel_dir != ''", (library_name,))
+        skip = 0
+    return [d for (d,) in c.fetchall() if not direct_only or "/" not in d[skip:]]
+
+def refresh_library_dirs(conn, library_name, folder, rel_dirs):
+    """Re-list only the given library directories and apply their changes.
+
+    New subdirectories found on the way are walked completely; directories
+    that disappeared drop every song below them.
+    """
+    with library_scan_lock(library_name):
+        return _refresh_library_dirs(conn, library_name, folder, rel_dirs)
+
+def _refresh_library_dirs(conn, library_name, folder, rel_dirs):
+    result = LibraryScanResult(library_name, keep_paths=True)
+    c = conn.cursor()
+    writer = LibraryBulkWriter(conn, library_name)
+    now_ns = time.time_ns()
+    seen = set()
+    stack = list(dict.fromkeys(rel_dirs))
+    while stack:
+        rel_dir = stack.pop()
+        if rel_dir in seen:
+            continue
+        seen.add(rel_dir)
+        abs_dir = os.path.join(folder, rel_dir) if rel_dir else folder
+        try:
+            dir_mtime = os.stat(abs_dir).st_mtime_ns
+            listed, subdirs = list_library_dir(folder, rel_dir)
+        except OSError:
+            for gone_dir in [rel_dir] + _known_dirs_under(c, library_name, rel_dir, direct_only=False):
+                result.removed_paths.extend(_known_files_in(c, library_name, gone_dir))
+                writer.remove_dir(gone_dir)
+            continue
+        result.dirs_listed += 1
+        if dir_mtime >= now_ns - RACY_MTIME_WINDOW_NS:
+            dir_mtime = None
+        known = _known_files_in(c, library_name, rel_dir)
+        for rel_path, fp in listed.items():
+            old = known.get(rel_path)
+            if old == fp:
+                continue
+            if old is None:
+                result.added += 1
+                result.added_paths.append(rel_path)
+            else:
+                result.modified += 1
+                if old[0] is not None and old[0] != fp[0]:
+                    writer.reset_duration(rel_path)
+            writer.add_file(rel_path, *fp, new=old is None)
+        for rel_path in known:
+            if rel_path not in listed:
+                result.removed_paths.append(rel_path)
+                writer.remove_file(rel_path)
+        known_subdirs = set(_known_dirs_under(c, library_name, rel_dir, direct_only=True))
+        for sd in subdirs:
+            if sd not in known_subdirs:
+                result.new_dirs.append(sd)
+                stack.append(sd)
+        stack.extend(sd for sd in known_subdirs if sd not in subdirs)
+        writer.mark_dir(rel_dir, dir_mtime)
+    writer.flush()
+    writer.carry_over_durations()
+    result.collect(writer)
+    return result
+
+_scan_locks = {}
+_scan_locks_guard = threading.Lock()
+
+def library_scan_lock(library_name):
+    """One lock per library so a rescan and a watcher never write the same library at once."""
+    with _scan_locks_guard:
+        return _scan_locks.setdefault(library_name, threading.Lock())
+
+def has_scan_checkpoint(conn, library_name):
+    c = conn.cursor()
+    c.execute("SELECT 1 FROM scan_checkpoints WHERE lib_name = ?", (library_name,))
+    return c.fetchone() is not None
+
+def scan_library_incremental(conn, library_name, folder, full=False, progress_callback=None, workers=1, cancel_event=None):
+    """Rescan a library folder, only touching rows whose size or mtime changed.
+
+    Directories whose mtime matches the one stored in the directories table
+    are not listed again; their subdirectories are taken from that table and
+    only their known files are stat'ed, since overwriting a file in place
+    leaves the directory mtime alone. Pass full=True to list every directory
+    and re-check every file. Directory enumeration runs on up to `workers`
+    threads; changes are written in batches on the calling thread while the
+    walk is still running.
+
+    Each batch also commits the directories still waiting to be walked to
+    scan_checkpoints. A scan that is cancelled through cancel_event, or whose
+    folder disappears part-way, stops without deleting anything, and the next
+    call for the same folder continues from the checkpoint.
+    """
+    with library_scan_lock(library_name):
+        return _scan_library_incremental(conn, library_name, folder, full, progress_callback, workers, cancel_event)
+
+def _scan_library_incremental(conn, library_name, folder, full, progress_callback, workers, cancel_event):
+    result = LibraryScanResult(library_name)
+    if not os.path.isdir(folder):
+        log_error(f"Library folder not available, scan skipped: {folder}")
+        result.cancelled = True
+        return result
+    c = conn.cursor()
+    c.execute("SELECT folder, full, scan_id, pending_dirs FROM scan_checkpoints WHERE lib_name = ?", (library_name,))
+    checkpoint = c.fetchone()
+    if checkpoint and checkpoint[0] == folder:
+        full = full or bool(checkpoint[1])
+        scan_id = checkpoint[2]
+        start_dirs = json.loads(checkpoint[3])
+        result.resumed = True
+    else:
+        scan_id = time.time_ns()
+        start_dirs = [""]
+        # Left over from a checkpoint for another folder that will never resume.
+        c.execute("DELETE FROM scan_moved_durations WHERE lib_name = ? AND scan_id IS NOT NULL", (library_name,))
+        c.execute("INSERT OR REPLACE INTO scan_checkpoints (lib_name, folder, full, scan_id, pending_dirs, updated_ns) VALUES (?, ?, ?, ?, ?, ?)",
+                  (library_name, folder, int(full), scan_id, json.dumps(start_dirs), scan_id))
+        conn.commit()
+
+    # Only directories are held in memory; each directory's songs are read
+    # from the database when the walk reaches it.
+    c.execute("SELECT dir_id, rel_dir, mtime_ns, scan_id FROM directories WHERE lib_name = ?", (library_name,))
+    dir_ids = {}
+    known_dirs = {}
+    live_dirs = set()
+    for dir_id, rel_dir, mtime_ns, dir_scan_id in c.fetchall():
+        dir_ids[rel_dir] = dir_id
+        known_dirs[rel_dir] = mtime_ns
+        if dir_scan_id == scan_id:
+            # Already walked before this scan was interrupted.
+            live_dirs.add(rel_dir)
+    subdirs_by_dir = {}
+    for rel_dir in known_dirs:
+        if rel_dir:
+            subdirs_by_dir.setdefault(rel_dir.rpartition("/")[0], []).append(rel_dir)
+
+    # Skipped directories stat their known files on the walker threads, each
+    # reading the file names over its own connection.
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    readers = threading.local()
+    reader_conns = []
+    reader_lock = threading.Lock()
+
+    def known_filenames(dir_id):
+        reader = getattr(readers, "conn", None)
+        if reader is None:
+            reader = readers.conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+            with reader_lock:
+                reader_conns.append(reader)
+        return [fn for (fn,) in reader.execute("SELECT filename FROM songs WHERE dir_id = ?", (dir_id,))]
+
+    scan_started_ns = time.time_ns()
+
+    def visit(root, rel_dir):
+        abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+        try:
+            dir_mtime = os.stat(abs_dir).st_mtime_ns
+        except OSError:
+            return [], ("missing", None, None, [])
+        if dir_mtime >= scan_started_ns - RACY_MTIME_WINDOW_NS:
+            dir_mtime = None
+        if not full and dir_mtime is not None and known_dirs.get(rel_dir) == dir_mtime:
+            listed = {}
+            prefix = rel_dir + "/" if rel_dir else ""
+            for fn in known_filenames(dir_ids[rel_dir]):
+                try:
+                    st = os.stat(os.path.join(abs_dir, fn))
+                except OSError:
+                    continue
+                listed[prefix + fn] = (st.st_size, st.st_mtime_ns)
+            subdirs = subdirs_by_dir.get(rel_dir, [])
+            return subdirs, ("skipped", dir_mtime, listed, subdirs)
+        try:
+            listed, subdirs = list_library_dir(root, rel_dir)
+        except OSError as e:
+            log_error(f"Failed to list {abs_dir}: {e}")
+            # Keep what we knew about an unreadable directory rather than dropping its songs.
+            subdirs = subdirs_by_dir.get(rel_dir, [])
+            return subdirs, ("error", None, None, subdirs)
+        return subdirs, ("listed", dir_mtime, listed, subdirs)
+
+    writer = LibraryBulkWriter(conn, library_name, dir_ids=dir_ids, scan_id=scan_id)
+    frontier = set(start_dirs)
+    writer.checkpoint = frontier
+    progress = ProgressThrottle(progress_callback)
+    checked = 0
+    try:
+        for rel_dir, (status, dir_mtime, listed, children) in walk_dirs_parallel(visit, folder, workers, start_dirs):
+            if cancel_event is not None and cancel_event.is_set():
+                result.cancelled = True
+                break
+            if status == "listed" or status == "skipped":
+                if status == "listed":
+                    result.dirs_listed += 1
+                else:
+                    result.dirs_skipped += 1
+                known = {}
+                if rel_dir in known_dirs:
+                    prefix = rel_dir + "/" if rel_dir else ""
+                    c.execute("SELECT filename, size, mtime_ns FROM songs WHERE dir_id = ?", (dir_ids[rel_dir],))
+                    known = {prefix + fn: (size, mtime_ns) for fn, size, mtime_ns in c.fetchall()}
+                for rel_path, fp in listed.items():
+                    old = known.get(rel_path)
+                    if old == fp:
+                        continue
+                    if old is None:
+                        result.added += 1
+                    else:
+                        result.modified += 1
+                        # A touched or re-copied file keeps its duration; only a size change means new media.
+                        if old[0] is not None and old[0] != fp[0]:
+                            writer.reset_duration(rel_path)
+                    writer.add_file(rel_path, *fp)
+                for rel_path in known:
+                    if rel_path not in listed:
+                        writer.remove_file(rel_path)
+                checked += len(listed)
+            frontier.discard(rel_dir)
+            frontier.update(children)
+            if status != "missing":
+                live_dirs.add(rel_dir)
+                writer.mark_dir(rel_dir, dir_mtime, scan_id)
+            progress(checked)
+    finally:
+        for reader in reader_conns:
+            reader.close()
+
+    if not result.cancelled and not os.path.isdir(folder):
+        # The drive went away mid-scan; everything unvisited would look deleted.
+        log_error(f"Library folder disappeared during scan, will resume later: {folder}")
+        result.cancelled = True
+    writer.flush()
+    progress.finish(checked)
+    if result.cancelled:
+        result.collect(writer)
+        return result
+
+    for rel_dir in known_dirs:
+        if rel_dir not in live_dirs and not os.path.isdir(os.path.join(folder, rel_dir)):
+            writer.remove_dir(rel_dir)
+    writer.checkpoint = None
+    writer.flush()
+    writer.carry_over_durations()
+    result.collect(writer)
+    c.execute("DELETE FROM scan_checkpoints WHERE lib_name = ?", (library_name,))
+    conn.commit()
+    return result
+
+MANIFEST_SAMPLE_SIZE = 50
+
+def read_library_manifest(manifest_path, folder):
+    """Yield (rel_path, size, mtime_ns, duration_ms) for the media files listed in a manifest.
+
+    CSV manifests need a header row; .jsonl/.ndjson manifests hold one object
+    per line. Recognised fields are path (or rel_path), size, mtime_ns (or
+    mtime in seconds) and an optional duration_ms (or duration in seconds).
+    """
+    import csv
+    def records():
+        with open(manifest_path, encoding="utf-8-sig", newline="") as f:
+            if os.path.splitext(manifest_path)[1].casefold() in (".jsonl", ".ndjson", ".json"):
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from csv.DictReader(f)
+
+    def number(rec, key, fallback_key=None, fallback_scale=1):
+        value = rec.get(key)
+        if value not in (None, ""):
+            try:
+                return int(value)
+            except ValueError:
+                return int(float(value))
+        value = rec.get(fallback_key) if fallback_key else None
+        if value not in (None, ""):
+            return int(round(float(value) * fallback_scale))
+        return 0
+
+    for rec in records():
+        path = rec.get("rel_path") or rec.get("path")
+        if not path:
+            continue
+        if os.path.isabs(path):
+            path = os.path.relpath(path, folder)
+        rel_path = path.replace("\\", "/")
+        while rel_path.startswith("./"):
+            rel_path = rel_path[2:]
+        if os.path.splitext(rel_path)[1].casefold() not in _SUPPORTED_EXTENSION_SET:
+            continue
+        yield (rel_path, number(rec, "size"), number(rec, "mtime_ns", "mtime", 1_000_000_000),
+               number(rec, "duration_ms", "duration", 1000))
+
+def spot_check_manifest(entries, folder, sample_size=MANIFEST_SAMPLE_SIZE):
+    """Stat a random sample of manifest entries; returns the first mismatch found, or None."""
+    for rel_path, size, _, _ in random.sample(entries, min(sample_size, len(entries))):
+        try:
+            st = os.stat(os.path.join(folder, rel_path))
+        except OSError:
+            return f"{rel_path} is missing"
+        if size and st.st_size != size:
+            return f"{rel_path} is {st.st_size} bytes, manifest says {size}"
+    return None
+
+def scan_library_from_manifest(conn, library_name, folder, manifest_path, progress_callback=None, workers=1, cancel_event=None):
+    """Load a library from a manifest instead of walking the disk.
+
+    Only a random sample of the entries is checked on disk. If the manifest
+    cannot be read or the sample does not match, a normal incremental scan
+    runs instead and result.manifest_error says why.
+    """
+    try:
+        entries = list(read_library_manifest(manifest_path, folder))
+        error = spot_check_manifest(entries, folder) if entries else "no media files listed"
+    except (OSError, ValueError, KeyError) as e:
+        error = str(e)
+    if error is None and not os.path.isdir(folder):
+        error = f"{folder} is not available"
+    if error is not None:
+        log_error(f"Manifest {manifest_path} rejected, walking {folder} instead: {error}")
+        result = scan_library_incremental(conn, library_name, folder, progress_callback=progress_callback,
+                                          workers=workers, cancel_event=cancel_event)
+        result.manifest_error = error
+        return result
+    with library_scan_lock(library_name):
+        return _import_manifest_entries(conn, library_name, entries, progress_callback)
+
+def _import_manifest_entries(conn, library_name, entries, progress_callback):
+    result = LibraryScanResult(library_name)
+    c = conn.cursor()
+    c.execute("SELECT rel_path, size, mtime_ns FROM song_paths WHERE lib_name = ?", (library_name,))
+    known_files = {rel_path: (size, mtime_ns) for rel_path, size, mtime_ns in c.fetchall()}
+    writer = LibraryBulkWriter(conn, library_name)
+    progress = ProgressThrottle(progress_callback)
+    listed = set()
+    for i, (rel_path, size, mtime_ns, duration_ms) in enumerate(entries, start=1):
+        listed.add(rel_path)
+        old = known_files.get(rel_path)
+        if old is None:
+            result.added += 1
+        elif old != (size, mtime_ns):
+            result.modified += 1
+            if old[0] is not None and old[0] != size and not duration_ms:
+                writer.reset_duration(rel_path)
+        elif not duration_ms:
+            continue
+        writer.add_file(rel_path, size, mtime_ns, duration_ms)
+        progress(i)
+    for rel_path in known_files:
+        if rel_path not in listed:
+            writer.remove_file(rel_path)
+    # Directory mtimes are unknown, so the next scan lists every folder, but
+    # the watcher can start from these without walking the drive first.
+    manifest_dirs = {""}
+    for rel_path in listed:
+        rel_dir = rel_path.rpartition("/")[0]
+        while rel_dir not in manifest_dirs:
+            manifest_dirs.add(rel_dir)
+            rel_dir = rel_dir.rpartition("/")[0]
+    c.execute("SELECT rel_dir FROM directories WHERE lib_name = ?", (library_name,))
+    for (rel_dir,) in c.fetchall():
+        if rel_dir not in manifest_dirs:
+            writer.remove_dir(rel_dir)
+    for rel_dir in manifest_dirs:
+        writer.mark_dir(rel_dir, None)
+    writer.flush()
+    writer.carry_over_durations()
+    progress.finish(len(entries))
+    result.collect(writer)
+    c.execute("DELETE FROM scan_checkpoints WHERE lib_name = ?", (library_name,))
+    conn.commit()
+    return result
+
+def probe_library_durations(conn, library_name, folder, workers=None, progress_callback=None, cancel_event=None,
+                            yield_to=None):
+    """Fill in duration_ms for songs that have none, running ffprobe on a thread pool.
+
+    Returns (probed, total). Results are committed in batches as they arrive.
+    When yield_to is given, each probe waits for that event first, so a
+    DurationProbeQueue working on visible rows goes ahead of the bulk pass.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    def probe(path):
+        if yield_to is not None:
+            yield_to.wait()
+        return top_level_get_duration(path)
+
+    c = conn.cursor()
+    c.execute("SELECT song_id, rel_path FROM song_paths WHERE lib_name = ? AND duration_ms = 0", (library_name,))
+    todo = [(song_id, os.path.join(folder, rel_path)) for song_id, rel_path in c.fetchall()]
+    progress = ProgressThrottle(progress_callback)
+    updates = []
+    done = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="probe") as pool:
+        futures = {pool.submit(probe, path): song_id for song_id, path in todo}
+        try:
+            for fut in concurrent.futures.as_completed(futures):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                done += 1
+                try:
+                    dur = fut.result()
+                except OSError as e:
+                    log_error(f"ffprobe failed for song {futures[fut]}: {e}")
+                    dur = 0
+                if dur:
+                    updates.append((dur, futures[fut]))
+                if len(updates) >= DURATION_WRITE_BATCH:
+                    c.executemany("UPDATE songs SET duration_ms = ? WHERE song_id = ?", updates)
+                    conn.commit()
+                    updates = []
+                progress(done)
+        finally:
+            for fut in futures:
+                fut.cancel()
+    c.executemany("UPDATE songs SET duration_ms = ? WHERE song_id = ?", updates)
+    conn.commit()
+    progress.finish(done)
+    return done, len(todo)
+
+def missing_library_thumbnails(conn, tconn, library_name, folder):
+    """Return (song_id, path) for every song of a library that has no thumbnail yet."""
+    import_loose_thumbnails(conn, tconn)
+    have = {row[0] for row in tconn.execute("SELECT song_id FROM thumbnails")}
+    c = conn.cursor()
+    c.execute("SELECT song_id, rel_path, extension FROM song_paths WHERE lib_name = ?", (library_name,))
+    return [(song_id, os.path.join(folder, rel_path)) for song_id, rel_path, extension in c.fetchall()
+            if song_id not in have and extension.casefold() in THUMBNAIL_EXTENSIONS]
+
+def generate_library_thumbnails(conn, library_name, folder, workers=None, progress_callback=None, cancel_event=None):
+    """Create the missing thumbnails of a library on a thread pool. Returns how many were stored.
+
+    Thumbnails go to the packed store in thumbs.db in batches.
+    """
+    workers = workers or os.cpu_count() or 1
+    tconn = open_thumb_db()
+    try:
+        todo = missing_library_thumbnails(conn, tconn, library_name, folder)
+        progress = ProgressThrottle(progress_callback)
+        rows = []
+        done = 0
+        made = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumb") as pool:
+            futures = {pool.submit(createThumbnail, path): song_id for song_id, path in todo}
+            try:
+                for fut in concurrent.futures.as_completed(futures):
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+                    try:
+                        jpeg = fut.result()
+                    except OSError as e:
+                        log_error(f"Thumbnail generation failed: {e}")
+                        jpeg = None
+                    if jpeg:
+                        rows.append((futures[fut], jpeg))
+                        made += 1
+                    if len(rows) >= THUMB_WRITE_BATCH:
+                        store_thumbnails(tconn, rows)
+                        rows = []
+                    done += 1
+                    progress(done)
+            finally:
+                for fut in futures:
+                    fut.cancel()
+        store_thumbnails(tconn, rows)
+    finally:
+        tconn.close()
+    progress.finish(done)
+    return made
+
+WATCH_DEBOUNCE_SECONDS = 1.0
+WATCH_POLL_SECONDS = 300.0
+# Filesystems that never deliver inotify events for changes made by other machines.
+_NETWORK_FS_TYPES = frozenset(("nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p", "afs", "ncpfs"))
+
+def _is_network_path(path):
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return False
+    path = os.path.realpath(path)
+    best, best_type = "", ""
+    for mount_point, fs_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        if (path == mount_point or path.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > len(best):
+            best, best_type = mount_point, fs_type
+    return best_type in _NETWORK_FS_TYPES
+
+class _InotifyWatcher:
+    """Minimal Linux inotify wrapper mapping watch descriptors back to library dirs."""
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+    def __init__(self):
+        import ctypes, ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._ctypes = ctypes
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+
+    def add(self, key, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            err = self._ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self.watches[wd] = key
+
+    def read_events(self, timeout):
+        """Return (key, name, is_dir, mask) tuples, or None if the kernel queue overflowed."""
+        import select, struct
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _cookie, length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+            offset += 16 + length
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            if mask & self.IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            key = self.watches.get(wd)
+            if key is not None:
+                events.append((key, os.fsdecode(name), bool(mask & self.IN_ISDIR), mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+class LibraryWatcher(QObject):
+    """Watches one library folder and applies changes as they happen.
+
+    Uses inotify where available and falls back to polling on other platforms,
+    network shares, or when the watch limit is hit. Polling only stats the
+    known directories and re-lists the ones whose mtime changed, so files
+    overwritten in place are left to the next manual rescan.
+    A watcher that replaces `previous` for the same library only starts once
+    the old one's thread has exited, so the two never write at once.
+    """
+    library_changed = Signal(str, object)
+
+    def __init__(self, library_name, folder, parent=None, previous=None):
+        super().__init__(parent)
+        self.library_name = library_name
+        self.folder = folder
+        self._previous = previous
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"watch-{library_name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        # Only signals; a scan in progress stops at its next batch and keeps its checkpoint.
+        self._stop.set()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        if self._previous is not None:
+            self._previous.wait()
+            self._previous = None
+        if self._stop.is_set():
+            return
+        conn = open_library_db()
+        try:
+            ensure_library_schema(conn)
+            inotify = self._open_inotify(conn)
+            if inotify is None:
+                self._poll(conn)
+            else:
+                try:
+                    self._watch(conn, inotify)
+                finally:
+                    inotify.close()
+        except Exception as e:
+            log_error(f"Library watcher for {self.library_name} stopped: {e}")
+        finally:
+            conn.close()
+
+    def _open_inotify(self, conn):
+        if not sys.platform.startswith("linux") or _is_network_path(self.folder):
+            return None
+        try:
+            inotify = _InotifyWatcher()
+        except (OSError, AttributeError) as e:
+            log_error(f"inotify unavailable, polling {self.folder}: {e}")
+            return None
+        c = conn.cursor()
+        c.execute("SELECT rel_dir FROM directories WHERE lib_name = ?", (self.library_name,))
+        rel_dirs = [row[0] for row in c.fetchall()]
+        if not rel_dirs:
+            # Libraries added before fingerprints existed need one scan to learn their folders.
+            scan_library_incremental(conn, self.library_name, self.folder, cancel_event=self._stop)
+            c.execute("SELECT rel_dir FROM directories WHERE lib_name = ?", (self.library_name,))
+            rel_dirs = [row[0] for row in c.fetchall()] or [""]
+        try:
+            for rel_dir in rel_dirs:
+                self._add_watch(inotify, rel_dir)
+        except OSError as e:
+            inotify.close()
+            log_error(f"Too many folders to watch in {self.folder}, polling instead: {e}")
+            return None
+        return inotify
+
+    def _add_watch(self, inotify, rel_dir):
+        import errno
+        try:
+            inotify.add(rel_dir, os.path.join(self.folder, rel_dir) if rel_dir else self.folder)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise
+            # The directory vanished between the scan and now; its parent will report it.
+
+    def _emit(self, result):
+        if result.added or result.removed or result.modified:
+            self.library_changed.emit(self.library_name, result)
+
+    def _poll(self, conn):
+        c = conn.cursor()
+        c.execute("SELECT 1 FROM directories WHERE lib_name = ? LIMIT 1", (self.library_name,))
+        if c.fetchone() is None:
+            # Nothing to compare mtimes against yet.
+            scan_library_incremental(conn, self.library_name, self.folder, cancel_event=self._stop)
+        while not self._stop.wait(WATCH_POLL_SECONDS):
+            if not os.path.isdir(self.folder):
+                continue
+            c.execute("SELECT rel_dir, mtime_ns FROM directories WHERE lib_name = ?", (self.library_name,))
+            dirty = set()
+            for rel_dir, mtime_ns in c.fetchall():
+                if self._stop.is_set():
+                    return
+                try:
+                    if os.stat(os.path.join(self.folder, rel_dir) if rel_dir else self.folder).st_mtime_ns != mtime_ns:
+                        dirty.add(rel_dir)
+                except OSError:
+                    dirty.add(rel_dir)
+            if dirty:
+                self._emit(refresh_library_dirs(conn, self.library_name, self.folder, dirty))
+
+    def _watch(self, conn, inotify):
+        dirty = set()
+        deadline = None
+        while not self._stop.is_set():
+            timeout = 0.5 if deadline is None else max(0.0, min(0.5, deadline - time.monotonic()))
+            events = inotify.read_events(timeout)
+            if events is None:
+                # The kernel dropped events, so nothing short of a rescan is trustworthy.
+                self._emit(scan_library_incremental(conn, self.library_name, self.folder, cancel_event=self._stop))
+                dirty.clear()
+                deadline = None
+                continue
+            for rel_dir, name, is_dir, mask in events:
+                if mask & (inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF):
+                    dirty.add(rel_dir.rpartition("/")[0] if rel_dir else "")
+                elif is_dir or os.path.splitext(name)[1].casefold() in _SUPPORTED_EXTENSION_SET:
+                    dirty.add(rel_dir)
+                else:
+                    continue
+                # Copying a large video fires many events; wait for things to settle.
+                deadline = time.monotonic() + WATCH_DEBOUNCE_SECONDS
+            if dirty and deadline is not None and time.monotonic() >= deadline:
+                result = refresh_library_dirs(conn, self.library_name, self.folder, dirty)
+                dirty.clear()
+                deadline = None
+                try:
+                    for rel_dir in result.new_dirs:
+                        self._add_watch(inotify, rel_dir)
+                except OSError as e:
+                    log_error(f"Watch limit reached for {self.folder}, polling instead: {e}")
+                    self._emit(result)
+                    self._poll(conn)
+                    return
+                self._emit(result)
+
+VIEWPORT_PROBE_WORKERS = 2
+
+class DurationProbeQueue(QObject):
+    """Probes durations for the songs on screen: visible library rows and opened lists.
+
+    Requests are served newest first, so the rows a user scrolled to last fill
+    in before ones already scrolled past. Results for library songs are written
+    to the songs table; every result is announced with duration_ready. `idle`
+    is clear while requests are pending; bulk scans wait on it to let visible
+    rows go first.
+    """
+    duration_ready = Signal(str, int)
+
+    def __init__(self, workers=VIEWPORT_PROBE_WORKERS, parent=None):
+        super().__init__(parent)
+        self.idle = threading.Event()
+        self.idle.set()
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._failed = set()
+        self._threads = [threading.Thread(target=self._run, name=f"viewport-probe-{i}", daemon=True)
+                         for i in range(workers)]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put((-next(self._order), None, None))
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self.idle.set()
+
+    def request(self, path_str, song_id=None):
+        with self._lock:
+            if path_str in self._pending or path_str in self._failed:
+                return
+            self._pending.add(path_str)
+            self.idle.clear()
+        self._queue.put((-next(self._order), path_str, song_id))
+
+    def _run(self):
+        conn = open_library_db()
+        try:
+            while True:
+                _, path_str, song_id = self._queue.get()
+                if path_str is None:
+                    return
+                try:
+                    dur = top_level_get_duration(path_str)
+                except OSError as e:
+                    log_error(f"ffprobe failed for {path_str}: {e}")
+                    dur = 0
+                if dur and song_id is not None:
+                    # A locked database only loses this write; the duration is still announced.
+                    try:
+                        conn.execute("UPDATE songs SET duration_ms = ? WHERE song_id = ? AND duration_ms = 0", (dur, song_id))
+                        conn.commit()
+                    except sqlite3.Error as e:
+                        log_error(f"Storing the duration of {path_str} failed: {e}")
+                with self._lock:
+                    self._pending.discard(path_str)
+                    if not dur:
+                        # Don't keep re-probing a broken file every time it scrolls into view.
+                        self._failed.add(path_str)
+                    if not self._pending:
+                        self.idle.set()
+                if dur:
+                    self.duration_ready.emit(path_str, dur)
+        except Exception as e:
+            log_error(f"Viewport duration probe stopped: {e}")
+            self.idle.set()
+        finally:
+            conn.close()
+
 def check_single_instance(server_name="KaraokePlayerInstance"):
     socket = QLocalSocket()
     socket.connectToServer(server_name)
@@ -236,6 +2451,18 @@ class TempSettingsDialog(QDialog):
         self.search_enter_checkbox.toggled.connect(lambda state: self.main_app.settings.setValue("searchRequiresEnter", state))
         controls_layout.addWidget(self.search_enter_checkbox)
         controls_layout.addSpacing(10)
+        self.watch_libraries_checkbox = QCheckBox("Watch library folders for changes")
+        self.watch_libraries_checkbox.setToolTip("Add and remove songs as files change on disk instead of waiting for a rescan.")
+        self.watch_libraries_checkbox.setChecked(self.main_app.settings.value("watchLibraries", True, type=bool))
+        self.watch_libraries_checkbox.toggled.connect(self.updateWatchLibrariesSetting)
+        controls_layout.addWidget(self.watch_libraries_checkbox)
+        controls_layout.addSpacing(10)
+        self.in_memory_index_checkbox = QCheckBox("Keep the library index in memory")
+        self.in_memory_index_checkbox.setToolTip("Filter and sort the library view in memory instead of querying library.db. Faster typing on big libraries, uses more RAM.")
+        self.in_memory_index_checkbox.setChecked(self.main_app.settings.value("inMemoryLibraryIndex", False, type=bool))
+        self.in_memory_index_checkbox.toggled.connect(self.updateInMemoryIndexSetting)
+        controls_layout.addWidget(self.in_memory_index_checkbox)
+        controls_layout.addSpacing(10)
         self.idle_dropdown_label = QLabel("Idle loop first:")
         self.idle_dropdown = QComboBox()
         self.idle_dropdown.setToolTip("Pick which .mp4 from the Idles folder is used at startup.")
@@ -322,6 +2549,14 @@ class TempSettingsDialog(QDialog):
         self.main_app.settings.setValue("autoDeleteTemp", checked)
         self.main_app.settings.sync()
 
+    def updateWatchLibrariesSetting(self, checked: bool):
+        self.main_app.settings.setValue("watchLibraries", checked)
+        self.main_app.restartLibraryWatcher()
+
+    def updateInMemoryIndexSetting(self, checked: bool):
+        self.main_app.settings.setValue("inMemoryLibraryIndex", checked)
+        self.main_app.refreshLibraryColumns()
+
 class SongItem:
     def __init__(self, file_path: str, file_type: str, artist: str, title: str, duration_ms: int):
         self.file_path = file_path
@@ -340,6 +2575,9 @@ class SongItem:
         self.outro_start_ms = 9999999
         self.history_dt = ""
         self.lib_name = None
+        self.song_id = None
+        self.artist_key = None
+        self.title_key = None
         self.is_rendering = False
         self.render_intent = None 
         
@@ -604,6 +2842,15 @@ class SongsTableModel(QAbstractTableModel):
             return self._songs[row]
         return None
 
+    def setSongDuration(self, path_str, duration_ms):
+        # A list may hold the same song more than once.
+        for row, song in enumerate(self._songs):
+            if song.file_path == path_str and not song.duration_ms:
+                song.duration_ms = duration_ms
+                song.duration_str = ms_to_mmss(duration_ms)
+                index = self.index(row, 2)
+                self.dataChanged.emit(index, index)
+
     def setSongs(self, songs):
         self.beginResetModel()
         self._songs = songs
@@ -692,22 +2939,22 @@ class TwoFieldFilterProxyModel(QSortFilterProxyModel):
         self.artistFilter = ""
 
     def setSongFilter(self, text):
-        self.songFilter = text.casefold()
+        self.songFilter = search_key(text)
 
     def setArtistFilter(self, text):
-        self.artistFilter = text.casefold()
+        self.artistFilter = search_key(text)
 
     def filterAcceptsRow(self, source_row, source_parent):
-        from unicodedata import normalize
-        index_song = self.sourceModel().index(source_row, 0, source_parent)
-        index_artist = self.sourceModel().index(source_row, 1, source_parent)
-        song = self.sourceModel().data(index_song, Qt.DisplayRole) or ""
-        artist = self.sourceModel().data(index_artist, Qt.DisplayRole) or ""
-        song_cf = normalize("NFKD", song).casefold()
-        artist_cf = normalize("NFKD", artist).casefold()
-        if self.songFilter and self.songFilter not in song_cf:
+        if not self.songFilter and not self.artistFilter:
+            return True
+        song = self.sourceModel().getSongItem(source_row)
+        if song.title_key is None:
+            # Songs that did not come from library.db get their keys folded once, on first filter.
+            song.title_key = search_key(song.title)
+            song.artist_key = search_key(song.artist)
+        if self.songFilter and self.songFilter not in song.title_key:
             return False
-        if self.artistFilter and self.artistFilter not in artist_cf:
+        if self.artistFilter and self.artistFilter not in song.artist_key:
             return False
         return True
 
@@ -737,8 +2984,7 @@ class CombinedShiftWorker(QObject):
         try:
             import subprocess
             from pathlib import Path
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo = hidden_startupinfo()
             original_file = Path(self.song_item.audio_file_path)
             if not original_file.exists():
                 original_file = Path(self.song_item.file_path)
@@ -775,27 +3021,11 @@ class CombinedShiftWorker(QObject):
                 self.finished.emit(True, "")
                 return
 
-            cmd_duration = [
-                "ffprobe", "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                str(original_file)
-            ]
-            result = subprocess.run(
-                cmd_duration,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True, encoding='utf-8', errors='replace',
-                startupinfo=startupinfo
-            )
-            if result.returncode != 0:
+            info = media_info(str(original_file))
+            total_duration = info["duration_ms"] / 1000 if info else 0
+            if total_duration <= 0:
                 self.finished.emit(False, "Failed to get media duration. Ensure ffmpeg is installed.")
                 return
-            try:
-                total_duration = float(result.stdout.strip())
-            except ValueError:
-                self.finished.emit(False, "Invalid duration from ffprobe.")
-                return
             af_filters = []
             if pitch_change_needed:
                 af_filters.append(f"rubberband=pitch={pitch_factor}")
@@ -1308,10 +3538,10 @@ class LazyAggregatedModel(QAbstractTableModel):
         placeholders = ",".join(["?"] * len(keys))
         case_str = "CASE lib_name " + " ".join([f"WHEN ? THEN {i}" for i in range(len(keys))]) + " END"
         if self.letter_filter:
-            query = f"SELECT lib_name, filename, extension, artist, title, duration_ms FROM songs WHERE lib_name IN ({placeholders}) AND artist LIKE ? ORDER BY {case_str}, artist, title LIMIT ? OFFSET ?"
+            query = f"SELECT lib_name, rel_path, extension, artist, title, duration_ms FROM song_paths WHERE lib_name IN ({placeholders}) AND artist LIKE ? ORDER BY {case_str}, artist, title LIMIT ? OFFSET ?"
             params = keys + [self.letter_filter + '%'] + keys + [to_fetch, start]
         else:
-            query = f"SELECT lib_name, filename, extension, artist, title, duration_ms FROM songs WHERE lib_name IN ({placeholders}) ORDER BY {case_str}, artist, title LIMIT ? OFFSET ?"
+            query = f"SELECT lib_name, rel_path, extension, artist, title, duration_ms FROM song_paths WHERE lib_name IN ({placeholders}) ORDER BY {case_str}, artist, title LIMIT ? OFFSET ?"
             params = keys + keys + [to_fetch, start]
         c.execute(query, params)
         rows = c.fetchall()
@@ -1335,6 +3565,286 @@ class LazyAggregatedModel(QAbstractTableModel):
         self.loaded_count = 0
         self.loadTotalCount()
         self.endResetModel()
+THUMB_CACHE_SIZE = 2000
+
+class ThumbnailCache(QObject):
+    """Pre-scaled table thumbnails, decoded off the GUI thread.
+
+    Paints only look at memory: an LRU of scaled pixmaps keyed by song_id and
+    an index of the song ids in thumbs.db, read once by the decoder thread. A
+    thumbnail that is not decoded yet is queued and drawn as a placeholder
+    until ready is emitted. Songs without a known song_id are looked up by path.
+    """
+    ready = Signal(object, QImage)
+
+    def __init__(self, parent=None, size=THUMB_CACHE_SIZE):
+        super().__init__(parent)
+        self.owner = parent
+        self.size = size
+        self.placeholder = QPixmap(50, 28)
+        self.placeholder.fill(QColor("#242424"))
+        self._pixmaps = collections.OrderedDict()
+        self._pending = set()
+        self._existing = None
+        self._queue = queue.LifoQueue()
+        self._thread = None
+        self.ready.connect(self._store)
+
+    def pixmap(self, song):
+        """Return the song's scaled thumbnail, the placeholder while it loads, or None if there is none."""
+        key = song.song_id if song.song_id is not None else song.file_path
+        if key in self._pixmaps:
+            self._pixmaps.move_to_end(key)
+            return self._pixmaps[key]
+        existing = self._existing
+        if existing is not None and isinstance(key, int) and key not in existing:
+            return None
+        if key not in self._pending:
+            self._pending.add(key)
+            self._queue.put(key)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="thumbnails", daemon=True)
+                self._thread.start()
+        return self.placeholder
+
+    def invalidate(self):
+        """Forget cached pixmaps and the file index after thumbnails were created or replaced."""
+        self._pixmaps.clear()
+        self._existing = None
+
+    def addExisting(self, song_id):
+        """Note a thumbnail that was just stored so the next paint loads it."""
+        existing = self._existing
+        if existing is not None:
+            existing.add(song_id)
+        self._pixmaps.pop(song_id, None)
+
+    def _run(self):
+        conn = open_library_db()
+        tconn = open_thumb_db()
+        try:
+            import_loose_thumbnails(conn, tconn)
+        except (OSError, sqlite3.Error) as e:
+            log_error(f"Failed to import old thumbnails: {e}")
+        while True:
+            key = self._queue.get()
+            image = QImage()
+            try:
+                existing = self._existing
+                if existing is None:
+                    existing = self._existing = {row[0] for row in tconn.execute("SELECT song_id FROM thumbnails")}
+                song_id = key if isinstance(key, int) else self._songIdForPath(conn, key)
+                if song_id in existing:
+                    jpeg = load_thumbnail(tconn, song_id)
+                    if jpeg and image.loadFromData(jpeg):
+                        image = image.scaled(50, 29, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            except sqlite3.Error as e:
+                log_error(f"Failed to read thumbnail: {e}")
+            self.ready.emit(key, image)
+
+    def _songIdForPath(self, conn, path_str):
+        for lib_name, folder in list(getattr(self.owner, "library_map", {}).items()):
+            rel_path = library_rel_path(folder, path_str) if folder else None
+            if rel_path is not None:
+                song_id = find_song_id(conn.cursor(), lib_name, rel_path)
+                if song_id is not None:
+                    return song_id
+        return None
+
+    def _store(self, key, image):
+        self._pending.discard(key)
+        if image.isNull():
+            if not isinstance(key, int):
+                # Remember the miss; the song_id index can't answer for paths.
+                self._pixmaps[key] = None
+            return
+        self._pixmaps[key] = QPixmap.fromImage(image)
+        while len(self._pixmaps) > self.size:
+            self._pixmaps.popitem(last=False)
+
+class ThumbnailQueue(QObject):
+    """Renders thumbnails and seek preview sprite sheets into thumbs.db on its own worker pool.
+
+    Rows painted without a thumbnail and songs about to play are queued ahead
+    of whole-library jobs, newest first, so what is on screen is rendered
+    before the rest. Library jobs run independently of duration scans and can
+    be cancelled.
+    """
+    thumbnail_ready = Signal(int)
+    sprite_ready = Signal(int)
+    library_finished = Signal(str, int, bool)
+
+    VISIBLE = 0
+    LIBRARY = 1
+
+    def __init__(self, parent=None, workers=None):
+        super().__init__(parent)
+        self.workers = workers or os.cpu_count() or 1
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._visible = set()
+        self._failed = set()
+        self._libraries = {}
+        self._threads = []
+
+    def request(self, song_id, path_str):
+        """Queue a thumbnail for a row that is on screen."""
+        with self._lock:
+            if song_id in self._visible or song_id in self._failed:
+                return
+            self._visible.add(song_id)
+        self._put(self.VISIBLE, song_id, path_str, None)
+
+    def requestSprite(self, song_id, path_str, duration_ms):
+        """Queue the seek preview sprite sheet of a song that is playing or up next."""
+        key = ("sprite", song_id)
+        with self._lock:
+            if key in self._visible or key in self._failed:
+                return
+            self._visible.add(key)
+        self._put(self.VISIBLE, key, path_str, None, duration_ms)
+
+    def generateLibrary(self, library_name, folder):
+        """Queue every missing thumbnail of a library. Returns False if it is already running."""
+        with self._lock:
+            if library_name in self._libraries:
+                return False
+            job = self._libraries[library_name] = {"total": None, "done": 0, "made": 0, "cancel": False}
+        threading.Thread(target=self._planLibrary, args=(library_name, folder, job), daemon=True).start()
+        return True
+
+    def cancelLibrary(self, library_name):
+        with self._lock:
+            job = self._libraries.get(library_name)
+            if job:
+                job["cancel"] = True
+
+    def libraryProgress(self, library_name):
+        """Return (done, total) of a running library job, or None."""
+        with self._lock:
+            job = self._libraries.get(library_name)
+            return (job["done"], job["total"] or 0) if job else None
+
+    def stop(self):
+        with self._lock:
+            for job in self._libraries.values():
+                job["cancel"] = True
+        for _ in self._threads:
+            self._queue.put((-1, -next(self._order), None, None, None, 0))
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def _put(self, priority, key, path_str, library_name, duration_ms=0):
+        self._queue.put((priority, -next(self._order), key, path_str, library_name, duration_ms))
+        with self._lock:
+            if not self._threads:
+                self._threads = [threading.Thread(target=self._run, name=f"thumb-{i}", daemon=True)
+                                 for i in range(self.workers)]
+                for thread in self._threads:
+                    thread.start()
+
+    def _planLibrary(self, library_name, folder, job):
+        todo = []
+        try:
+            conn = open_library_db()
+            tconn = open_thumb_db()
+            try:
+                todo = missing_library_thumbnails(conn, tconn, library_name, folder)
+            finally:
+                tconn.close()
+                conn.close()
+        except (OSError, sqlite3.Error) as e:
+            log_error(f"Listing thumbnails for {library_name} failed: {e}")
+        with self._lock:
+            job["total"] = len(todo)
+        if not todo:
+            self._finishLibrary(library_name, job)
+        for song_id, path_str in todo:
+            self._put(self.LIBRARY, song_id, path_str, library_name)
+
+    def _finishLibrary(self, library_name, job):
+        with self._lock:
+            self._libraries.pop(library_name, None)
+        self.library_finished.emit(library_name, job["made"], job["cancel"])
+
+    def _run(self):
+        tconn = open_thumb_db()
+        try:
+            while True:
+                priority, _, song_id, path_str, library_name, duration_ms = self._queue.get()
+                if song_id is None:
+                    return
+                if isinstance(song_id, tuple):
+                    self._renderSprite(tconn, song_id, path_str, duration_ms)
+                    continue
+                with self._lock:
+                    job = self._libraries.get(library_name) if library_name else None
+                    cancelled = job is not None and job["cancel"]
+                made = False
+                if not cancelled:
+                    # A locked database only loses this item; the worker keeps going.
+                    try:
+                        made = self._renderThumbnail(tconn, song_id, path_str, priority)
+                    except sqlite3.Error as e:
+                        log_error(f"Storing the thumbnail of {path_str} failed: {e}")
+                with self._lock:
+                    if priority == self.VISIBLE:
+                        self._visible.discard(song_id)
+                    if job is not None:
+                        job["done"] += 1
+                        job["made"] += made
+                        finished = job["done"] >= job["total"]
+                if made:
+                    self.thumbnail_ready.emit(song_id)
+                if job is not None and finished:
+                    self._finishLibrary(library_name, job)
+        finally:
+            tconn.close()
+
+    def _renderThumbnail(self, tconn, song_id, path_str, priority):
+        # A song can be queued by both a library job and a paint; render it once.
+        if tconn.execute("SELECT 1 FROM thumbnails WHERE song_id = ?", (song_id,)).fetchone() is not None:
+            return False
+        try:
+            jpeg = createThumbnail(path_str)
+        except OSError as e:
+            log_error(f"Thumbnail generation failed for {path_str}: {e}")
+            jpeg = None
+        if jpeg:
+            store_thumbnails(tconn, [(song_id, jpeg)])
+            return True
+        if priority == self.VISIBLE:
+            # Don't start ffmpeg again every time a broken file is painted.
+            with self._lock:
+                self._failed.add(song_id)
+        return False
+
+    def _renderSprite(self, tconn, key, path_str, duration_ms):
+        song_id = key[1]
+        made = exists = locked = False
+        try:
+            exists = tconn.execute("SELECT 1 FROM sprites WHERE song_id = ?", (song_id,)).fetchone() is not None
+            if not exists:
+                try:
+                    sprite = createSpriteSheet(path_str, duration_ms or top_level_get_duration(path_str))
+                except OSError as e:
+                    log_error(f"Sprite sheet failed for {path_str}: {e}")
+                    sprite = None
+                if sprite:
+                    store_sprite(tconn, song_id, *sprite)
+                    made = True
+        except sqlite3.Error as e:
+            log_error(f"Storing the sprite sheet of {path_str} failed: {e}")
+            locked = True
+        with self._lock:
+            self._visible.discard(key)
+            # A database error is transient; only a file ffmpeg can't render is given up on.
+            if not made and not exists and not locked:
+                self._failed.add(key)
+        if made:
+            self.sprite_ready.emit(song_id)
+
 class LeftAlignDelegate(QStyledItemDelegate):
     def __init__(self, table_view):
         super().__init__(table_view)
@@ -1352,8 +3862,6 @@ class LeftAlignDelegate(QStyledItemDelegate):
         text = index.data(Qt.DisplayRole)
         r = option.rect
         if index.column() == 0:
-            from pathlib import Path
-            import os
             item_model = index.model()
             s = None
             if hasattr(item_model, "getSongItem"):
@@ -1363,28 +3871,85 @@ class LeftAlignDelegate(QStyledItemDelegate):
                 s = self.table_view.parent_ref.songs_model.getSongItem(source_index.row())
             if s:
                 ext = s.file_type.casefold()
-                if ext in (".mp4", ".mkv", ".avi", ".cdg"):
-                    thumb_path = os.path.join("thumbs", os.path.basename(s.file_path) + ".jpg")
-                    if os.path.exists(thumb_path):
-                        pix = QPixmap(thumb_path)
-                        if not pix.isNull():
-                            fixed_pix = pix.scaled(50, 29, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                            pix_x = r.left()
-                            pix_y = r.top() + (r.height() - fixed_pix.height()) // 2
-                            painter.drawPixmap(pix_x, pix_y, fixed_pix)
-                            text_rect = QRect(r.left() + fixed_pix.width() + 8, r.top(), r.width() - fixed_pix.width() - 5, r.height())
-                            painter.setPen(QColor("#FFFFFF"))
-                            painter.drawText(text_rect, Qt.AlignVCenter | Qt.AlignLeft, str(text))
-                            return
+                if ext in THUMBNAIL_EXTENSIONS:
+                    fixed_pix = self.table_view.parent_ref.thumbnail_cache.pixmap(s)
+                    if fixed_pix is None and s.song_id is not None:
+                        self.table_view.parent_ref.thumbnail_queue.request(s.song_id, s.file_path)
+                    if fixed_pix is not None:
+                        pix_x = r.left()
+                        pix_y = r.top() + (r.height() - fixed_pix.height()) // 2
+                        painter.drawPixmap(pix_x, pix_y, fixed_pix)
+                        text_rect = QRect(r.left() + fixed_pix.width() + 8, r.top(), r.width() - fixed_pix.width() - 5, r.height())
+                        painter.setPen(QColor("#FFFFFF"))
+                        painter.drawText(text_rect, Qt.AlignVCenter | Qt.AlignLeft, str(text))
+                        return
         painter.save()
         painter.setPen(QColor("#FFFFFF"))
         text_rect = option.rect.adjusted(5, 0, -5, 0)
         painter.drawText(text_rect, Qt.AlignVCenter | Qt.AlignLeft, str(text) if text else "")
         painter.restore()
 
+MEDIA_TOOLTIP_CACHE_SIZE = 2000
+
+class MediaTooltipCache(QObject):
+    """Stream info tooltips for the library table, looked up off the GUI thread.
+
+    Hovering only reads memory. A file that was not looked up yet is queued
+    and gets no tooltip until ready is emitted; the lookup itself only uses
+    what an earlier probe stored or the header says and never starts ffprobe.
+    """
+    ready = Signal(str, str)
+
+    def __init__(self, parent=None, size=MEDIA_TOOLTIP_CACHE_SIZE):
+        super().__init__(parent)
+        self.size = size
+        self._texts = collections.OrderedDict()
+        self._pending = set()
+        self._queue = queue.LifoQueue()
+        self._thread = None
+        self.ready.connect(self._store)
+
+    def text(self, path):
+        """Return the tooltip of a media file, or None while it is looked up or when nothing is known."""
+        if path in self._texts:
+            self._texts.move_to_end(path)
+            return self._texts[path]
+        if path not in self._pending:
+            self._pending.add(path)
+            self._queue.put(path)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="media-tooltips", daemon=True)
+                self._thread.start()
+        return None
+
+    def invalidate(self):
+        self._texts.clear()
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            try:
+                info = media_info(path, probe=False) or read_media_header(path)
+            except (OSError, sqlite3.Error) as e:
+                log_error(f"Failed to read media info of {path}: {e}")
+                info = None
+            self.ready.emit(path, describe_media_info(info) if info else "")
+
+    def _store(self, path, text):
+        self._pending.discard(path)
+        self._texts[path] = text or None
+        while len(self._texts) > self.size:
+            self._texts.popitem(last=False)
+
 class KaraokePlayer(QMainWindow):
     search_results_ready = Signal()
     library_load_complete = Signal()
+    library_scan_finished = Signal(str, object)
+    library_scan_progress = Signal(str, int)
+    duration_probe_progress = Signal(str, int)
+    duration_probe_finished = Signal(str, int, int, bool)
+    fuzzy_index_ready = Signal()
+    library_columns_ready = Signal(object)
     def __init__(self):
         super().__init__()
         self.setWindowTitle(APP_NAME)
@@ -1393,7 +3958,7 @@ class KaraokePlayer(QMainWindow):
         self.settings = QSettings(SETTINGS_FILE, QSettings.IniFormat)
         self.restoreGeometry(self.settings.value("windowGeometry", b""))
         self.restoreState(self.settings.value("windowState", b""))
-        self.temp_folder = Path("temp")
+        self.temp_folder = Path(TEMP_FOLDER)
         if self.settings.value("autoDeleteTemp") is None:
             self.settings.setValue("autoDeleteTemp", True)
         if self.settings.value("autoDeleteTemp", True, type=bool):
@@ -1429,12 +3994,40 @@ class KaraokePlayer(QMainWindow):
         self.idles_folder = Path(IDLES_FOLDER)
         self.idles_folder.mkdir(exist_ok=True)
         self.idle_videos = sorted([f.name for f in self.idles_folder.glob("*.mp4")])
-        self.conn = sqlite3.connect("library.db", timeout=10)
-        c = self.conn.cursor()
-        c.execute("CREATE TABLE IF NOT EXISTS songs (lib_name TEXT NOT NULL, filename TEXT NOT NULL, extension TEXT, artist TEXT, title TEXT, duration_ms INTEGER, PRIMARY KEY(lib_name, filename))")
-        c.execute("CREATE INDEX IF NOT EXISTS idx_artist_title ON songs (artist, title)")
-        c.execute("CREATE TABLE IF NOT EXISTS libraries (lib_name TEXT PRIMARY KEY, paths TEXT, sort_index INTEGER DEFAULT 0)")
-        self.conn.commit()
+        self.conn = open_library_db()
+        ensure_library_schema(self.conn)
+        self.library_scans = {}
+        self.library_scan_finished.connect(self.onLibraryScanFinished)
+        self.library_scan_progress.connect(self.onLibraryScanProgress)
+        self.duration_probes = {}
+        self.duration_probe_progress.connect(self.onDurationProbeProgress)
+        self.duration_probe_finished.connect(self.onDurationProbeFinished)
+        self.viewport_probe = DurationProbeQueue(parent=self)
+        self.viewport_probe.duration_ready.connect(self.onProbedDuration)
+        self.viewport_probe.start()
+        self.visible_durations_timer = QTimer(self)
+        self.visible_durations_timer.setSingleShot(True)
+        self.visible_durations_timer.setInterval(150)
+        self.visible_durations_timer.timeout.connect(self.queueVisibleDurations)
+        self.thumbnail_cache = ThumbnailCache(self)
+        self.media_tooltips = MediaTooltipCache(self)
+        self.media_tooltips.ready.connect(self.onMediaTooltipReady)
+        self.thumbnail_queue = ThumbnailQueue(self)
+        self.thumbnail_queue.thumbnail_ready.connect(self.onThumbnailReady)
+        self.thumbnail_queue.library_finished.connect(self.onLibraryThumbnailsFinished)
+        self.thumbnail_jobs_notify = {}
+        self.thumbnail_queue.sprite_ready.connect(self.onSpriteReady)
+        self.seek_sprite = None
+        QTimer.singleShot(60000, self.maybeSweepThumbnails)
+        self.fuzzy_index = FuzzySongIndex()
+        self.fuzzy_index_refreshing = False
+        self.fuzzy_index_stale = False
+        self.fuzzy_index_ready.connect(self.onFuzzyIndexReady)
+        self.library_columns = None
+        self.library_columns_loading = False
+        self.library_columns_stale = False
+        self.library_columns_ready.connect(self.onLibraryColumnsReady)
+        self.refreshLibraryColumns()
         self.loadLibraryPaths()
         self.loadUserLists()
         self.video_player = QMediaPlayer()
@@ -1445,6 +4038,7 @@ class KaraokePlayer(QMainWindow):
         self.audio_output_preset = QAudioOutput()
         self.audio_output_preset.setVolume(1.0)
         self.audio_player_preset.setAudioOutput(self.audio_output_preset)
+        self.audio_player_preset.durationChanged.connect(self.onAudioDurationChanged)
         self.second_window = None
         self.sync_timer = QTimer(self)
         self.sync_timer.setInterval(100)
@@ -1463,6 +4057,8 @@ class KaraokePlayer(QMainWindow):
         self.audio_player_preset.errorOccurred.connect(self.onPlaybackError)
         self.initUI()
         self.setupShortcuts()
+        self.restartLibraryWatcher()
+        self.resumeInterruptedScans()
         self.loadIdleVideo()
         for i in range(self.categories_list.count()):
             item = self.categories_list.item(i)
@@ -1481,11 +4077,12 @@ class KaraokePlayer(QMainWindow):
         QTimer.singleShot(500, self.adjustAlphabetPanelWidth)
     def updateSongDurationIfNeeded(self, song_item: SongItem):
         if song_item.duration_ms == 0:
+            song_id = None
             if song_item.lib_name:
                 conn = sqlite3.connect("library.db")
                 c = conn.cursor()
-                c.execute("SELECT duration_ms FROM songs WHERE lib_name=? AND filename=?",
-                        (song_item.lib_name, os.path.basename(song_item.file_path)))
+                song_id = find_song_id(c, song_item.lib_name, self.libraryRelPath(song_item))
+                c.execute("SELECT duration_ms FROM songs WHERE song_id=?", (song_id,))
                 row = c.fetchone()
                 conn.close()
                 if row and row[0] != 0:
@@ -1497,13 +4094,10 @@ class KaraokePlayer(QMainWindow):
                 song_item.duration_ms = dur
                 song_item.duration_str = ms_to_mmss(dur)
 
-                if song_item.lib_name and dur > 0:
+                if song_id is not None and dur > 0:
                     conn = sqlite3.connect("library.db")
                     c = conn.cursor()
-                    c.execute("""UPDATE songs
-                                SET duration_ms=?
-                                WHERE lib_name=? AND filename=?""",
-                            (dur, song_item.lib_name, os.path.basename(song_item.file_path)))
+                    c.execute("UPDATE songs SET duration_ms=? WHERE song_id=?", (dur, song_id))
                     conn.commit()
                     conn.close()
 
@@ -1577,15 +4171,11 @@ class KaraokePlayer(QMainWindow):
         threading.Thread(target=self.load_all_libraries, daemon=True).start()
     def load_all_libraries(self):
         for lib_name, folder in self.library_map.items():
-            p = Path(folder)
-            found_files = []
-            for ext in SUPPORTED_FILE_EXTENSIONS:
-                found_files.extend(p.rglob(f"*{ext}"))
-            for f in found_files:
-                fn = f.name
-                extension = f.suffix.casefold()
-                artist, title = parse_filename_for_artist_song(fn)
-                dur = self.getDurationWithFfprobe(str(f))
+            if not folder:
+                continue
+            for rel_path, _, _ in iter_library_files(folder):
+                _, fn, extension, artist, title, _ = song_row_for_file(lib_name, rel_path)
+                dur = self.getDurationWithFfprobe(os.path.join(folder, rel_path))
                 self.db_add_song(lib_name, fn, extension, artist, title, dur)
         self.library_load_complete.emit()
     def onLibraryLoadComplete(self):
@@ -1656,9 +4246,30 @@ class KaraokePlayer(QMainWindow):
             act_edit = menu.addAction("Edit library")
             act_move_up = None
             act_move_down = None
-            act_rescan = menu.addAction("Rescan library")
-            act_scan_duration = menu.addAction("Run scan for song durations")
-            act_regen_thumb = menu.addAction("Force regenerate thumbnails")
+            act_cancel_scan = None
+            act_rescan = None
+            if txt in self.library_scans:
+                act_cancel_scan = menu.addAction("Cancel scan")
+            elif has_scan_checkpoint(self.conn, txt):
+                act_rescan = menu.addAction("Resume interrupted scan")
+            else:
+                act_rescan = menu.addAction("Rescan library")
+            act_import_manifest = menu.addAction("Import from manifest...") if act_rescan else None
+            act_cancel_durations = None
+            act_scan_duration = None
+            if txt in self.duration_probes:
+                act_cancel_durations = menu.addAction("Cancel duration scan")
+            else:
+                act_scan_duration = menu.addAction("Run scan for song durations")
+            act_make_thumbs = None
+            act_cancel_thumbs = None
+            act_regen_thumb = None
+            thumb_progress = self.thumbnail_queue.libraryProgress(txt)
+            if thumb_progress:
+                act_cancel_thumbs = menu.addAction("Cancel thumbnail generation (%d/%d)" % thumb_progress)
+            else:
+                act_make_thumbs = menu.addAction("Generate missing thumbnails")
+                act_regen_thumb = menu.addAction("Force regenerate thumbnails")
             lib_items = []
             for i in range(self.categories_list.count()):
                 it = self.categories_list.item(i)
@@ -1680,31 +4291,33 @@ class KaraokePlayer(QMainWindow):
                 self.moveLibraryItem(item, up=True)
             elif act_move_down and chosen == act_move_down:
                 self.moveLibraryItem(item, up=False)
-            elif chosen == act_rescan:
+            elif act_cancel_scan and chosen == act_cancel_scan:
+                self.cancelLibraryScan(txt)
+            elif act_rescan and chosen == act_rescan:
                 resp = QMessageBox.question(self, "Rescan Library", "Are you sure you want to rescan the library '" + txt + "'?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
                 if resp == QMessageBox.Yes:
                     folder = self.library_map.get(txt, "")
                     if folder:
                         from PySide6.QtCore import QThreadPool
                         QThreadPool.globalInstance().start(LibraryLoaderRunnable(self, txt))
-                        import threading
-                        threading.Thread(target=self.scanAndStoreLibrary, args=(txt, folder), daemon=True).start()
-            elif chosen == act_scan_duration:
+                        self.startLibraryScan(txt, folder)
+            elif act_import_manifest and chosen == act_import_manifest:
+                folder = self.library_map.get(txt, "")
+                manifest, _ = QFileDialog.getOpenFileName(self, "Select Library Manifest", folder, "Manifests (*.csv *.jsonl *.ndjson);;All files (*)")
+                if folder and manifest:
+                    self.startLibraryScan(txt, folder, manifest=manifest)
+            elif act_scan_duration and chosen == act_scan_duration:
                 self.scan_durations_for_library(txt)
-            elif chosen == act_regen_thumb:
+            elif act_cancel_durations and chosen == act_cancel_durations:
+                self.cancelDurationProbe(txt)
+            elif act_make_thumbs and chosen == act_make_thumbs:
+                self.generateLibraryThumbnails(txt)
+            elif act_cancel_thumbs and chosen == act_cancel_thumbs:
+                self.thumbnail_queue.cancelLibrary(txt)
+            elif act_regen_thumb and chosen == act_regen_thumb:
                 reply = QMessageBox.question(self, "Force regenerate thumbnails", "Are you sure you want to regenerate thumbnails for this library?", QMessageBox.Yes | QMessageBox.Cancel, QMessageBox.Cancel)
                 if reply == QMessageBox.Yes:
-                    folder = self.library_map.get(txt, "")
-                    if folder:
-                        from pathlib import Path
-                        import os
-                        for f in Path(folder).rglob("*"):
-                            if f.suffix.lower() in SUPPORTED_FILE_EXTENSIONS:
-                                thumb_path = os.path.join("thumbs", f.name + ".jpg")
-                                if os.path.exists(thumb_path):
-                                    os.remove(thumb_path)
-                                createThumbnail(str(f))
-                        QMessageBox.information(self, "Thumbnails regenerated", "Thumbnails have been regenerated for this library.")
+                    self.generateLibraryThumbnails(txt, force=True)
             return
         if role == "HistoryCategory":
             self.toggleHistoryExpansion()
@@ -1783,6 +4396,10 @@ class KaraokePlayer(QMainWindow):
             self.songs_model.setSongs(songs)
             self._backup_songs = songs[:]
             self.updateTableViewMode()
+            # Bottom up, because the probe queue serves the newest request first.
+            for song in reversed(songs):
+                if not song.duration_ms:
+                    self.viewport_probe.request(song.file_path, song.song_id)
         elif role == 'HistorySub':
             self.showHistory(text)
 
@@ -1797,13 +4414,23 @@ class KaraokePlayer(QMainWindow):
     def removeLibrary(self, lib_name):
         if lib_name in self.library_map:
             del self.library_map[lib_name]
+        self.cancelLibraryScan(lib_name)
         conn = sqlite3.connect('library.db')
         c = conn.cursor()
+        c.execute("SELECT song_id FROM songs WHERE lib_name = ?", (lib_name,))
+        removed_song_ids = [row[0] for row in c.fetchall()]
         c.execute("DELETE FROM songs WHERE lib_name = ?", (lib_name,))
+        c.execute("DELETE FROM directories WHERE lib_name = ?", (lib_name,))
+        c.execute("DELETE FROM scan_checkpoints WHERE lib_name = ?", (lib_name,))
+        c.execute("DELETE FROM scan_moved_durations WHERE lib_name = ?", (lib_name,))
         c.execute("DELETE FROM libraries WHERE lib_name = ?", (lib_name,))
         conn.commit()
         conn.close()
-        cleanThumbs()  
+        # Dropping thumbnails waits for the thumbnail store's writers; keep it off the GUI thread.
+        threading.Thread(target=cleanRemovedThumbnails, args=(removed_song_ids,), daemon=True).start()
+        self.refreshFuzzyIndex()
+        self.refreshLibraryColumns()
+        self.restartLibraryWatcher()
         self.buildCategories()
         self.hideHistorySubitems()
 
@@ -1863,6 +4490,9 @@ class KaraokePlayer(QMainWindow):
         conn = sqlite3.connect('library.db')
         c = conn.cursor()
         c.execute("DELETE FROM songs WHERE lib_name = ?", (lib_name,))
+        c.execute("DELETE FROM directories WHERE lib_name = ?", (lib_name,))
+        c.execute("DELETE FROM scan_checkpoints WHERE lib_name = ?", (lib_name,))
+        c.execute("DELETE FROM scan_moved_durations WHERE lib_name = ?", (lib_name,))
         conn.commit()
         conn.close()
 
@@ -1871,17 +4501,19 @@ class KaraokePlayer(QMainWindow):
         conn = sqlite3.connect('library.db')
         c = conn.cursor()
         if sort_by_artist:
-            c.execute("SELECT filename, extension, artist, title, duration_ms FROM songs WHERE lib_name = ? ORDER BY artist, title", (lib_name,))
+            c.execute("SELECT rel_path, extension, artist, title, duration_ms, artist_key, title_key FROM song_paths WHERE lib_name = ? ORDER BY artist, title", (lib_name,))
         else:
-            c.execute("SELECT filename, extension, artist, title, duration_ms FROM songs WHERE lib_name = ?", (lib_name,))
+            c.execute("SELECT rel_path, extension, artist, title, duration_ms, artist_key, title_key FROM song_paths WHERE lib_name = ?", (lib_name,))
         rows = c.fetchall()
         conn.close()
         folder = self.library_map.get(lib_name, "")
         items = []
         for row in rows:
-            fn, ext, artist, title, dms = row
+            fn, ext, artist, title, dms, artist_key, title_key = row
             full_path = str(Path(folder) / fn)
             si = SongItem(full_path, ext, artist, title, dms)
+            si.artist_key = artist_key
+            si.title_key = title_key
             items.append(si)
         return items
     def showEditLibraryDialog(self, existing_name=None, default_name=None, default_paths=None):
@@ -1910,6 +4542,20 @@ class KaraokePlayer(QMainWindow):
         elif default_paths:
             loc_text.setText(default_paths)
         layout.addWidget(loc_text)
+        workers_row = QHBoxLayout()
+        workers_label = QLabel("Scan threads (use 1 for slow spinning disks):")
+        workers_combo = QComboBox()
+        for n in SCAN_WORKER_CHOICES:
+            workers_combo.addItem(str(n))
+        current_workers = DEFAULT_SCAN_WORKERS
+        if existing_name:
+            conn = sqlite3.connect("library.db")
+            current_workers = library_scan_workers(conn, existing_name)
+            conn.close()
+        workers_combo.setCurrentText(str(current_workers))
+        workers_row.addWidget(workers_label)
+        workers_row.addWidget(workers_combo)
+        layout.addLayout(workers_row)
         btns = QHBoxLayout()
         save_btn = QPushButton("Save")
         cancel_btn = QPushButton("Cancel")
@@ -1930,7 +4576,11 @@ class KaraokePlayer(QMainWindow):
                     QMessageBox.warning(d, "Name Exists", "A library with this name already exists.")
                     return
                 c2.execute("UPDATE songs SET lib_name=? WHERE lib_name=?", (new_name, existing_name))
+                c2.execute("UPDATE directories SET lib_name=? WHERE lib_name=?", (new_name, existing_name))
+                c2.execute("UPDATE scan_checkpoints SET lib_name=? WHERE lib_name=?", (new_name, existing_name))
                 c2.execute("UPDATE libraries SET lib_name=? WHERE lib_name=?", (new_name, existing_name))
+                self.fuzzy_index.rename_library(existing_name, new_name)
+                self.setLibraryColumns(None)
             elif not existing_name:
                 c2.execute("SELECT lib_name FROM libraries WHERE lib_name=?", (new_name,))
                 row2 = c2.fetchone()
@@ -1946,12 +4596,14 @@ class KaraokePlayer(QMainWindow):
                 new_sort_index = max_sort + 1
                 c2.execute("INSERT INTO libraries (lib_name, paths, sort_index) VALUES (?, ?, ?)", (new_name, "", new_sort_index))
             updated_paths = loc_text.toPlainText().strip()
-            c2.execute("UPDATE libraries SET paths=? WHERE lib_name=?", (updated_paths, new_name))
+            c2.execute("UPDATE libraries SET paths=?, scan_workers=? WHERE lib_name=?", (updated_paths, int(workers_combo.currentText()), new_name))
             conn2.commit()
             conn2.close()
+            if existing_name and new_name != existing_name:
+                # Only after the commit, so the reload sees the new name.
+                self.refreshLibraryColumns()
             if not existing_name:
                 self.scanMultiplePathsAndPopulate(new_name, updated_paths)
-                self._showScanPrompt(new_name)
             d.accept()
             self.loadLibraryPaths()
             self.buildCategories()
@@ -1961,23 +4613,36 @@ class KaraokePlayer(QMainWindow):
         d.exec()
 
     def scanMultiplePathsAndPopulate(self, lib_name, multiline_paths):
+        # The paths are alternative locations of the same tree (loadLibraryPaths
+        # picks whichever holds the songs), so only the first valid one is
+        # scanned. Rows are upserted and orphans removed at the end, so a
+        # cancelled scan never leaves the library half-deleted.
         path_lines = [p.strip() for p in multiline_paths.splitlines() if p.strip()]
-        conn = sqlite3.connect("library.db")
-        c = conn.cursor()
-        c.execute("DELETE FROM songs WHERE lib_name=?", (lib_name,))
-        for single_path in path_lines:
-            p = Path(single_path)
-            if p.is_dir():
-                found_files = []
-                for ext in SUPPORTED_FILE_EXTENSIONS:
-                    found_files.extend(p.rglob("*" + ext))
-                for f in found_files:
-                    fn = f.name
-                    extension = f.suffix.casefold()
-                    artist, title = parse_filename_for_artist_song(fn)
-                    c.execute("INSERT INTO songs (lib_name, filename, extension, artist, title, duration_ms) VALUES (?,?,?,?,?,?)", (lib_name, fn, extension, artist, title, 0))
-        conn.commit()
-        conn.close()
+        roots = [p for p in path_lines if os.path.isdir(p)]
+        if roots:
+            self.startLibraryScan(lib_name, roots[0], prompt_durations=True)
+
+    def startLibraryScan(self, library_name, folder, prompt_durations=False, notify=True, manifest=None):
+        if library_name in self.library_scans:
+            return
+        cancel_event = threading.Event()
+        thread = threading.Thread(target=self.scanAndStoreLibrary, args=(library_name, folder, cancel_event, manifest), daemon=True)
+        self.library_scans[library_name] = {
+            "thread": thread, "cancel": cancel_event, "prompt_durations": prompt_durations, "notify": notify
+        }
+        thread.start()
+
+    def cancelLibraryScan(self, library_name):
+        scan = self.library_scans.get(library_name)
+        if scan:
+            scan["cancel"].set()
+
+    def resumeInterruptedScans(self):
+        c = self.conn.cursor()
+        c.execute("SELECT lib_name, folder FROM scan_checkpoints")
+        for lib_name, folder in c.fetchall():
+            if self.library_map.get(lib_name) == folder and os.path.isdir(folder):
+                self.startLibraryScan(lib_name, folder, notify=False)
 
     def _showScanPrompt(self, lib_name):
         dlg = QDialog(self)
@@ -2000,143 +4665,382 @@ class KaraokePlayer(QMainWindow):
         later_btn.clicked.connect(dlg.reject)
         dlg.show()
 
-    def scanAndStoreLibrary(self, library_name, folder):
-        import sqlite3
-        from pathlib import Path
-        
-        p = Path(folder)
-        conn = sqlite3.connect("library.db")
-        c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS songs
-            (lib_name TEXT, filename TEXT, extension TEXT, artist TEXT, title TEXT, duration_ms INTEGER)
-        """)
-        c.execute("CREATE INDEX IF NOT EXISTS idx_lib_name ON songs (lib_name)")
-        c.execute("CREATE INDEX IF NOT EXISTS idx_artist_title ON songs (artist, title)")
-        
-        existing_data = {}
-        c.execute("SELECT filename, duration_ms FROM songs WHERE lib_name = ?", (library_name,))
-        for row in c.fetchall():
-            filename, old_dur = row
-            existing_data[filename] = old_dur if old_dur else 0
-
-        found_files = []
-        for ext in SUPPORTED_FILE_EXTENSIONS:
-            found_files.extend(p.rglob("*" + ext))
-        found_files = list(found_files)
-
-        lib_item = None
-        for i in range(self.categories_list.count()):
-            item = self.categories_list.item(i)
-            if item.data(Qt.UserRole) == "LibrarySub":
-                txt = item.text().strip()
-                if txt == library_name:
-                    lib_item = item
-                    break
-        total_files = len(found_files)
-        processed_count = 0
-        if lib_item:
-            lib_item.setText(f"         {library_name} (0/{total_files})")
-
-        found_filenames = set()
-
-        for f in found_files:
-            fn = f.name
-            extension = f.suffix.casefold()
-            artist, title = parse_filename_for_artist_song(fn)
-            old_duration = existing_data.get(fn, 0)  
-
-            c.execute("""
-                INSERT OR REPLACE INTO songs
-                (lib_name, filename, extension, artist, title, duration_ms)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (library_name, fn, extension, artist, title, old_duration))
-
-            found_filenames.add(fn)
-            processed_count += 1
-            if lib_item:
-                lib_item.setText(f"         {library_name} ({processed_count}/{total_files})")
-
-        if found_filenames:
-            placeholders = ",".join("?" for _ in found_filenames)
-            c.execute(
-                f"DELETE FROM songs WHERE lib_name=? AND filename NOT IN ({placeholders})",
-                (library_name, *found_filenames)
-            )
-        else:
-            c.execute("DELETE FROM songs WHERE lib_name=?", (library_name,))
-        conn.commit()
-        conn.close()
+    def scanAndStoreLibrary(self, library_name, folder, cancel_event=None, manifest=None):
+        conn = open_library_db()
+        ensure_library_schema(conn)
+        self.library_scan_progress.emit(library_name, 0)
+        progress = lambda n: self.library_scan_progress.emit(library_name, n)
+        try:
+            workers = library_scan_workers(conn, library_name)
+            if manifest:
+                result = scan_library_from_manifest(conn, library_name, folder, manifest, progress_callback=progress,
+                                                    workers=workers, cancel_event=cancel_event)
+            else:
+                result = scan_library_incremental(conn, library_name, folder, progress_callback=progress,
+                                                  workers=workers, cancel_event=cancel_event)
+        except Exception as e:
+            log_error(f"Scan of {library_name} failed: {e}")
+            result = LibraryScanResult(library_name)
+            result.cancelled = True
+        finally:
+            conn.close()
 
-        cleanThumbs() 
+        cleanRemovedSongFiles(result.removed_songs, self.temp_folder)
+        cleanRemovedThumbnails(result.removed_song_ids)
 
         songs = self.db_fetch_library_songs(library_name, sort_by_artist=True)
         QTimer.singleShot(0, lambda: self.updateLibrarySongs(songs))
-        if lib_item:
-            lib_item.setText(f"         {library_name}")
+        self.library_scan_progress.emit(library_name, -1)
+        self.library_scan_finished.emit(library_name, result)
+
+    def onLibraryScanProgress(self, library_name, processed_count):
+        for i in range(self.categories_list.count()):
+            item = self.categories_list.item(i)
+            txt = item.text().strip()
+            if item.data(Qt.UserRole) == "LibrarySub" and (txt == library_name or txt.startswith(library_name + " (")):
+                if processed_count < 0:
+                    item.setText(f"         {library_name}")
+                else:
+                    item.setText(f"         {library_name} ({processed_count})")
+                break
+
+    def restartLibraryWatcher(self):
+        previous = {}
+        for watcher in getattr(self, "library_watchers", []):
+            watcher.stop()
+            previous[watcher.library_name] = watcher
+        self.library_watchers = []
+        if not self.settings.value("watchLibraries", True, type=bool):
+            return
+        for lib_name, folder in self.library_map.items():
+            if folder and os.path.isdir(folder):
+                watcher = LibraryWatcher(lib_name, folder, self, previous=previous.get(lib_name))
+                watcher.library_changed.connect(self.onLibraryChanged)
+                watcher.start()
+                self.library_watchers.append(watcher)
+
+    def onLibraryChanged(self, library_name, result):
+        self.media_tooltips.invalidate()
+        model = self.table_view.model()
+        if result.added_paths is None:
+            # A full rescan after lost events only reports counts; reload the rows instead.
+            if isinstance(model, LazyLibraryModel):
+                model.resetLoad()
+        else:
+            added = [(library_name, rel_path) + song_row_for_file(library_name, rel_path)[2:] + (result.added_song_ids.get(rel_path),)
+                     for rel_path in result.added_paths]
+            if isinstance(model, LazyLibraryModel):
+                model.applyLibraryChanges(library_name, added, result.removed_paths)
+        if result.removed_songs:
+            # Deleting renders can mean scanning a large temp folder.
+            threading.Thread(target=cleanRemovedSongFiles, args=(result.removed_songs, self.temp_folder), daemon=True).start()
+        if result.removed_song_ids:
+            threading.Thread(target=cleanRemovedThumbnails, args=(result.removed_song_ids,), daemon=True).start()
+        self.refreshFuzzyIndex()
+        self.refreshLibraryColumns()
+
+    def onMediaTooltipReady(self, path, text):
+        # The hover that asked for it got no tooltip; show it if the cursor is still on that cell.
+        if not text:
+            return
+        viewport = self.table_view.viewport()
+        pos = viewport.mapFromGlobal(QCursor.pos())
+        index = self.table_view.indexAt(pos)
+        if viewport.rect().contains(pos) and index.isValid() and index.data(Qt.ToolTipRole) == text:
+            QToolTip.showText(QCursor.pos(), text, viewport)
+
+    def onLibraryScanFinished(self, library_name, result):
+        scan = self.library_scans.pop(library_name, {})
+        self.refreshFuzzyIndex()
+        self.refreshLibraryColumns()
+        if result.cancelled:
+            user_cancelled = "cancel" in scan and scan["cancel"].is_set()
+            if scan.get("notify", True) and not user_cancelled:
+                QMessageBox.warning(self, "Scan interrupted", f"Scanning library '{library_name}' stopped before it finished.\nThe next rescan continues where it left off.")
+            return
+        if result.manifest_error:
+            QMessageBox.warning(self, "Manifest not used", f"The manifest for '{library_name}' did not match the files on disk ({result.manifest_error}), so the folder was scanned instead.")
+        if scan.get("prompt_durations") and self.countMissingDurations(library_name):
+            self._showScanPrompt(library_name)
+        elif scan.get("notify", True):
+            QMessageBox.information(self, "Rescan complete", f"Library '{library_name}' rescanned:\n{result.summary()}.")
+
+    def countMissingDurations(self, library_name):
+        # CDG durations come from the file size during the scan, so CDG-only libraries have none missing.
+        c = self.conn.cursor()
+        c.execute("SELECT COUNT(*) FROM songs WHERE lib_name = ? AND duration_ms = 0", (library_name,))
+        return c.fetchone()[0]
 
     def scan_durations_for_library(self, library_name):
-        import sqlite3
-        from pathlib import Path
-        conn = sqlite3.connect("library.db", timeout=10)
-        c = conn.cursor()
-        c.execute("SELECT filename, extension FROM songs WHERE lib_name = ? AND duration_ms = 0", (library_name,))
-        zero_duration_files = c.fetchall()
-        conn.close()
-        if not zero_duration_files:
+        folder = self.library_map.get(library_name, "")
+        if library_name in self.duration_probes or not folder:
+            return
+        total = self.countMissingDurations(library_name)
+        if not total:
             QMessageBox.information(self, "No durations to scan", "All songs in this library have a duration.")
             return
-        total = len(zero_duration_files)
         dlg = QProgressDialog("Scanning durations...", "Cancel", 0, total, self)
         dlg.setWindowTitle("Scan Durations")
         dlg.setWindowModality(Qt.NonModal)
         dlg.setFixedWidth(400)
+        dlg.setAutoClose(False)
+        dlg.setAutoReset(False)
         dlg.setValue(0)
-        canceled = False
-        conn = sqlite3.connect("library.db", timeout=10)
-        c = conn.cursor()
-        for i, (fn, ext) in enumerate(zero_duration_files, start=1):
-            if dlg.wasCanceled():
-                canceled = True
-                break
-            dlg.setLabelText("Scanning " + fn)
-            dlg.setValue(i)
-            full_path = str(Path(self.library_map[library_name]) / fn)
-            if ext.casefold() == ".cdg" and full_path.casefold().endswith(".cdg"):
-                full_path = full_path[:-4] + ".mp3"
-            dur = top_level_get_duration(full_path)
-            c.execute("UPDATE songs SET duration_ms = ? WHERE lib_name = ? AND filename = ?", (dur, library_name, fn))
-            if ext.casefold() in (".mp4", ".mkv", ".avi", ".cdg"):
-                createThumbnail(str(Path(self.library_map[library_name]) / fn))
-            QApplication.processEvents()
-        conn.commit()
-        conn.close()
-        dlg.close()
-        if not canceled:
-            QMessageBox.information(self, "Done", "Duration scan complete!")
+        dlg.canceled.connect(lambda: self.cancelDurationProbe(library_name))
+        dlg.show()
+        cancel_event = threading.Event()
+        thread = threading.Thread(target=self.probeLibraryDurations, args=(library_name, folder, cancel_event), daemon=True)
+        self.duration_probes[library_name] = {"thread": thread, "cancel": cancel_event, "dialog": dlg}
+        thread.start()
+
+    def probeLibraryDurations(self, library_name, folder, cancel_event):
+        conn = open_library_db()
+        probed = total = 0
+        try:
+            ensure_library_schema(conn)
+            report = lambda n: self.duration_probe_progress.emit(library_name, n)
+            probed, total = probe_library_durations(conn, library_name, folder, progress_callback=report,
+                                                    cancel_event=cancel_event, yield_to=self.viewport_probe.idle)
+        except Exception as e:
+            log_error(f"Duration scan of {library_name} failed: {e}")
+        finally:
+            conn.close()
+        self.duration_probe_finished.emit(library_name, probed, total, cancel_event.is_set())
+
+    def cancelDurationProbe(self, library_name):
+        probe = self.duration_probes.get(library_name)
+        if probe:
+            probe["cancel"].set()
+
+    def onDurationProbeProgress(self, library_name, done):
+        probe = self.duration_probes.get(library_name)
+        if probe:
+            probe["dialog"].setValue(done)
+
+    def onDurationProbeFinished(self, library_name, probed, total, cancelled):
+        probe = self.duration_probes.pop(library_name, None)
+        if probe:
+            probe["dialog"].close()
+        self.refreshLibraryColumns()
+        folder = self.library_map.get(library_name, "")
+        if not cancelled and folder:
+            # Thumbnails have their own queue; a duration scan just starts the library's job.
+            self.thumbnail_queue.generateLibrary(library_name, folder)
+        if cancelled:
+            QMessageBox.information(self, "Canceled", f"Duration scan was canceled after {probed} of {total} songs.\nRunning it again continues with the songs still missing a duration.")
         else:
-            QMessageBox.information(self, "Canceled", "Duration scan was canceled.")
+            QMessageBox.information(self, "Done", "Duration scan complete!")
 
-    def getDurationWithFfprobe(self, path_str):
-        if not os.path.exists(path_str):
-            return 0
-        cmd = [
-            "ffprobe", "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            path_str
-        ]
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                text=True, encoding='utf-8', errors='replace', startupinfo=startupinfo)
-        if result.returncode == 0:
+    def maybeSweepThumbnails(self):
+        """Run the full thumbnail sweep in the background once every THUMB_SWEEP_INTERVAL_DAYS."""
+        last = self.settings.value("lastThumbSweep", 0.0, type=float)
+        if time.time() - last < THUMB_SWEEP_INTERVAL_DAYS * 86400:
+            return
+        self.settings.setValue("lastThumbSweep", time.time())
+        threading.Thread(target=cleanThumbs, daemon=True).start()
+
+    def onFuzzyToggled(self, checked):
+        self.settings.setValue("fuzzySearch", checked)
+        if checked and not self.fuzzy_index.ready:
+            self.refreshFuzzyIndex()
+        self.doUpdateFilter()
+
+    def refreshFuzzyIndex(self):
+        """Bring the fuzzy index up to date with library.db on a background thread; it is only built once fuzzy search is used."""
+        if not (self.fuzzy_index.ready or self.btn_fuzzy.isChecked()):
+            return
+        if self.fuzzy_index_refreshing:
+            # Run once more when the current pass is done, so rows it already missed get picked up.
+            self.fuzzy_index_stale = True
+            return
+        self.fuzzy_index_refreshing = True
+        def run():
+            conn = open_library_db()
             try:
-                length = float(result.stdout.strip())
-                return int(length * 1000)
-            except Exception:
-                return 0
-        return 0
+                self.fuzzy_index.refresh(conn)
+            except sqlite3.Error as e:
+                log_error(f"Failed to update fuzzy search index: {e}")
+            finally:
+                conn.close()
+                self.fuzzy_index_ready.emit()
+        threading.Thread(target=run, daemon=True).start()
+
+    def onFuzzyIndexReady(self):
+        self.fuzzy_index_refreshing = False
+        if self.fuzzy_index_stale:
+            self.fuzzy_index_stale = False
+            self.refreshFuzzyIndex()
+        if self.btn_fuzzy.isChecked() and (self.song_search_line.text() or self.artist_search_line.text()):
+            self.doUpdateFilter()
+
+    def refreshLibraryColumns(self):
+        """(Re)load the in-memory library columns on a background thread when that mode is enabled."""
+        if not self.settings.value("inMemoryLibraryIndex", False, type=bool):
+            self.setLibraryColumns(None)
+            return
+        if self.library_columns_loading:
+            self.library_columns_stale = True
+            return
+        self.library_columns_loading = True
+        def run():
+            conn = open_library_db()
+            columns = None
+            try:
+                columns = LibraryColumns(conn)
+            except sqlite3.Error as e:
+                log_error(f"Failed to load the in-memory library index: {e}")
+            finally:
+                conn.close()
+                self.library_columns_ready.emit(columns)
+        threading.Thread(target=run, daemon=True).start()
+
+    def onLibraryColumnsReady(self, columns):
+        self.library_columns_loading = False
+        if self.library_columns_stale:
+            self.library_columns_stale = False
+            self.refreshLibraryColumns()
+            return
+        if not self.settings.value("inMemoryLibraryIndex", False, type=bool):
+            return
+        self.setLibraryColumns(columns)
+
+    def setLibraryColumns(self, columns):
+        if columns is None and self.library_columns is None:
+            return
+        self.library_columns = columns
+        model = self.table_view.model()
+        # Rows already shown came from SQL or from the previous columns, in another order or
+        # from another row set, so the view reloads from the new source instead of appending to them.
+        if isinstance(model, LazyLibraryModel) and (model.column_rows is not None or model.usesColumns()):
+            scroll = self.table_view.verticalScrollBar().value()
+            loaded = model.loaded_count
+            model.resetLoad()
+            while model.loaded_count < loaded and model.canFetchMore(QModelIndex()):
+                model.fetchMore(QModelIndex())
+            self.table_view.verticalScrollBar().setValue(scroll)
+
+    def fuzzySongIds(self, song_text, artist_text, lib_names):
+        """Ranked song_ids for a fuzzy search, or None when the plain substring search applies."""
+        if not self.btn_fuzzy.isChecked() or not self.fuzzy_index.ready or not (song_text or artist_text):
+            return None
+        return self.fuzzy_index.search(song_text, artist_text, lib_names)
+
+    def songIdFor(self, song_item):
+        if song_item.song_id is not None:
+            return song_item.song_id
+        libs = [song_item.lib_name] if song_item.lib_name else list(self.library_map)
+        for lib_name in libs:
+            folder = self.library_map.get(lib_name, "")
+            rel_path = library_rel_path(folder, song_item.file_path) if folder else None
+            if rel_path is not None:
+                song_id = find_song_id(self.conn.cursor(), lib_name, rel_path)
+                if song_id is not None:
+                    return song_id
+        return None
+
+    def requestSeekPreviews(self, song_item):
+        """Queue sprite sheets for the song being loaded and the one after it."""
+        songs = [song_item]
+        if 0 <= self.current_play_index < len(self.current_queue) - 1:
+            songs.append(self.current_queue[self.current_play_index + 1])
+        for song in songs:
+            if song.file_type.casefold() not in THUMBNAIL_EXTENSIONS:
+                continue
+            song_id = self.songIdFor(song)
+            if song_id is not None:
+                self.thumbnail_queue.requestSprite(song_id, song.file_path, song.duration_ms)
+
+    def loadSeekSprite(self, song_item):
+        song_id = self.songIdFor(song_item)
+        if self.seek_sprite and self.seek_sprite[0] == song_id:
+            return
+        self.seek_sprite = None
+        if song_id is None:
+            return
+        tconn = open_thumb_db()
+        try:
+            row = load_sprite(tconn, song_id)
+        except sqlite3.Error as e:
+            log_error(f"Failed to read sprite sheet: {e}")
+            row = None
+        finally:
+            tconn.close()
+        if row:
+            sheet = QPixmap()
+            if sheet.loadFromData(row[5]):
+                self.seek_sprite = (song_id, row[:5], sheet)
+
+    def showSeekPreview(self, song_item, position_ms):
+        """Show the sprite sheet frame for position_ms above the seek handle; no decoding happens here."""
+        if not self.seek_sprite:
+            return
+        _, (interval_ms, columns, frame_count, frame_w, frame_h), sheet = self.seek_sprite
+        frame = min(max(position_ms, 0) // interval_ms, frame_count - 1)
+        self.seek_preview.setPixmap(sheet.copy(QRect((frame % columns) * frame_w, (frame // columns) * frame_h, frame_w, frame_h)))
+        self.seek_preview.adjustSize()
+        handle_x = QStyle.sliderPositionFromValue(self.seek_slider.minimum(), self.seek_slider.maximum(),
+                                                  self.seek_slider.value(), self.seek_slider.width())
+        anchor = self.seek_slider.mapTo(self, QPoint(handle_x, 0))
+        x = min(max(anchor.x() - self.seek_preview.width() // 2, 0), self.width() - self.seek_preview.width())
+        y = anchor.y() - self.seek_preview.height() - 6
+        if y < 0:
+            y = anchor.y() + self.seek_slider.height() + 6
+        self.seek_preview.move(x, y)
+        self.seek_preview.show()
+        self.seek_preview.raise_()
+
+    def onSpriteReady(self, song_id):
+        # A sheet finished while the user was dragging; pick it up on the next press.
+        if self.seek_sprite and self.seek_sprite[0] == song_id:
+            self.seek_sprite = None
+
+    def onThumbnailReady(self, song_id):
+        self.thumbnail_cache.addExisting(song_id)
+        self.table_view.viewport().update()
+
+    def onLibraryThumbnailsFinished(self, library_name, made, cancelled):
+        if self.thumbnail_jobs_notify.pop(library_name, False) and not cancelled:
+            QMessageBox.information(self, "Thumbnails done", f"{made} thumbnails were created for '{library_name}'.")
+
+    def generateLibraryThumbnails(self, library_name, force=False):
+        folder = self.library_map.get(library_name, "")
+        if not folder:
+            return
+        if force:
+            c = self.conn.cursor()
+            c.execute("SELECT song_id FROM songs WHERE lib_name = ?", (library_name,))
+            tconn = open_thumb_db()
+            tconn.executemany("DELETE FROM thumbnails WHERE song_id = ?", c.fetchall())
+            tconn.commit()
+            tconn.close()
+            self.thumbnail_cache.invalidate()
+        if self.thumbnail_queue.generateLibrary(library_name, folder):
+            self.thumbnail_jobs_notify[library_name] = True
+
+    def queueVisibleDurations(self):
+        model = self.table_view.model()
+        if not isinstance(model, LazyLibraryModel):
+            return
+        first = self.table_view.rowAt(0)
+        if first < 0:
+            return
+        last = self.table_view.rowAt(self.table_view.viewport().height() - 1)
+        if last < 0:
+            last = model.rowCount() - 1
+        # Bottom up, because the queue serves the newest request first.
+        for row in range(last, first - 1, -1):
+            song = model.getSongItem(row)
+            if song and not song.duration_ms and song.song_id is not None:
+                self.viewport_probe.request(song.file_path, song.song_id)
+
+    def onProbedDuration(self, path_str, duration_ms):
+        model = self.table_view.model()
+        if isinstance(model, LazyLibraryModel):
+            model.setSongDuration(path_str, duration_ms)
+        self.songs_model.setSongDuration(path_str, duration_ms)
+
+    def getDurationWithFfprobe(self, path_str):
+        return top_level_get_duration(path_str)
 
     def initUI(self):
         if QApplication.instance():
@@ -2209,6 +5113,9 @@ class KaraokePlayer(QMainWindow):
             "QSlider::handle:horizontal { background: #ffffff; border: 1px solid #333333; width: 10px; height: 10px; margin: -4px 0; border-radius: 4px; }"
         )
         sr_layout.addWidget(self.seek_slider, 1)
+        self.seek_preview = QLabel(self)
+        self.seek_preview.setStyleSheet("QLabel { background-color: #181818; border: 1px solid #333333; }")
+        self.seek_preview.hide()
 
         self.lbl_total_time = QLabel("0:00")
         self.lbl_total_time.setFixedWidth(40)
@@ -2432,6 +5339,17 @@ class KaraokePlayer(QMainWindow):
         search_hbox.addWidget(self.song_search_line)
         search_hbox.addWidget(self.artist_search_line)
 
+        self.btn_fuzzy = QPushButton("Fuzzy")
+        self.btn_fuzzy.setCheckable(True)
+        self.btn_fuzzy.setFixedWidth(60)
+        self.btn_fuzzy.setToolTip("Tolerate typos in the song and artist search (library view)")
+        self.btn_fuzzy.setStyleSheet("QPushButton { background-color: #242424; color: #FFFFFF; border: 1px solid #333333; padding: 4px 6px; min-height: 28px; } QPushButton:hover { background-color: #333333; } QPushButton:checked { background-color: #3A3A3A; border: 1px solid #777777; }")
+        self.btn_fuzzy.setChecked(self.settings.value("fuzzySearch", False, type=bool))
+        self.btn_fuzzy.toggled.connect(self.onFuzzyToggled)
+        search_hbox.addWidget(self.btn_fuzzy)
+        if self.btn_fuzzy.isChecked():
+            self.refreshFuzzyIndex()
+
         self.btn_youtube = QPushButton("Send to YouTube")
         self.btn_youtube.setFixedWidth(120)
         self.btn_youtube.clicked.connect(self.searchYouTube)
@@ -2489,6 +5407,8 @@ class KaraokePlayer(QMainWindow):
         """)
         self.table_view.verticalHeader().setDefaultAlignment(Qt.AlignCenter)
 
+        self.table_view.verticalScrollBar().valueChanged.connect(lambda value: self.visible_durations_timer.start())
+        self.thumbnail_cache.ready.connect(lambda key, image: self.table_view.viewport().update())
         self.table_view.verticalScrollBar().setStyleSheet(
             "QScrollBar:vertical { background: #181818; width: 20px; margin: 0; }"
             "QScrollBar::handle:vertical { background: #3C3C3C; min-height: 20px; }"
@@ -2641,6 +5561,9 @@ class KaraokePlayer(QMainWindow):
         lazy_model.fetchMore(QModelIndex())
         self.table_view.verticalScrollBar().setValue(0)
         self.updateTableViewMode()
+        lazy_model.rowsInserted.connect(lambda parent, first, last: self.visible_durations_timer.start())
+        lazy_model.modelReset.connect(self.visible_durations_timer.start)
+        self.visible_durations_timer.start()
 
     def triggerFetchMoreIfNeeded(self):
         model = self.table_view.model()
@@ -2787,7 +5710,7 @@ class KaraokePlayer(QMainWindow):
         with open(old_file, "w", encoding="utf-8") as f:
             for s in songs:
                 lib = s.lib_name if s.lib_name else ""
-                fn_only = os.path.basename(s.file_path)
+                fn_only = self.libraryRelPath(s)
                 line = f"{lib}<<<{fn_only}<<<{s.key_change}<<<{s.tempo_change}<<<{s.duration_ms}\n"
                 f.write(line)
     def loadListFromFile(self, list_name):
@@ -2799,6 +5722,7 @@ class KaraokePlayer(QMainWindow):
         with open(fn, "r", encoding="utf-8") as f:
             lines = f.readlines()
 
+        entries = []
         for ln in lines:
             ln = ln.strip()
             if not ln:
@@ -2807,7 +5731,11 @@ class KaraokePlayer(QMainWindow):
             if len(parts) < 5:
                 continue
 
-            lib_name, file_only, key_s, tempo_s, dur_s = parts
+            entries.append(parts)
+
+        # Durations still missing are left for the caller to probe in the background.
+        known = self.lookupLibrarySongs((parts[0], parts[1]) for parts in entries)
+        for lib_name, file_only, key_s, tempo_s, dur_s in entries:
             try:
                 key_c = int(key_s)
             except:
@@ -2821,27 +5749,61 @@ class KaraokePlayer(QMainWindow):
             except:
                 dms = 0
 
-            full_path = file_only  
-            if lib_name and lib_name in self.library_map:
-                folder = self.library_map[lib_name]
-                full_path = str(Path(folder) / file_only)
-
-            extension = Path(full_path).suffix.casefold()
-            artist, title = parse_filename_for_artist_song(Path(full_path).name)
-
-            si = SongItem(full_path, extension, artist, title, dms)
+            folder = self.library_map.get(lib_name, "") if lib_name else ""
+            row = known.get((lib_name, file_only))
+            if row:
+                song_id, rel_path, extension, artist, title, duration_ms = row
+                si = SongItem(str(Path(folder) / rel_path), extension, artist, title, duration_ms or dms)
+                si.song_id = song_id
+            else:
+                full_path = str(Path(folder) / file_only) if folder else file_only
+                artist, title = parse_filename_for_artist_song(Path(full_path).name)
+                si = SongItem(full_path, Path(full_path).suffix.casefold(), artist, title, dms)
             si.key_change = key_c
             si.tempo_change = tempo_c
             si.lib_name = lib_name
-
-            if dms == 0:
-                dur = self.getDurationWithFfprobe(full_path)
-                si.duration_ms = dur
-                si.duration_str = ms_to_mmss(dur)
-
             items.append(si)
 
         return items
+
+    def lookupLibrarySongs(self, entries):
+        """Find the songs rows for (lib_name, stored_path) pairs from a list.
+
+        Paths are resolved through the directories and songs unique keys, a
+        chunk of a few hundred at a time, instead of scanning song_paths.
+        """
+        wanted = {}
+        for lib_name, stored_path in entries:
+            if lib_name in self.library_map:
+                wanted.setdefault(lib_name, set()).add(tuple(stored_path.rpartition("/")[::2]))
+        found = {}
+        c = self.conn.cursor()
+        columns = "s.song_id, d.rel_dir, s.filename, s.extension, s.artist, s.title, s.duration_ms"
+        for lib_name, keys in wanted.items():
+            # Lists written before songs kept their folder only hold the file name; idx_filename finds those anywhere.
+            names = sorted(fn for rel_dir, fn in keys if not rel_dir)
+            nested = sorted(key for key in keys if key[0])
+            rows = []
+            for i in range(0, len(names), 400):
+                chunk = names[i:i + 400]
+                c.execute(f"SELECT {columns} FROM songs s JOIN directories d ON d.dir_id = s.dir_id "
+                          f"WHERE s.filename IN ({','.join('?' * len(chunk))}) AND +s.lib_name = ?", (*chunk, lib_name))
+                rows.extend(c.fetchall())
+            for i in range(0, len(nested), 400):
+                chunk = nested[i:i + 400]
+                rel_dirs = sorted({rel_dir for rel_dir, _ in chunk})
+                filenames = sorted({fn for _, fn in chunk})
+                c.execute(f"SELECT {columns} FROM directories d JOIN songs s ON s.dir_id = d.dir_id "
+                          f"WHERE d.lib_name = ? AND d.rel_dir IN ({','.join('?' * len(rel_dirs))}) "
+                          f"AND s.filename IN ({','.join('?' * len(filenames))})", (lib_name, *rel_dirs, *filenames))
+                # The two IN lists also pair folders and names from different entries.
+                rows.extend(row for row in c.fetchall() if (row[1], row[2]) in keys)
+            for song_id, rel_dir, filename, extension, artist, title, duration_ms in rows:
+                rel_path = f"{rel_dir}/{filename}" if rel_dir else filename
+                row = (song_id, rel_path, extension, artist, title, duration_ms)
+                found[(lib_name, rel_path)] = row
+                found.setdefault((lib_name, filename), row)
+        return found
     def showHistory(self, timeframe):
         lines = []
         if os.path.exists(HISTORY_LOG_FILE):
@@ -2880,10 +5842,7 @@ class KaraokePlayer(QMainWindow):
                 duration = 0
             file_type = Path(fn_only).suffix.casefold()
             artist, title = parse_filename_for_artist_song(fn_only)
-            full_path = fn_only
-            if lib and lib in self.library_map and self.library_map[lib]:
-                folder = self.library_map[lib]
-                full_path = str(Path(folder) / fn_only)
+            full_path = self.libraryFullPath(lib, fn_only)
             si = SongItem(full_path, file_type, artist, title, duration)
             si.lib_name = lib
             si.key_change = keyc
@@ -2929,10 +5888,33 @@ class KaraokePlayer(QMainWindow):
         elif timeframe == "All Time":
             return True
         return False
+    def libraryRelPath(self, song_item):
+        """Path saved in lists and history: relative to the song's library folder when it is inside one."""
+        folder = self.library_map.get(song_item.lib_name or "", "")
+        if folder:
+            rel_path = library_rel_path(folder, song_item.file_path)
+            if rel_path is not None:
+                return rel_path
+        return os.path.basename(song_item.file_path)
+
+    def libraryFullPath(self, lib_name, stored_path):
+        folder = self.library_map.get(lib_name, "") if lib_name else ""
+        if not folder:
+            return stored_path
+        full_path = str(Path(folder) / stored_path)
+        if "/" not in stored_path and not os.path.exists(full_path):
+            # Lists and history written before songs kept their folder only hold the file name.
+            c = self.conn.cursor()
+            c.execute("SELECT rel_path FROM song_paths WHERE lib_name = ? AND filename = ? LIMIT 1", (lib_name, stored_path))
+            row = c.fetchone()
+            if row:
+                full_path = str(Path(folder) / row[0])
+        return full_path
+
     def logToHistory(self, song_item):
         now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         lib = song_item.lib_name if song_item.lib_name else ""
-        fn_only = os.path.basename(song_item.file_path)
+        fn_only = self.libraryRelPath(song_item)
         line = f"{now_str}<<<{lib}<<<{fn_only}<<<{song_item.key_change}<<<{song_item.tempo_change}<<<{song_item.duration_ms}\n"
         with open(HISTORY_LOG_FILE, "a", encoding="utf-8") as f:
             f.write(line)
@@ -3144,6 +6126,7 @@ class KaraokePlayer(QMainWindow):
     def loadSong(self, song_item):
         self.video_player.stop()
         self.audio_player_preset.stop()
+        self.requestSeekPreviews(song_item)
         self.video_player.setLoops(1)
         self.audio_player_preset.setLoops(1)
         from pathlib import Path
@@ -3322,6 +6305,25 @@ class KaraokePlayer(QMainWindow):
             self.setWindowTitle(f"Karaoke Player - Rendering: {count} to be added to queue")
         else:
             self.setWindowTitle("Karaoke Player")
+    def onAudioDurationChanged(self, mp3_ms):
+        """Cross-check the size-derived length of a playing CDG against its MP3 once the player knows it."""
+        if not (self.current_queue and 0 <= self.current_play_index < len(self.current_queue)):
+            return
+        si = self.current_queue[self.current_play_index]
+        if si.file_type.casefold() != ".cdg" or si.key_change or si.tempo_change:
+            return
+        dur = reconcile_cdg_duration(si.duration_ms, mp3_ms)
+        if dur == si.duration_ms:
+            return
+        si.duration_ms = dur
+        si.duration_str = ms_to_mmss(dur)
+        folder = self.library_map.get(si.lib_name or "", "")
+        rel_path = library_rel_path(folder, si.file_path) if folder else None
+        if rel_path is not None:
+            c = self.conn.cursor()
+            c.execute("UPDATE songs SET duration_ms = ? WHERE song_id = ?", (dur, find_song_id(c, si.lib_name, rel_path)))
+            self.conn.commit()
+
     def updatePlayerUI(self):
         if self._user_seeking:
             return
@@ -3679,8 +6681,8 @@ class KaraokePlayer(QMainWindow):
         artist_lower = artist_text.casefold()
         conn = sqlite3.connect('library.db')
         c = conn.cursor()
-        query = "SELECT lib_name, filename, extension, artist, title, duration_ms FROM songs WHERE title LIKE ? AND artist LIKE ?"
-        c.execute(query, (f"%{song_lower}%", f"%{artist_lower}%"))
+        clause, params = song_search_filter(c, song_lower, artist_lower)
+        c.execute("SELECT lib_name, rel_path, extension, artist, title, duration_ms FROM song_paths WHERE 1" + clause, params)
         rows = c.fetchall()
         conn.close()
         for row in rows:
@@ -3857,7 +6859,7 @@ class KaraokePlayer(QMainWindow):
             possible_paths = [p.strip() for p in raw_paths.splitlines() if p.strip()]
             c2 = sqlite3.connect("library.db")
             cc2 = c2.cursor()
-            cc2.execute("SELECT filename FROM songs WHERE lib_name=? LIMIT 5", (lib_name,))
+            cc2.execute("SELECT rel_path FROM song_paths WHERE lib_name=? LIMIT 5", (lib_name,))
             first_five = cc2.fetchall()
             c2.close()
             found_valid = False
@@ -3896,6 +6898,8 @@ class KaraokePlayer(QMainWindow):
                 msg.exec()
                 if msg.clickedButton() == edit_btn:
                     self.showEditLibraryDialog(lib_name)
+        if hasattr(self, "table_view"):
+            self.restartLibraryWatcher()
 
     def saveLibraryPaths(self):
         pass
@@ -3910,8 +6914,11 @@ class KaraokePlayer(QMainWindow):
             self.user_lists[list_name] = str(list_file)
     def onSeekPress(self):
         self._user_seeking = True
+        if 0 <= self.current_play_index < len(self.current_queue):
+            self.loadSeekSprite(self.current_queue[self.current_play_index])
     def onSeekRelease(self):
         self._user_seeking = False
+        self.seek_preview.hide()
         pos = self.seek_slider.value()
         if 0 <= self.current_play_index < len(self.current_queue):
             si = self.current_queue[self.current_play_index]
@@ -3933,10 +6940,13 @@ class KaraokePlayer(QMainWindow):
                 total_ms = si.duration_ms
                 new_pos = int(value / 1000 * total_ms)
                 self.lbl_current_time.setText(ms_to_mmss(new_pos))
+                self.showSeekPreview(si, new_pos)
             else:
                 duration = self.video_player.duration()
                 new_pos = int(value / 1000 * duration)
                 self.lbl_current_time.setText(ms_to_mmss(new_pos))
+                # A tempo render is shorter or longer than the source the sprites came from.
+                self.showSeekPreview(si, int(new_pos * (1.0 + si.tempo_change * 0.05)))
     def keyPressEvent(self, event):
         super().keyPressEvent(event)
     def toggleFullscreen(self):
@@ -4029,8 +7039,11 @@ class KaraokePlayer(QMainWindow):
             self.user_lists[list_name] = str(list_file)
     def onSeekPress(self):
         self._user_seeking = True
+        if 0 <= self.current_play_index < len(self.current_queue):
+            self.loadSeekSprite(self.current_queue[self.current_play_index])
     def onSeekRelease(self):
         self._user_seeking = False
+        self.seek_preview.hide()
         pos = self.seek_slider.value()
         if 0 <= self.current_play_index < len(self.current_queue):
             si = self.current_queue[self.current_play_index]
@@ -4052,10 +7065,13 @@ class KaraokePlayer(QMainWindow):
                 total_ms = si.duration_ms
                 new_pos = int(value / 1000 * total_ms)
                 self.lbl_current_time.setText(ms_to_mmss(new_pos))
+                self.showSeekPreview(si, new_pos)
             else:
                 duration = self.video_player.duration()
                 new_pos = int(value / 1000 * duration)
                 self.lbl_current_time.setText(ms_to_mmss(new_pos))
+                # A tempo render is shorter or longer than the source the sprites came from.
+                self.showSeekPreview(si, int(new_pos * (1.0 + si.tempo_change * 0.05)))
     def keyPressEvent(self, event):
         super().keyPressEvent(event)
     def toggleFullscreen(self):
@@ -4081,6 +7097,16 @@ class KaraokePlayer(QMainWindow):
                 self.silence_worker.cancel()
             self.silence_detect_thread.quit()
             self.silence_detect_thread.wait()
+        for watcher in getattr(self, "library_watchers", []):
+            watcher.stop()
+        for watcher in getattr(self, "library_watchers", []):
+            watcher.wait(timeout=5)
+        for scan in list(self.library_scans.values()) + list(self.duration_probes.values()):
+            # Stopping commits the scan's checkpoint so it resumes on next start.
+            scan["cancel"].set()
+            scan["thread"].join(timeout=10)
+        self.viewport_probe.stop()
+        self.thumbnail_queue.stop()
         if hasattr(self, 'conn') and self.conn:
             self.conn.close()
         super().closeEvent(event)
@@ -4162,6 +7188,9 @@ class LazyLibraryModel(QAbstractTableModel):
         self.songs = []
         self.total_count = 0
         self.loaded_count = 0
+        self.fuzzy_ids = None
+        self.columns = None
+        self.column_rows = None
         self.loadTotalCount()
 
     def setSongFilter(self, text):
@@ -4173,6 +7202,10 @@ class LazyLibraryModel(QAbstractTableModel):
     def setLetterFilter(self, letter):
         self.letter_filter = letter
 
+    def usesColumns(self):
+        """Whether the rows come from the in-memory columns rather than SQL or the fuzzy index."""
+        return self.parent_ref.library_columns is not None and not self.letter_filter and self.fuzzy_ids is None
+
     def resetLoad(self):
         self.songs = []
         self.loaded_count = 0
@@ -4182,8 +7215,6 @@ class LazyLibraryModel(QAbstractTableModel):
 
     def loadTotalCount(self):
         import sqlite3
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
         libs = []
         if self.lib_name is None:
             for k in self.parent_ref.library_map.keys():
@@ -4191,6 +7222,24 @@ class LazyLibraryModel(QAbstractTableModel):
         else:
             libs.append(self.lib_name)
 
+        # Fuzzy results come ranked from the in-memory index; fetchMore pages through them.
+        self.fuzzy_ids = self.parent_ref.fuzzySongIds(self.song_filter, self.artist_filter, libs)
+        if self.fuzzy_ids is not None:
+            self.total_count = len(self.fuzzy_ids)
+            self.column_rows = None
+            return
+
+        self.columns = self.parent_ref.library_columns
+        if self.usesColumns():
+            grouped = self.lib_name is None and self.parent_ref.aggregated_grouping
+            self.column_rows = self.columns.select(libs, self.song_filter, self.artist_filter, self.sort_column,
+                                                   self.sort_order != Qt.AscendingOrder, grouped)
+            self.total_count = len(self.column_rows)
+            return
+        self.column_rows = None
+
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
         placeholders = ','.join(['?'] * len(libs))
         query = 'SELECT COUNT(*) FROM songs WHERE lib_name IN (' + placeholders + ')'
         params = libs[:]
@@ -4199,13 +7248,9 @@ class LazyLibraryModel(QAbstractTableModel):
             query += ' AND artist LIKE ?'
             params.append(self.letter_filter + '%')
 
-        if self.artist_filter:
-            query += ' AND artist LIKE ?'
-            params.append('%' + self.artist_filter + '%')
-
-        if self.song_filter:
-            query += ' AND title LIKE ?'
-            params.append('%' + self.song_filter + '%')
+        clause, filter_params = song_search_filter(c, self.song_filter, self.artist_filter)
+        query += clause
+        params.extend(filter_params)
 
         c.execute(query, tuple(params))
         row = c.fetchone()
@@ -4236,6 +7281,9 @@ class LazyLibraryModel(QAbstractTableModel):
                 return song.file_type.lstrip('.')
             elif col == 4:
                 return song.lib_name  
+        if role == Qt.ToolTipRole and index.column() == 3:
+            tooltips = getattr(self.parent_ref, "media_tooltips", None)
+            return tooltips.text(self.songs[index.row()].audio_file_path) if tooltips else None
         if role == Qt.TextAlignmentRole:
             return Qt.AlignLeft | Qt.AlignVCenter
         return None
@@ -4266,22 +7314,40 @@ class LazyLibraryModel(QAbstractTableModel):
             return
         start = self.loaded_count
         self.beginInsertRows(QModelIndex(), start, start + to_fetch - 1)
+        if self.fuzzy_ids is None and self.column_rows is not None:
+            for row in self.column_rows[start:start + to_fetch]:
+                self.songs.append(self.columns.song_item(row, self.parent_ref.library_map))
+            self.loaded_count += to_fetch
+            self.endInsertRows()
+            return
         conn = sqlite3.connect(self.db_path)
         c = conn.cursor()
-        if self.lib_name is None:
+        if self.fuzzy_ids is not None:
+            ids = self.fuzzy_ids[start:start + to_fetch]
+            c.execute("SELECT song_id, lib_name, rel_path, extension, artist, title, duration_ms FROM song_paths WHERE song_id IN (" +
+                      ','.join(['?'] * len(ids)) + ")", ids)
+            rows = {row[0]: row for row in c.fetchall()}
+            conn.close()
+            for song_id in ids:
+                if song_id not in rows:
+                    continue
+                _, ln, fn, ext, artist, title, dms = rows[song_id]
+                folder = self.parent_ref.library_map.get(ln, '')
+                si = SongItem(str(Path(folder) / fn), ext, artist, title, dms)
+                si.lib_name = ln
+                si.song_id = song_id
+                self.songs.append(si)
+        elif self.lib_name is None:
             libs = list(self.parent_ref.library_map.keys())
             placeholders = ','.join(['?'] * len(libs))
-            query = "SELECT s.lib_name, s.filename, s.extension, s.artist, s.title, s.duration_ms FROM songs s JOIN libraries l ON s.lib_name = l.lib_name WHERE s.lib_name IN (" + placeholders + ")"
+            query = "SELECT s.song_id, s.lib_name, s.rel_path, s.extension, s.artist, s.title, s.duration_ms FROM song_paths s JOIN libraries l ON s.lib_name = l.lib_name WHERE s.lib_name IN (" + placeholders + ")"
             params = libs[:]
             if self.letter_filter:
                 query += " AND s.artist LIKE ?"
                 params.append(self.letter_filter + '%')
-            if self.artist_filter:
-                query += " AND s.artist LIKE ?"
-                params.append('%' + self.artist_filter + '%')
-            if self.song_filter:
-                query += " AND s.title LIKE ?"
-                params.append('%' + self.song_filter + '%')
+            clause, filter_params = song_search_filter(c, self.song_filter, self.artist_filter, "s.")
+            query += clause
+            params.extend(filter_params)
             if self.parent_ref.aggregated_grouping:
                 base_order = "l.sort_index ASC, s.artist COLLATE NOCASE ASC, s.title COLLATE NOCASE ASC"
                 query += " ORDER BY " + base_order
@@ -4304,24 +7370,22 @@ class LazyLibraryModel(QAbstractTableModel):
             rows = c.fetchall()
             conn.close()
             for row in rows:
-                ln, fn, ext, artist, title, dms = row
+                song_id, ln, fn, ext, artist, title, dms = row
                 folder = self.parent_ref.library_map.get(ln, '')
                 full_path = str(Path(folder) / fn)
                 si = SongItem(full_path, ext, artist, title, dms)
                 si.lib_name = ln
+                si.song_id = song_id
                 self.songs.append(si)
         else:
-            query = "SELECT lib_name, filename, extension, artist, title, duration_ms FROM songs WHERE lib_name = ?"
+            query = "SELECT song_id, lib_name, rel_path, extension, artist, title, duration_ms FROM song_paths WHERE lib_name = ?"
             params = [self.lib_name]
             if self.letter_filter:
                 query += " AND artist LIKE ?"
                 params.append(self.letter_filter + '%')
-            if self.artist_filter:
-                query += " AND artist LIKE ?"
-                params.append('%' + self.artist_filter + '%')
-            if self.song_filter:
-                query += " AND title LIKE ?"
-                params.append('%' + self.song_filter + '%')
+            clause, filter_params = song_search_filter(c, self.song_filter, self.artist_filter)
+            query += clause
+            params.extend(filter_params)
             if self.sort_column == 1:
                 order_dir = "ASC" if self.sort_order == Qt.AscendingOrder else "DESC"
                 query += " ORDER BY artist " + order_dir + ", title ASC"
@@ -4335,11 +7399,12 @@ class LazyLibraryModel(QAbstractTableModel):
             rows = c.fetchall()
             conn.close()
             for row in rows:
-                ln, fn, ext, artist, title, dms = row
+                song_id, ln, fn, ext, artist, title, dms = row
                 folder = self.parent_ref.library_map.get(ln, '')
                 full_path = str(Path(folder) / fn)
                 si = SongItem(full_path, ext, artist, title, dms)
                 si.lib_name = ln
+                si.song_id = song_id
                 self.songs.append(si)
         self.loaded_count += to_fetch
         self.endInsertRows()
@@ -4349,6 +7414,18 @@ class LazyLibraryModel(QAbstractTableModel):
             return self.songs[row]
         return None
 
+    def setSongDuration(self, path_str, duration_ms):
+        # Rows move when the watcher patches the model, so look the song up instead of caching its row.
+        for row, song in enumerate(self.songs):
+            if song.file_path == path_str:
+                song.duration_ms = duration_ms
+                song.duration_str = ms_to_mmss(duration_ms)
+                if self.columns is not None and song.song_id is not None:
+                    self.columns.set_duration(song.song_id, duration_ms)
+                index = self.index(row, 2)
+                self.dataChanged.emit(index, index)
+                return
+
     def sort(self, column, order=Qt.AscendingOrder):
         self.sort_column = column
         self.sort_order = order
@@ -4361,6 +7438,84 @@ class LazyLibraryModel(QAbstractTableModel):
         self.resetLoad()
         self.fetchMore(QModelIndex())
 
+    def _matchesFilters(self, song):
+        # The same folding song_search_filter applies in SQL, so "beyonce" finds "Beyoncé" here too.
+        if self.letter_filter and not (song.artist or "").casefold().startswith(self.letter_filter.casefold()):
+            return False
+        if self.artist_filter and search_key(self.artist_filter) not in search_key(song.artist):
+            return False
+        if self.song_filter and search_key(self.song_filter) not in search_key(song.title):
+            return False
+        return True
+
+    def _orderSpec(self):
+        # Mirrors the ORDER BY clauses in fetchMore as (getter, descending) pairs.
+        desc = self.sort_order != Qt.AscendingOrder
+        field = {
+            0: lambda s: (s.title or "").casefold(),
+            1: lambda s: (s.artist or "").casefold(),
+            2: lambda s: s.duration_ms,
+            3: lambda s: (s.file_type or "").casefold(),
+        }
+        if self.lib_name is None:
+            if self.parent_ref.aggregated_grouping:
+                conn = sqlite3.connect(self.db_path)
+                sort_index = dict(conn.execute("SELECT lib_name, sort_index FROM libraries").fetchall())
+                conn.close()
+                return [(lambda s: sort_index.get(s.lib_name) or 0, False), (field[1], False), (field[0], False)]
+            return [(field.get(self.sort_column, field[1]), desc)]
+        if self.sort_column == 1:
+            return [(field[1], desc), (field[0], False)]
+        return [(field.get(self.sort_column, field[3]), desc)]
+
+    def applyLibraryChanges(self, lib_name, added_rows, removed_paths):
+        """Patch the loaded rows in place instead of resetting the whole view.
+
+        Rows paged from the in-memory columns are left alone: the columns are
+        reloaded after every change and the view resets from the new ones.
+        """
+        if self.lib_name is not None and self.lib_name != lib_name:
+            return
+        if self.column_rows is not None:
+            return
+        folder = self.parent_ref.library_map.get(lib_name, '')
+        removed = {str(Path(folder) / p) for p in removed_paths}
+        if removed:
+            for row in range(len(self.songs) - 1, -1, -1):
+                song = self.songs[row]
+                if song.lib_name == lib_name and song.file_path in removed:
+                    self.beginRemoveRows(QModelIndex(), row, row)
+                    del self.songs[row]
+                    self.loaded_count -= 1
+                    self.endRemoveRows()
+        if added_rows:
+            all_loaded = self.loaded_count >= self.total_count
+            spec = self._orderSpec()
+            def comes_before(a, b):
+                for getter, descending in spec:
+                    va, vb = getter(a), getter(b)
+                    if va != vb:
+                        return va > vb if descending else va < vb
+                return False
+            loaded = {s.file_path for s in self.songs if s.lib_name == lib_name}
+            for ln, rel_path, ext, artist, title, dms, song_id in added_rows:
+                full_path = str(Path(folder) / rel_path)
+                if full_path in loaded:
+                    continue
+                si = SongItem(full_path, ext, artist, title, dms)
+                si.lib_name = ln
+                si.song_id = song_id
+                if not self._matchesFilters(si):
+                    continue
+                pos = next((i for i, other in enumerate(self.songs) if comes_before(si, other)), len(self.songs))
+                # Rows past the loaded range are picked up by the next fetchMore.
+                if pos < len(self.songs) or all_loaded:
+                    self.beginInsertRows(QModelIndex(), pos, pos)
+                    self.songs.insert(pos, si)
+                    self.loaded_count += 1
+                    self.endInsertRows()
+        self.loadTotalCount()
+
 class SecondScreenWindow(QMainWindow):
     closed = Signal()
     def __init__(self, main_app):
@@ -4462,12 +7617,72 @@ class SecondScreenWindow(QMainWindow):
         self.closed.emit()
         super().closeEvent(event)
 
+def index_main(argv, launch_dir="."):
+    """Build library.db and thumbs.db for one library without starting the GUI."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="karaoke_player --index", description="Index a karaoke library without the GUI.")
+    parser.add_argument("library_name")
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="ffprobe/ffmpeg processes to run at once (default: all cores)")
+    parser.add_argument("--full", action="store_true", help="re-list every folder instead of trusting folder fingerprints")
+    parser.add_argument("--manifest", help="CSV or JSON lines listing of the library to load instead of walking it")
+    parser.add_argument("--no-durations", action="store_true")
+    parser.add_argument("--no-thumbnails", action="store_true")
+    args = parser.parse_args(argv)
+    args.path = os.path.abspath(os.path.join(launch_dir, args.path))
+    if not os.path.isdir(args.path):
+        print(f"Not a folder: {args.path}", file=sys.stderr)
+        return 2
+
+    def report(label):
+        return lambda n: print(f"\r{label}: {n}", end="", flush=True)
+
+    conn = open_library_db()
+    try:
+        ensure_library_schema(conn)
+        c = conn.cursor()
+        c.execute("SELECT 1 FROM libraries WHERE lib_name = ?", (args.library_name,))
+        if c.fetchone() is None:
+            c.execute("SELECT MAX(sort_index) FROM libraries")
+            max_sort = c.fetchone()[0] or 0
+            c.execute("INSERT INTO libraries (lib_name, paths, sort_index) VALUES (?, ?, ?)",
+                      (args.library_name, args.path, int(max_sort) + 1))
+            conn.commit()
+        if args.manifest:
+            result = scan_library_from_manifest(conn, args.library_name, args.path, os.path.join(launch_dir, args.manifest),
+                                                progress_callback=report("Manifest entries"), workers=args.workers)
+        else:
+            result = scan_library_incremental(conn, args.library_name, args.path, full=args.full,
+                                              progress_callback=report("Files checked"), workers=args.workers)
+        print(f"\n{result.summary()}")
+        if result.manifest_error:
+            print(f"Manifest not used ({result.manifest_error}); the folder was scanned instead.", file=sys.stderr)
+        if result.cancelled:
+            print("Scan did not finish; run the same command again to resume.", file=sys.stderr)
+            return 1
+        cleanRemovedSongFiles(result.removed_songs)
+        cleanRemovedThumbnails(result.removed_song_ids)
+        if not args.no_durations:
+            probed, total = probe_library_durations(conn, args.library_name, args.path, args.workers, report("Durations probed"))
+            print(f"\n{probed}/{total} durations probed")
+        if not args.no_thumbnails:
+            made = generate_library_thumbnails(conn, args.library_name, args.path, args.workers, report("Thumbnails"))
+            print(f"\n{made} thumbnails generated")
+    finally:
+        conn.close()
+    return 0
+
 def main():
+    launch_dir = os.getcwd()
     if getattr(sys, "frozen", False):
         application_path = os.path.dirname(sys.executable)
     else:
         application_path = os.path.dirname(os.path.abspath(__file__))
     os.chdir(application_path)
+    if len(sys.argv) > 1 and sys.argv[1] == "--index":
+        sys.exit(index_main(sys.argv[2:], launch_dir))
+    if _multimedia_error is not None:
+        raise _multimedia_error
     instance_server = check_single_instance("KaraokePlayerInstance")
     if instance_server is None:
         print("Another instance is already running.")